@@ -0,0 +1,76 @@
+"""
+Telegram API Client
+One shared TeleBot and one keep-alive HTTP connection pool for every component
+"""
+
+import threading
+import time
+import requests
+import telebot
+from requests.adapters import HTTPAdapter
+from telebot import apihelper
+from urllib3.util.retry import Retry
+from metrics import API_LATENCY, API_RATE_LIMITED, API_ERRORS
+from logger_config import setup_logger
+
+logger = setup_logger()
+
+_session = None
+_session_lock = threading.Lock()
+
+class InstrumentedSession(requests.Session):
+    """Session that records latency, 429s and errors per Bot API method"""
+
+    def request(self, method, url, *args, **kwargs):
+        api_method = url.rsplit("/", 1)[-1]
+        started = time.perf_counter()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except Exception:
+            API_ERRORS.labels(api_method).inc()
+            raise
+        API_LATENCY.labels(api_method).observe(time.perf_counter() - started)
+        if response.status_code == 429:
+            API_RATE_LIMITED.labels(api_method).inc()
+        return response
+
+def create_api_session(pool_size=32):
+    """requests session with a connection pool big enough for all sending threads
+
+    Only failed connects are retried here (nothing was sent yet), so a retry can
+    never post a message twice.
+    """
+    session = InstrumentedSession()
+    adapter = HTTPAdapter(
+        pool_connections=2,
+        pool_maxsize=pool_size,
+        max_retries=Retry(total=None, connect=2, read=0, status=0, other=0, backoff_factor=0.2),
+        pool_block=False
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Connection"] = "keep-alive"
+    return session
+
+def configure_api_client(pool_size=32, connect_timeout=5, read_timeout=30):
+    """Install one shared session into telebot (all bots and threads reuse its connections)
+
+    By default telebot keeps a session per thread and drops it every 10 minutes,
+    so every worker thread pays its own TCP + TLS handshake.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_api_session(pool_size)
+        apihelper.session = _session
+        apihelper.SESSION_TIME_TO_LIVE = None
+        apihelper.CONNECT_TIMEOUT = connect_timeout
+        apihelper.READ_TIMEOUT = read_timeout
+    return _session
+
+def create_shared_bot(token, pool_size=32, connect_timeout=5, read_timeout=30, threaded=True):
+    """Create the single TeleBot used by the sender, the counter and the interactive handler"""
+    configure_api_client(pool_size, connect_timeout, read_timeout)
+    bot = telebot.TeleBot(token, threaded=threaded)
+    logger.info(f"🔌 Shared Telegram API client ready (pool {pool_size}, timeouts {connect_timeout}s/{read_timeout}s)")
+    return bot
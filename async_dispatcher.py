@@ -0,0 +1,154 @@
+"""
+Async Update Dispatcher
+asyncio long-polling loop that handles independent chats concurrently
+while keeping updates of the same chat in order
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from telebot import types
+from logger_config import setup_logger
+
+try:
+    import aiohttp
+except ImportError:  # optional dependency, only needed for the asyncio mode
+    aiohttp = None
+
+logger = setup_logger()
+
+API_URL = "https://api.telegram.org/bot{token}/{method}"
+
+def get_chat_key(raw_update):
+    """Return the id that defines ordering for an update (chat, or user for inline callbacks)"""
+    for field in ("message", "edited_message", "channel_post", "edited_channel_post"):
+        if field in raw_update:
+            return raw_update[field]["chat"]["id"]
+
+    callback = raw_update.get("callback_query")
+    if callback:
+        message = callback.get("message")
+        if message:
+            return message["chat"]["id"]
+        return callback["from"]["id"]
+
+    return None  # everything else shares one ordered lane
+
+
+class AsyncUpdateDispatcher:
+    def __init__(self, bot, workers=16, pool_size=10, poll_timeout=20, max_in_flight=1000):
+        """Initialize dispatcher around a telebot instance whose handlers are already registered"""
+        self.bot = bot
+        self.bot.threaded = False  # handlers run inline in our executor threads
+        self.workers = workers
+        self.pool_size = pool_size
+        self.poll_timeout = poll_timeout
+        self.max_in_flight = max_in_flight
+        self.offset = 0
+
+        self._executor = None
+        self._chat_tails = {}   # chat key -> last scheduled task for that chat
+        self._in_flight = None
+        self.stats = {"received": 0, "processed": 0, "failed": 0}
+
+    async def dispatch(self, raw_update):
+        """Schedule one raw update behind the previous update of the same chat"""
+        await self._in_flight.acquire()
+        self.stats["received"] += 1
+
+        chat_key = get_chat_key(raw_update)
+        previous = self._chat_tails.get(chat_key)
+        task = asyncio.ensure_future(self._process(raw_update, previous))
+        self._chat_tails[chat_key] = task
+        task.add_done_callback(lambda t, key=chat_key: self._release(key, t))
+        return task
+
+    def _release(self, chat_key, task):
+        if self._chat_tails.get(chat_key) is task:
+            del self._chat_tails[chat_key]
+        self._in_flight.release()
+
+    async def _process(self, raw_update, previous):
+        if previous is not None:
+            await asyncio.wait([previous])
+
+        loop = asyncio.get_running_loop()
+        try:
+            update = types.Update.de_json(raw_update)
+            await loop.run_in_executor(self._executor, self.bot.process_new_updates, [update])
+            self.stats["processed"] += 1
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.error(f"❌ Update {raw_update.get('update_id')} handler error: {e}")
+
+    async def drain(self):
+        """Wait until every scheduled update has been handled"""
+        tasks = list(self._chat_tails.values())
+        if tasks:
+            await asyncio.wait(tasks)
+
+    def _start(self):
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="UpdateWorker")
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+
+    def _stop(self):
+        self._executor.shutdown(wait=False)
+
+    async def _get_updates(self, session):
+        url = API_URL.format(token=self.bot.token, method="getUpdates")
+        params = {"offset": self.offset, "timeout": self.poll_timeout}
+        timeout = aiohttp.ClientTimeout(total=self.poll_timeout + 10)
+        async with session.get(url, params=params, timeout=timeout) as response:
+            data = await response.json()
+        if not data.get("ok"):
+            raise RuntimeError(f"getUpdates failed: {data.get('description')}")
+        return data["result"]
+
+    async def _poll(self):
+        connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            while True:
+                try:
+                    updates = await self._get_updates(session)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"❌ getUpdates error: {e} - retrying in 5 seconds...")
+                    await asyncio.sleep(5)
+                    continue
+
+                for raw_update in updates:
+                    self.offset = raw_update["update_id"] + 1
+                    await self.dispatch(raw_update)
+
+    async def _run(self):
+        self._start()
+        try:
+            await self._poll()
+        finally:
+            await self.drain()
+            self._stop()
+
+    def run_forever(self):
+        """Block the calling thread running the polling loop"""
+        if aiohttp is None:
+            raise RuntimeError("aiohttp is required for the asyncio dispatch mode (pip install aiohttp)")
+
+        logger.info(f"⚡ Starting asyncio update dispatcher ({self.workers} workers)")
+        self.bot.remove_webhook()
+        asyncio.run(self._run())
+
+    def process_batch(self, raw_updates):
+        """Handle a batch of raw updates and return when all are done (used by benchmarks/webhooks)"""
+        async def run_batch():
+            self._start()
+            try:
+                for raw_update in raw_updates:
+                    await self.dispatch(raw_update)
+                await self.drain()
+            finally:
+                self._stop()
+
+        started = time.perf_counter()
+        asyncio.run(run_batch())
+        return time.perf_counter() - started
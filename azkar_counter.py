@@ -4,19 +4,41 @@ Interactive Telegram bot with counting buttons for Islamic remembrances
 """
 
 import telebot
-from telebot import types
-import json
-import os
 import time
+from azkar_render import AzkarRenderCache
+from counter_store import CounterStore
+from edit_coalescer import EditCoalescer
+from metrics import CALLBACK_LATENCY, CALLBACKS_REJECTED
 from logger_config import setup_logger
 
 logger = setup_logger()
 
+CALLBACK_ACTIONS = {"menu", "select", "count", "reset"}
+MAX_RECENT_USERS = 100000  # prune the active-user table early when it gets this big
+LIMITED_ANSWER_INTERVAL = 5  # seconds - a flooding user gets at most one answer per interval
+
 class AzkarCounter:
-    def __init__(self, bot_token):
-        """Initialize the azkar counter bot"""
-        self.bot = telebot.TeleBot(bot_token)
-        self.user_counts = {}  # Store user counting data
+    def __init__(self, bot_token, counter_store=None, edit_interval_ms=1000, bot=None, rate_limiter=None):
+        """Initialize the azkar counter bot (a shared TeleBot is routed by its owner)"""
+        self.bot = bot or telebot.TeleBot(bot_token)
+        self.counter_store = counter_store if counter_store is not None else CounterStore()  # Store user counting data
+        
+        # Optional UserRateLimiter - taps over the limit never reach the Telegram API
+        self.rate_limiter = rate_limiter
+        
+        # Rapid count taps are coalesced into at most one edit per message per interval
+        self.edit_coalescer = EditCoalescer(self.bot, edit_interval_ms) if edit_interval_ms else None
+        
+        # Webhook mode answers callbacks inline in the HTTP response instead
+        self.answer_callbacks = True
+        
+        # user id -> last callback time, for the active users gauge
+        self.recent_users = {}
+        
+        # Over-limit taps: user id -> last time one was answered, and (webhook mode)
+        # callback id -> toast text for the inline answer
+        self.limited_answered = {}
+        self.inline_answers = {}
         
         # Azkar types with their Arabic names and recommended counts
         self.azkar_types = {
@@ -58,7 +80,15 @@ class AzkarCounter:
             }
         }
         
-        self.setup_handlers()
+        # Menus and count screens are rendered once, only the count changes per tap
+        self.render = AzkarRenderCache(self.azkar_types)
+        
+        # Fixed count slots per user in the store
+        self.counter_store.register_keys(self.azkar_types)
+        
+        if bot is None:
+            # Standalone mode - with a shared bot, CombinedBotHandler registers the handlers
+            self.setup_handlers()
     
     def setup_handlers(self):
         """Setup message and callback handlers"""
@@ -100,29 +130,20 @@ class AzkarCounter:
     
     def send_azkar_menu(self, message):
         """Send azkar selection menu"""
-        markup = types.InlineKeyboardMarkup(row_width=1)
-        
-        for key, azkar in self.azkar_types.items():
-            button_text = f"📿 {azkar['arabic']} ({azkar['recommended']})"
-            callback_data = f"select_{key}"
-            markup.add(types.InlineKeyboardButton(button_text, callback_data=callback_data))
-        
-        text = "🔹 اختر الذكر الذي تريد عده:\n\n"
-        text += "الأرقام بين القوسين تشير للعدد المستحب"
-        
-        self.bot.send_message(message.chat.id, text, reply_markup=markup)
+        self.bot.send_message(message.chat.id, self.render.menu_text, reply_markup=self.render.menu_markup)
     
     def show_user_counts(self, message):
         """Show current user counts"""
-        user_id = str(message.from_user.id)
+        user_id = message.from_user.id
+        user_counts = self.counter_store.get_counts(user_id)
         
-        if user_id not in self.user_counts or not self.user_counts[user_id]:
+        if not user_counts:
             self.bot.send_message(message.chat.id, "📊 لم تبدأ العد بعد\n\nاستخدم /azkar لبدء العد")
             return
         
         text = "📊 عدادك الحالي:\n\n"
         
-        for azkar_key, count in self.user_counts[user_id].items():
+        for azkar_key, count in user_counts.items():
             if count > 0:
                 azkar_info = self.azkar_types[azkar_key]
                 progress = f"({count}/{azkar_info['recommended']})"
@@ -132,31 +153,112 @@ class AzkarCounter:
     
     def reset_user_counts(self, message):
         """Reset user counts"""
-        user_id = str(message.from_user.id)
-        self.user_counts[user_id] = {}
-        
-        markup = types.InlineKeyboardMarkup()
-        markup.add(types.InlineKeyboardButton("🔄 ابدأ العد مرة أخرى", callback_data="menu"))
+        user_id = message.from_user.id
+        self.counter_store.reset_user(user_id)
         
         self.bot.send_message(
             message.chat.id, 
             "✅ تم مسح العداد بنجاح\n\n🔄 يمكنك البدء من جديد", 
-            reply_markup=markup
+            reply_markup=self.render.reset_markup
         )
     
     def handle_callback(self, call):
-        """Handle inline keyboard callbacks"""
-        user_id = str(call.from_user.id)
+        """Handle inline keyboard callbacks (timed per action for /metrics)"""
+        started = time.perf_counter()
+        action = call.data.split("_", 1)[0] if call.data else "empty"
+        if action not in CALLBACK_ACTIONS:
+            action = "other"
+        
+        if self.rate_limiter is not None and not self.rate_limiter.allow(call.from_user.id):
+            self._limit_callback(call, action)
+            return
         
-        # Initialize user data if doesn't exist
-        if user_id not in self.user_counts:
-            self.user_counts[user_id] = {}
+        self.recent_users[call.from_user.id] = time.monotonic()
+        if len(self.recent_users) > MAX_RECENT_USERS:
+            self.active_users()
+        try:
+            self._handle_callback(call)
+        finally:
+            CALLBACK_LATENCY.labels(action).observe(time.perf_counter() - started)
+    
+    def _limit_callback(self, call, action):
+        """Over the limit: a count tap is still counted and shown through the coalesced edit,
+        anything else is dropped. Answers are sampled so a flood costs almost no API calls.
+        """
+        azkar_key = call.data[len("count_"):] if action == "count" else None
+        if azkar_key not in self.azkar_types:
+            CALLBACKS_REJECTED.labels("dropped").inc()
+            self._answer_limited(call)
+            return
+        
+        count = self.counter_store.increment(call.from_user.id, azkar_key)
+        CALLBACKS_REJECTED.labels("coalesced").inc()
+        if self.edit_coalescer:
+            # Replaces any edit still waiting, so the message ends on the final count
+            text, markup = self.render.count_screen(azkar_key, count)
+            self.edit_coalescer.submit(call.message.chat.id, call.message.message_id, text, markup)
+            self._answer_limited(call)
+        else:
+            # No background edits: the answer shows the count instead
+            self._answer_limited(call, f"📿 {count}")
+    
+    def _answer_limited(self, call, text=None):
+        if not self.answer_callbacks:
+            # Webhook mode: the answer rides on the HTTP response, it costs no API call
+            if text:
+                self.inline_answers[call.id] = text
+            return
+        
+        now = time.monotonic()
+        if now - self.limited_answered.get(call.from_user.id, float("-inf")) < LIMITED_ANSWER_INTERVAL:
+            return
+        self.limited_answered[call.from_user.id] = now
+        try:
+            self.bot.answer_callback_query(call.id, text)
+        except Exception as e:
+            logger.debug(f"Answer callback failed: {e}")
+    
+    def pop_inline_answer(self, callback_id):
+        """Toast text for a webhook's inline answerCallbackQuery (None if there is none)"""
+        return self.inline_answers.pop(callback_id, None)
+    
+    def active_users(self, window=300):
+        """Users with a callback in the last `window` seconds (drops older entries)"""
+        cutoff = time.monotonic() - window
+        for user_id, seen in list(self.recent_users.items()):
+            if seen < cutoff:
+                self.recent_users.pop(user_id, None)
+        answered_cutoff = time.monotonic() - LIMITED_ANSWER_INTERVAL
+        for user_id, answered in list(self.limited_answered.items()):
+            if answered < answered_cutoff:
+                self.limited_answered.pop(user_id, None)
+        return len(self.recent_users)
+    
+    def _handle_callback(self, call):
+        # Answer right away to remove the loading indicator, edits may be deferred
+        if self.answer_callbacks:
+            try:
+                self.bot.answer_callback_query(call.id)
+            except Exception as e:
+                logger.debug(f"Answer callback failed: {e}")
+        
+        if self.edit_coalescer and not call.data.startswith("count_"):
+            # This edit replaces the message, drop any count edit still waiting
+            self.edit_coalescer.discard(call.message.chat.id, call.message.message_id)
         
         if call.data == "menu":
             # Go back to azkar menu
             self.edit_to_azkar_menu(call)
+            return
+        
+        # Callback data can be forged by modified clients - never store unknown azkar keys
+        action, _, azkar_key = call.data.partition("_")
+        if action in ("select", "count", "reset") and azkar_key not in self.azkar_types:
+            CALLBACKS_REJECTED.labels("invalid").inc()
+            logger.debug(f"Ignoring callback with unknown data from {call.from_user.id}")
+            return
         
-        elif call.data.startswith("select_"):
+        if call.data.startswith("select_"):
             # Select azkar type
             azkar_key = call.data.replace("select_", "")
             self.start_counting(call, azkar_key)
@@ -170,66 +272,22 @@ class AzkarCounter:
             # Reset specific azkar
             azkar_key = call.data.replace("reset_", "")
             self.reset_specific_azkar(call, azkar_key)
-        
-        # Answer callback to remove loading
-        self.bot.answer_callback_query(call.id)
     
     def edit_to_azkar_menu(self, call):
         """Edit message to show azkar menu"""
-        markup = types.InlineKeyboardMarkup(row_width=1)
-        
-        for key, azkar in self.azkar_types.items():
-            button_text = f"📿 {azkar['arabic']} ({azkar['recommended']})"
-            callback_data = f"select_{key}"
-            markup.add(types.InlineKeyboardButton(button_text, callback_data=callback_data))
-        
-        text = "🔹 اختر الذكر الذي تريد عده:\n\n"
-        text += "الأرقام بين القوسين تشير للعدد المستحب"
-        
         self.bot.edit_message_text(
-            text, 
+            self.render.menu_text, 
             call.message.chat.id, 
             call.message.message_id, 
-            reply_markup=markup
+            reply_markup=self.render.menu_markup
         )
     
     def start_counting(self, call, azkar_key):
         """Start counting for specific azkar"""
-        user_id = str(call.from_user.id)
-        azkar_info = self.azkar_types[azkar_key]
+        user_id = call.from_user.id
+        current_count = self.counter_store.get(user_id, azkar_key)
         
-        # Initialize count if doesn't exist
-        if azkar_key not in self.user_counts[user_id]:
-            self.user_counts[user_id][azkar_key] = 0
-        
-        current_count = self.user_counts[user_id][azkar_key]
-        recommended = azkar_info['recommended']
-        
-        # Create counting interface
-        markup = types.InlineKeyboardMarkup(row_width=2)
-        
-        # Count button (large)
-        count_btn = types.InlineKeyboardButton(
-            f"👆 اضغط للعد ({current_count})", 
-            callback_data=f"count_{azkar_key}"
-        )
-        markup.add(count_btn)
-        
-        # Reset and Menu buttons
-        reset_btn = types.InlineKeyboardButton("🔄 مسح", callback_data=f"reset_{azkar_key}")
-        menu_btn = types.InlineKeyboardButton("📋 القائمة", callback_data="menu")
-        markup.add(reset_btn, menu_btn)
-        
-        # Progress indicator
-        progress = f"{current_count}/{recommended}"
-        if current_count >= recommended:
-            progress += " ✅"
-        
-        text = f"📿 {azkar_info['arabic']}\n\n"
-        text += f"🔤 {azkar_info['transliteration']}\n"
-        text += f"💡 {azkar_info['meaning']}\n\n"
-        text += f"📊 التقدم: {progress}\n\n"
-        text += "👆 اضغط على الزر أدناه لبدء العد"
+        text, markup = self.render.count_screen(azkar_key, current_count, counting=False)
         
         self.bot.edit_message_text(
             text, 
@@ -240,42 +298,17 @@ class AzkarCounter:
     
     def increment_count(self, call, azkar_key):
         """Increment count for specific azkar"""
-        user_id = str(call.from_user.id)
-        azkar_info = self.azkar_types[azkar_key]
+        user_id = call.from_user.id
         
-        # Increment count
-        self.user_counts[user_id][azkar_key] += 1
-        current_count = self.user_counts[user_id][azkar_key]
-        recommended = azkar_info['recommended']
+        # Increment count (in-memory bump, persisted by the store in the background)
+        current_count = self.counter_store.increment(user_id, azkar_key)
         
-        # Update interface
-        markup = types.InlineKeyboardMarkup(row_width=2)
+        # Counting screen from precomputed templates
+        text, markup = self.render.count_screen(azkar_key, current_count)
         
-        # Count button with updated count
-        count_btn = types.InlineKeyboardButton(
-            f"👆 اضغط للعد ({current_count})", 
-            callback_data=f"count_{azkar_key}"
-        )
-        markup.add(count_btn)
-        
-        # Reset and Menu buttons
-        reset_btn = types.InlineKeyboardButton("🔄 مسح", callback_data=f"reset_{azkar_key}")
-        menu_btn = types.InlineKeyboardButton("📋 القائمة", callback_data="menu")
-        markup.add(reset_btn, menu_btn)
-        
-        # Progress indicator
-        progress = f"{current_count}/{recommended}"
-        completion_msg = ""
-        
-        if current_count >= recommended:
-            progress += " ✅"
-            completion_msg = "\n\n🎉 مبروك! أكملت العدد المستحب"
-        
-        text = f"📿 {azkar_info['arabic']}\n\n"
-        text += f"🔤 {azkar_info['transliteration']}\n"
-        text += f"💡 {azkar_info['meaning']}\n\n"
-        text += f"📊 التقدم: {progress}{completion_msg}\n\n"
-        text += "👆 استمر في الضغط للعد"
+        if self.edit_coalescer:
+            self.edit_coalescer.submit(call.message.chat.id, call.message.message_id, text, markup)
+            return
         
         try:
             self.bot.edit_message_text(
@@ -290,8 +323,8 @@ class AzkarCounter:
     
     def reset_specific_azkar(self, call, azkar_key):
         """Reset count for specific azkar"""
-        user_id = str(call.from_user.id)
-        self.user_counts[user_id][azkar_key] = 0
+        user_id = call.from_user.id
+        self.counter_store.set_count(user_id, azkar_key, 0)
         
         # Restart counting interface
         self.start_counting(call, azkar_key)
@@ -310,13 +343,18 @@ class AzkarCounter:
 def main():
     """Main entry point for azkar counter"""
     from bot_config import BotConfig
+    from counter_store import create_counter_store
     
     config = BotConfig()
     if not config.telegram_token:
         logger.error("❌ TELEGRAM_BOT_TOKEN not found")
         return
     
-    counter = AzkarCounter(config.telegram_token)
+    counter_store = create_counter_store(
+        config.state_db_path, config.counter_flush_interval_ms,
+        config.counter_idle_seconds, config.counter_max_cached_users
+    )
+    counter = AzkarCounter(config.telegram_token, counter_store, config.edit_interval_ms)
     counter.start_polling()
 
 if __name__ == "__main__":
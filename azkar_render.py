@@ -0,0 +1,64 @@
+"""
+Azkar Render Cache
+Precomputed texts and serialized inline keyboards for the azkar counter screens
+"""
+
+import json
+
+COUNT_PLACEHOLDER = "__COUNT__"
+
+def _markup_json(rows):
+    """Serialize inline keyboard rows the way telebot would send them"""
+    return json.dumps({"inline_keyboard": rows}, ensure_ascii=False)
+
+def _button(text, callback_data):
+    return {"text": text, "callback_data": callback_data}
+
+class AzkarRenderCache:
+    def __init__(self, azkar_types):
+        """Precompute every static part of the azkar UI once"""
+        # Azkar selection menu (one button per row)
+        self.menu_text = (
+            "🔹 اختر الذكر الذي تريد عده:\n\n"
+            "الأرقام بين القوسين تشير للعدد المستحب"
+        )
+        self.menu_markup = _markup_json([
+            [_button(f"📿 {azkar['arabic']} ({azkar['recommended']})", f"select_{key}")]
+            for key, azkar in azkar_types.items()
+        ])
+
+        self.reset_markup = _markup_json([[_button("🔄 ابدأ العد مرة أخرى", "menu")]])
+
+        # Count screens: text header and keyboard split around the live count
+        self._screens = {}
+        for key, azkar in azkar_types.items():
+            header = (
+                f"📿 {azkar['arabic']}\n\n"
+                f"🔤 {azkar['transliteration']}\n"
+                f"💡 {azkar['meaning']}\n\n"
+                "📊 التقدم: "
+            )
+            markup = _markup_json([
+                [_button(f"👆 اضغط للعد ({COUNT_PLACEHOLDER})", f"count_{key}")],
+                [_button("🔄 مسح", f"reset_{key}"), _button("📋 القائمة", "menu")]
+            ])
+            markup_prefix, markup_suffix = markup.split(COUNT_PLACEHOLDER)
+            self._screens[key] = (header, f"/{azkar['recommended']}", azkar['recommended'],
+                                  markup_prefix, markup_suffix)
+
+    def count_screen(self, azkar_key, count, counting=True):
+        """Return (text, markup_json) of the counting screen for a count value"""
+        header, recommended_text, recommended, markup_prefix, markup_suffix = self._screens[azkar_key]
+        count_text = str(count)
+
+        if count >= recommended:
+            if counting:
+                status = " ✅\n\n🎉 مبروك! أكملت العدد المستحب\n\n"
+            else:
+                status = " ✅\n\n"
+        else:
+            status = "\n\n"
+
+        footer = "👆 استمر في الضغط للعد" if counting else "👆 اضغط على الزر أدناه لبدء العد"
+        text = header + count_text + recommended_text + status + footer
+        return text, markup_prefix + count_text + markup_suffix
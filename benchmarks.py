@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+Performance Benchmarks
+Offline benchmarks for the bot's hot paths - no Telegram connection needed
+
+Usage: python benchmarks.py [name ...]   (no names = run all)
+"""
+
+import argparse
+import time
+
+FAKE_TOKEN = "123456:BENCHMARK-TOKEN"
+BENCHMARKS = {}
+
+def benchmark(name):
+    """Register a benchmark function under a name"""
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+def make_message_update(update_id, chat_id, text="/start"):
+    """Build a raw Telegram message update"""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "bench"},
+            "text": text,
+        }
+    }
+
+@benchmark("dispatcher")
+def bench_dispatcher(updates=400, chats=40, handler_ms=20):
+    """Updates/sec of serial polling vs the asyncio dispatcher with a slow handler"""
+    import telebot
+    from telebot import types
+    from async_dispatcher import AsyncUpdateDispatcher
+
+    raw_updates = [make_message_update(i + 1, 1000 + i % chats) for i in range(updates)]
+    order = {}
+
+    def make_bot():
+        bot = telebot.TeleBot(FAKE_TOKEN, threaded=False)
+
+        @bot.message_handler(func=lambda message: True)
+        def slow_handler(message):
+            time.sleep(handler_ms / 1000.0)  # simulated edit_message_text round trip
+            order.setdefault(message.chat.id, []).append(message.message_id)
+
+        return bot
+
+    serial_bot = make_bot()
+    started = time.perf_counter()
+    for raw_update in raw_updates:
+        serial_bot.process_new_updates([types.Update.de_json(raw_update)])
+    serial_elapsed = time.perf_counter() - started
+
+    order.clear()
+    dispatcher = AsyncUpdateDispatcher(make_bot(), workers=16)
+    async_elapsed = dispatcher.process_batch(raw_updates)
+    in_order = all(ids == sorted(ids) for ids in order.values())
+
+    print(f"  {updates} updates, {chats} chats, {handler_ms}ms handler")
+    print(f"  serial polling : {updates / serial_elapsed:8.1f} updates/sec")
+    print(f"  asyncio (16)   : {updates / async_elapsed:8.1f} updates/sec")
+    print(f"  per-chat order preserved: {in_order}")
+
+def legacy_count_screen(azkar_info, azkar_key, current_count):
+    """Count screen built the way AzkarCounter did before the render cache"""
+    from telebot import types
+
+    recommended = azkar_info['recommended']
+    markup = types.InlineKeyboardMarkup(row_width=2)
+    markup.add(types.InlineKeyboardButton(
+        f"👆 اضغط للعد ({current_count})", callback_data=f"count_{azkar_key}"
+    ))
+    reset_btn = types.InlineKeyboardButton("🔄 مسح", callback_data=f"reset_{azkar_key}")
+    menu_btn = types.InlineKeyboardButton("📋 القائمة", callback_data="menu")
+    markup.add(reset_btn, menu_btn)
+
+    progress = f"{current_count}/{recommended}"
+    completion_msg = ""
+    if current_count >= recommended:
+        progress += " ✅"
+        completion_msg = "\n\n🎉 مبروك! أكملت العدد المستحب"
+
+    text = f"📿 {azkar_info['arabic']}\n\n"
+    text += f"🔤 {azkar_info['transliteration']}\n"
+    text += f"💡 {azkar_info['meaning']}\n\n"
+    text += f"📊 التقدم: {progress}{completion_msg}\n\n"
+    text += "👆 استمر في الضغط للعد"
+    return text, markup.to_json()
+
+@benchmark("render")
+def bench_render(iterations=20000):
+    """Per-callback CPU time of building the count screen, before and after the render cache"""
+    from azkar_counter import AzkarCounter
+    from azkar_render import AzkarRenderCache
+
+    counter = AzkarCounter(FAKE_TOKEN, edit_interval_ms=0)
+    azkar_types = counter.azkar_types
+    render = AzkarRenderCache(azkar_types)
+    keys = list(azkar_types)
+
+    for count in (1, 100):
+        legacy_text, _ = legacy_count_screen(azkar_types[keys[0]], keys[0], count)
+        assert render.count_screen(keys[0], count)[0] == legacy_text
+
+    started = time.process_time()
+    for i in range(iterations):
+        key = keys[i % len(keys)]
+        legacy_count_screen(azkar_types[key], key, i % 150)
+    legacy_us = (time.process_time() - started) / iterations * 1e6
+
+    started = time.process_time()
+    for i in range(iterations):
+        render.count_screen(keys[i % len(keys)], i % 150)
+    cached_us = (time.process_time() - started) / iterations * 1e6
+
+    print(f"  rebuild markup + to_json : {legacy_us:6.2f} µs/callback")
+    print(f"  render cache             : {cached_us:6.2f} µs/callback")
+
+@benchmark("prayer_schedule")
+def bench_prayer_schedule(channels=3000, locations=300):
+    """Time to (re)compute prayer-relative schedules for many channels"""
+    from datetime import datetime, timedelta, timezone
+    from event_scheduler import EventScheduler, FakeClock
+    from channel_schedules import ChannelSchedule
+    from prayer_times import PrayerLocation
+    from scheduler import ContentScheduler
+
+    slots = {"morning_azkar": "fajr+20", "evening_azkar": "asr+30", "daily_dua": "maghrib-10", "quran_verse": "08:00"}
+    places = [PrayerLocation(-40 + (i * 7) % 95, -170 + (i * 13) % 340, "MWL") for i in range(locations)]
+    schedules = [ChannelSchedule(f"@channel{i}", "UTC", slots, places[i % locations]) for i in range(channels)]
+    clock = FakeClock(datetime(2026, 6, 1, tzinfo=timezone.utc))
+    scheduler = ContentScheduler(None, None, event_scheduler=EventScheduler(clock), channel_schedules=schedules)
+
+    started = time.perf_counter()
+    scheduler.setup_schedule()
+    cold_ms = (time.perf_counter() - started) * 1000
+
+    # Midnight recompute: every job's next run from the cached yearly tables
+    jobs = scheduler.event_scheduler.jobs
+    midnight = clock.now() + timedelta(days=1)
+    started = time.perf_counter()
+    for job in jobs:
+        job.compute_next_run(midnight)
+    warm_ms = (time.perf_counter() - started) * 1000
+
+    print(f"  setup {len(jobs)} jobs, {locations} yearly tables built : {cold_ms:7.1f} ms")
+    print(f"  next-day recompute from cached tables          : {warm_ms:7.1f} ms")
+
+@benchmark("api_client")
+def bench_api_client(sends=100, bursts=10, burst_size=8, handshake_ms=20):
+    """sendMessage latency on cold connections vs the shared keep-alive pool (local fake API)"""
+    import json
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    import telebot
+    from telebot import apihelper
+    from api_client import create_api_session
+
+    class FakeTelegramAPI(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+        disable_nagle_algorithm = True  # like a real server, answer without waiting for delayed ACKs
+
+        def setup(self):
+            super().setup()
+            time.sleep(handshake_ms / 1000.0)  # stands in for the TCP + TLS handshake to Telegram
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            body = json.dumps({"ok": True, "result": {
+                "message_id": 1, "date": 0, "chat": {"id": -100, "type": "channel"}, "text": "x"
+            }}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_GET = do_POST
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeTelegramAPI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    saved = (apihelper.API_URL, apihelper.session, apihelper.SESSION_TIME_TO_LIVE)
+    apihelper.API_URL = f"http://127.0.0.1:{server.server_port}/bot{{0}}/{{1}}"
+    bot = telebot.TeleBot(FAKE_TOKEN)
+
+    def sequential_ms():
+        started = time.perf_counter()
+        for _ in range(sends):
+            bot.send_message(-100, "x")
+        return (time.perf_counter() - started) / sends * 1000
+
+    def bursts_ms():
+        # Like FanoutPublisher: a fresh thread pool per post
+        started = time.perf_counter()
+        for _ in range(bursts):
+            with ThreadPoolExecutor(max_workers=burst_size) as executor:
+                list(executor.map(lambda _: bot.send_message(-100, "x"), range(burst_size)))
+        return (time.perf_counter() - started) / bursts * 1000
+
+    try:
+        apihelper.session, apihelper.SESSION_TIME_TO_LIVE = None, 0
+        cold = sequential_ms()
+        apihelper.SESSION_TIME_TO_LIVE = 600
+        per_thread_bursts = bursts_ms()
+
+        apihelper.session, apihelper.SESSION_TIME_TO_LIVE = create_api_session(burst_size * 2), None
+        bot.send_message(-100, "x")  # open the first connection
+        warm = sequential_ms()
+        shared_bursts = bursts_ms()
+    finally:
+        apihelper.API_URL, apihelper.session, apihelper.SESSION_TIME_TO_LIVE = saved
+        server.shutdown()
+
+    print(f"  simulated handshake                : {handshake_ms} ms per new connection")
+    print(f"  cold (new connection per send)     : {cold:6.2f} ms/send")
+    print(f"  warm (shared keep-alive pool)      : {warm:6.2f} ms/send")
+    print(f"  {burst_size}-send burst, per-thread sessions : {per_thread_bursts:6.2f} ms/burst")
+    print(f"  {burst_size}-send burst, shared pool         : {shared_bursts:6.2f} ms/burst")
+
+@benchmark("callback_flood")
+def bench_callback_flood(taps=100000, distinct_users=200000, max_users=50000):
+    """Cost of callbacks over the per-user limit, and limiter memory under many user ids"""
+    from types import SimpleNamespace
+    from azkar_counter import AzkarCounter
+    from rate_limit import UserRateLimiter
+
+    limiter = UserRateLimiter(5, 20, max_users=max_users)
+    counter = AzkarCounter(FAKE_TOKEN, edit_interval_ms=0, rate_limiter=limiter)
+    counter.answer_callbacks = False
+    api_calls = []
+    counter.bot.edit_message_text = lambda *args, **kwargs: api_calls.append(args)
+
+    def make_call(user_id, data):
+        message = SimpleNamespace(chat=SimpleNamespace(id=user_id), message_id=1)
+        return SimpleNamespace(id="1", data=data, from_user=SimpleNamespace(id=user_id), message=message)
+
+    flood = [make_call(42, "count_subhan_allah") if i % 2 else make_call(42, "select_subhan_allah")
+             for i in range(taps)]
+    started = time.perf_counter()
+    for call in flood:
+        counter.handle_callback(call)
+    per_tap_us = (time.perf_counter() - started) / taps * 1e6
+
+    for user_id in range(distinct_users):
+        limiter.allow(user_id)
+
+    print(f"  flood of {taps} taps from one user : {per_tap_us:6.2f} µs/tap, {len(api_calls)} edits sent")
+    print(f"  counted (coalesced) taps            : {counter.counter_store.get(42, 'subhan_allah')}")
+    print(f"  limiter after {distinct_users} user ids   : {len(limiter)} tracked (max {max_users})")
+
+@benchmark("counter_memory")
+def bench_counter_memory(users=1000000, keys_per_user=2):
+    """Bytes per cached user: previous dict-of-dicts layout vs the flat count slab"""
+    import tracemalloc
+    from counter_store import CounterStore
+
+    azkar_keys = ["subhan_allah", "alhamdulillah", "allahu_akbar",
+                  "la_ilaha_illa_allah", "astaghfirullah", "salawat"]
+    user_ids = range(10**9, 10**9 + users)  # real Telegram ids are large ints
+
+    def measure(fill):
+        tracemalloc.start()
+        kept = fill()
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del kept
+        return size / users
+
+    def legacy():
+        counts = {}
+        for user_id in user_ids:
+            user = counts.setdefault(str(user_id), {})
+            for azkar_key in azkar_keys[:keys_per_user]:
+                user[azkar_key] = user.get(azkar_key, 0) + 1
+        return counts
+
+    def slab():
+        store = CounterStore(azkar_keys)
+        for user_id in user_ids:
+            for azkar_key in azkar_keys[:keys_per_user]:
+                store.increment(user_id, azkar_key)
+        return store
+
+    legacy_bytes = measure(legacy)
+    slab_bytes = measure(slab)
+    print(f"  {users} users, {keys_per_user} counters each")
+    print(f"  dict of dicts (str ids)            : {legacy_bytes:6.1f} bytes/user")
+    print(f"  count slab (int ids)               : {slab_bytes:6.1f} bytes/user")
+
+def make_callback_update(update_id, user_id, data="count_subhan_allah"):
+    """Build a raw Telegram callback query update"""
+    sender = {"id": user_id, "is_bot": False, "first_name": "bench"}
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": sender,
+            "chat_instance": "1",
+            "data": data,
+            "message": {
+                "message_id": 1,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": sender,
+                "text": "x",
+            },
+        }
+    }
+
+def build_callback_worker(index=0):
+    """Counter bot whose edits are serialized like a real API call but never sent"""
+    import json
+    from azkar_counter import AzkarCounter
+
+    counter = AzkarCounter(FAKE_TOKEN, edit_interval_ms=0)
+    counter.answer_callbacks = False
+    counter.bot.threaded = False
+    counter.bot.edit_message_text = lambda text, chat_id, message_id, reply_markup=None: json.dumps(
+        {"text": text, "chat_id": chat_id, "message_id": message_id, "reply_markup": reply_markup.to_json()}
+    )
+    return counter.bot
+
+@benchmark("sharded")
+def bench_sharded(updates=40000, users=5000, batch=100, max_workers=4):
+    """Callbacks/sec in one process vs. N sharded worker processes"""
+    import os
+    from telebot import types
+    from sharded_dispatcher import ShardedDispatcher
+
+    raw_updates = [make_callback_update(i, 10**9 + i % users) for i in range(updates)]
+    batches = [raw_updates[i:i + batch] for i in range(0, updates, batch)]
+
+    bot = build_callback_worker()
+    started = time.perf_counter()
+    for raw_batch in batches:
+        bot.process_new_updates([types.Update.de_json(raw_update) for raw_update in raw_batch])
+    single = updates / (time.perf_counter() - started)
+    print(f"  CPU cores available                : {os.cpu_count()}")
+    print(f"  single process                     : {single:8.0f} callbacks/s")
+
+    workers = 1
+    while workers <= max_workers:
+        dispatcher = ShardedDispatcher(FAKE_TOKEN, build_callback_worker, workers=workers)
+        dispatcher.start()
+        try:
+            started = time.perf_counter()
+            for raw_batch in batches:
+                dispatcher.dispatch(raw_batch)
+            dispatcher.drain()
+            rate = updates / (time.perf_counter() - started)
+        finally:
+            dispatcher.stop()
+        print(f"  {workers} worker process(es)               : {rate:8.0f} callbacks/s ({rate / single:.2f}x)")
+        workers *= 2
+
+@benchmark("logging")
+def bench_logging(calls=20000):
+    """Per-call cost of logger.info on the calling thread: direct file writes vs. the queue"""
+    import logging
+    import os
+    import tempfile
+    from logger_config import (
+        DedupFilter, SamplingFilter, create_handlers, start_queue_logging, stop_queue_logging
+    )
+    directory = tempfile.mkdtemp()
+    devnull = open(os.devnull, "w")
+
+    def run(name, use_queue, sampling=None, dedup=False, message="📤 Sending message to -100{} (attempt 1/5)..."):
+        handlers = create_handlers(logging.INFO, os.path.join(directory, f"{name}.log"), stream=devnull)
+        logger = logging.getLogger(f"bench.{name}")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        listener = start_queue_logging(logger, handlers) if use_queue else None
+        if not use_queue:
+            for handler in handlers:
+                logger.addHandler(handler)
+        if sampling:
+            logger.addFilter(SamplingFilter(sampling))
+        if dedup:
+            logger.addFilter(DedupFilter())
+        level = logging.ERROR if dedup else logging.INFO
+
+        started, cpu_started = time.perf_counter(), time.thread_time()
+        for i in range(calls):
+            logger.log(level, message.format(i % 1000))
+        caller_us = (time.thread_time() - cpu_started) / calls * 1e6
+        if listener:
+            stop_queue_logging(listener)
+        total_us = (time.perf_counter() - started) / calls * 1e6
+        for handler in handlers:
+            handler.close()
+        return caller_us, total_us
+
+    for label, args in (("synchronous handlers", ("sync", False)),
+                        ("queue + listener thread", ("queue", True)),
+                        ("queue, INFO sampled 1/10", ("sampled", True, {logging.INFO: 0.1})),
+                        ("error storm, deduplicated", ("storm", True, None, True,
+                                                       "❌ Polling inner error: Conflict - retry #{}"))):
+        caller_us, total_us = run(*args)
+        with open(os.path.join(directory, f"{args[0]}.log"), encoding="utf-8") as log_file:
+            lines = sum(1 for _ in log_file)
+        print(f"  {label:<34} : {caller_us:6.2f} µs/call on caller ({total_us:6.2f} µs incl. writing), "
+              f"{lines} lines written")
+    devnull.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run offline performance benchmarks")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run: {', '.join(BENCHMARKS)}")
+    args = parser.parse_args()
+
+    for name in args.names or list(BENCHMARKS):
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark: {name}")
+        print(f"▶ {name}")
+        BENCHMARKS[name]()
+
+if __name__ == "__main__":
+    main()
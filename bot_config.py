@@ -4,6 +4,7 @@ Handles environment variables and configuration validation
 """
 
 import os
+from prayer_times import PrayerLocation
 from logger_config import setup_logger
 
 logger = setup_logger()
@@ -15,22 +16,96 @@ class BotConfig:
         self.telegram_token = os.getenv("TELEGRAM_BOT_TOKEN", "")
         self.channel_id = os.getenv("TELEGRAM_CHANNEL_ID", "")
         
+        # Extra fan-out destinations (comma separated); the main channel is always included
+        extra_channels = os.getenv("TELEGRAM_CHANNEL_IDS", "")
+        self.channel_ids = [self.channel_id] if self.channel_id else []
+        for channel in extra_channels.split(","):
+            channel = channel.strip()
+            if channel and channel not in self.channel_ids:
+                self.channel_ids.append(channel)
+        self.fanout_workers = int(os.getenv("FANOUT_WORKERS", "8"))
+        
         # Optional configurations with defaults
         self.max_content_length = int(os.getenv("MAX_CONTENT_LENGTH", "500"))
         self.content_temperature = float(os.getenv("CONTENT_TEMPERATURE", "0.8"))
         self.retry_attempts = int(os.getenv("RETRY_ATTEMPTS", "3"))
         self.retry_delay = int(os.getenv("RETRY_DELAY", "60"))
         
-        # Schedule configuration (24-hour format)
+        # Persistent state (empty BOT_STATE_DB keeps everything in memory)
+        self.state_db_path = os.getenv("BOT_STATE_DB", "bot_state.db")
+        self.counter_flush_interval_ms = int(os.getenv("COUNTER_FLUSH_INTERVAL_MS", "500"))
+        # Counter users idle this long leave memory (0 = never), optional cap on cached users
+        self.counter_idle_seconds = int(os.getenv("COUNTER_IDLE_SECONDS", "1800"))
+        self.counter_max_cached_users = int(os.getenv("COUNTER_MAX_CACHED_USERS", "0"))
+        
+        # Durable outbox for scheduled posts (delivered by a background drainer)
+        self.outbox_enabled = os.getenv("OUTBOX_ENABLED", "true").lower() == "true"
+        
+        # Content selection: "rotate" (fixed order) or "shuffle" (no repeats within an epoch)
+        self.content_selection = os.getenv("CONTENT_SELECTION", "rotate")
+        self.no_repeat_days = int(os.getenv("CONTENT_NO_REPEAT_DAYS", "0"))
+        
+        # Minimum gap between edits of the same counter message (0 = edit on every tap)
+        self.edit_interval_ms = int(os.getenv("EDIT_INTERVAL_MS", "1000"))
+        
+        # Shared Telegram API client (one keep-alive connection pool for every component)
+        self.api_pool_size = int(os.getenv("API_POOL_SIZE", "32"))
+        self.api_connect_timeout = float(os.getenv("API_CONNECT_TIMEOUT", "5"))
+        self.api_read_timeout = float(os.getenv("API_READ_TIMEOUT", "30"))
+        
+        # Per-user callback limit (taps/sec, burst) and how many users the limiter tracks
+        self.callback_rate = float(os.getenv("CALLBACK_RATE", "5"))
+        self.callback_burst = int(os.getenv("CALLBACK_BURST", "20"))
+        self.callback_max_users = int(os.getenv("CALLBACK_MAX_USERS", "100000"))
+        
+        # Several replicas: only the holder of the lease in BOT_STATE_DB runs scheduled posts
+        self.leader_election = os.getenv("LEADER_ELECTION", "false").lower() == "true"
+        self.leader_lease_seconds = float(os.getenv("LEADER_LEASE_SECONDS", "10"))
+        
+        # Update dispatch: "threaded" (telebot polling), "asyncio" (concurrent per chat)
+        # or "sharded" (worker processes, users split by consistent hash)
+        self.dispatch_mode = os.getenv("BOT_DISPATCH_MODE", "threaded")
+        self.dispatch_workers = int(os.getenv("DISPATCH_WORKERS", "16"))
+        self.shard_workers = int(os.getenv("SHARD_WORKERS", str(os.cpu_count() or 2)))
+        
+        # Timezone of the schedule times (IANA name, empty = server local time)
+        self.schedule_timezone = os.getenv("SCHEDULE_TIMEZONE", "") or None
+        
+        # Daily time to pre-render upcoming posts into the outbox (empty = render at post time)
+        self.prerender_time = os.getenv("PRERENDER_TIME", "22:00") or None
+        self.prerender_hours = int(os.getenv("PRERENDER_HOURS", "30"))
+        
+        # Optional per-channel schedule tables (JSON, see channel_schedules.py)
+        self.channel_schedules_file = os.getenv("CHANNEL_SCHEDULES_FILE", "")
+        
+        # Location for prayer-relative times like "fajr+20" (empty = fixed times only)
+        latitude = os.getenv("PRAYER_LATITUDE", "")
+        longitude = os.getenv("PRAYER_LONGITUDE", "")
+        self.prayer_location = None
+        if latitude and longitude:
+            try:
+                self.prayer_location = PrayerLocation(
+                    float(latitude), float(longitude),
+                    os.getenv("PRAYER_METHOD", "MWL"),
+                    os.getenv("PRAYER_ASR", "shafi")
+                )
+            except ValueError as e:
+                logger.error(f"❌ Invalid prayer location: {e} - using fixed azkar times")
+        
+        # Azkar follow Fajr and Asr when a location is known
+        morning_default = "fajr+30" if self.prayer_location else "06:00"
+        evening_default = "asr+30" if self.prayer_location else "21:00"
+        
+        # Schedule configuration (24-hour format, or relative to a prayer: "fajr+30", "maghrib-15")
         self.schedule_config = {
-            "morning_azkar": os.getenv("MORNING_AZKAR_TIME", "06:00"),
+            "morning_azkar": os.getenv("MORNING_AZKAR_TIME", morning_default),
             "quran_verse": os.getenv("QURAN_VERSE_TIME", "08:00"),
             "daily_hadith": os.getenv("DAILY_HADITH_TIME", "12:00"),
             "religious_post": os.getenv("RELIGIOUS_POST_TIME", "14:00"),
             "daily_reminder": os.getenv("DAILY_REMINDER_TIME", "17:00"),
             "companion_story": os.getenv("COMPANION_STORY_TIME", "19:00"),
             "daily_dua": os.getenv("DAILY_DUA_TIME", "20:00"),
-            "evening_azkar": os.getenv("EVENING_AZKAR_TIME", "21:00")
+            "evening_azkar": os.getenv("EVENING_AZKAR_TIME", evening_default)
         }
     
     def validate(self):
@@ -68,7 +143,17 @@ class BotConfig:
         """Log current configuration (without sensitive data)"""
         logger.info("📋 Current Configuration:")
         logger.info(f"   Channel ID: {self.channel_id}")
+        logger.info(f"   Destinations: {len(self.channel_ids)}")
         logger.info(f"   Max Content Length: {self.max_content_length}")
         logger.info(f"   Content Temperature: {self.content_temperature}")
         logger.info(f"   Retry Attempts: {self.retry_attempts}")
-        logger.info(f"   Schedule Times: {self.schedule_config}")
+        logger.info(f"   State DB: {self.state_db_path or 'in-memory'}")
+        logger.info(f"   Counter Cache: idle eviction {self.counter_idle_seconds}s, max {self.counter_max_cached_users or 'unbounded'} users")
+        logger.info(f"   Dispatch Mode: {self.dispatch_mode}" + (f" ({self.shard_workers} workers)" if self.dispatch_mode == "sharded" else ""))
+        logger.info(f"   API Pool: {self.api_pool_size} connections ({self.api_connect_timeout}s/{self.api_read_timeout}s)")
+        logger.info(f"   Leader Election: {f'lease {self.leader_lease_seconds}s' if self.leader_election else 'disabled'}")
+        logger.info(f"   Outbox: {'enabled' if self.outbox_enabled else 'disabled'}")
+        logger.info(f"   Pre-render: {self.prerender_time or 'disabled'} ({self.prerender_hours}h ahead)")
+        logger.info(f"   Content Selection: {self.content_selection} (no repeat: {self.no_repeat_days} days)")
+        logger.info(f"   Schedule Times: {self.schedule_config} ({self.schedule_timezone or 'local time'})")
+        logger.info(f"   Prayer Location: {self.prayer_location or 'not set'}")
@@ -7,18 +7,32 @@ import threading
 import time
 import telebot
 from telebot import types
+from async_dispatcher import AsyncUpdateDispatcher
+from sharded_dispatcher import ShardedDispatcher
+from metrics import ACTIVE_USERS, EDITS_PENDING
 from logger_config import setup_logger
 
 logger = setup_logger()
 
+# Answered by the process that runs the scheduler, also when updates go to shard workers
+SCHEDULE_COMMANDS = ('schedule', 'جدول')
+SCHEDULE_SLOTS_SHOWN = 30  # keeps /schedule well under Telegram's message size with many channels
+
 class CombinedBotHandler:
-    def __init__(self, bot_token, channel_id, scheduler, azkar_counter):
-        """Initialize combined bot handler"""
-        self.bot = telebot.TeleBot(bot_token)
+    def __init__(self, bot_token, channel_id, scheduler, azkar_counter,
+                 dispatch_mode="threaded", dispatch_workers=16, bot=None,
+                 shard_workers=4, shard_worker_factory=None):
+        """Initialize combined bot handler (optionally sharing a TeleBot)"""
+        self.bot = bot or telebot.TeleBot(bot_token)
         self.channel_id = channel_id
         self.scheduler = scheduler
         self.azkar_counter = azkar_counter
+        self.dispatch_mode = dispatch_mode  # "threaded" (telebot polling), "asyncio" or "sharded"
+        self.dispatch_workers = dispatch_workers
+        self.shard_workers = shard_workers
+        self.shard_worker_factory = shard_worker_factory  # builds the handlers inside each worker process
         self.running = False
+        self.polling_thread = None  # one receiver per process, kept across restarts of start()
         
         # Setup message handlers
         self.setup_handlers()
@@ -46,7 +60,7 @@ class CombinedBotHandler:
         def reset_command(message):
             self.azkar_counter.reset_user_counts(message)
         
-        @self.bot.message_handler(commands=['schedule', 'جدول'])
+        @self.bot.message_handler(commands=list(SCHEDULE_COMMANDS))
         def schedule_command(message):
             self.show_schedule(message)
         
@@ -95,17 +109,22 @@ class CombinedBotHandler:
         """Show current posting schedule"""
         schedule_info = self.scheduler.get_schedule_status()
         
+        slots = schedule_info["slots"]
+        
         text = "📅 جدول النشر التلقائي:\n\n"
-        text += "🌅 أذكار الصباح: 06:00\n"
-        text += "📖 آية قرآنية: 08:00\n"
-        text += "📚 حديث شريف: 12:00\n"
-        text += "💭 تذكرة إيمانية: 17:00\n"
-        text += "🤲 دعاء مستجاب: 20:00\n"
-        text += "🌙 أذكار المساء: 21:00\n\n"
+        for slot in slots[:SCHEDULE_SLOTS_SHOWN]:
+            # Prayer-relative slots ("fajr+20") move daily, so show the actual next time too
+            channel = f" ({slot['channel']})" if slot["channel"] else ""
+            text += f"📍 {slot['title']}{channel}: {slot['time']} (التالي: {slot['next_run']})\n"
+        if len(slots) > SCHEDULE_SLOTS_SHOWN:
+            text += f"… و{len(slots) - SCHEDULE_SLOTS_SHOWN} منشورات أخرى\n"
+        if not slots:
+            text += "⚠️ لا توجد منشورات مجدولة حالياً\n"
         
-        text += "📊 حالة الجدولة:\n"
-        for info in schedule_info:
-            text += f"• {info}\n"
+        text += "\n📊 حالة الجدولة:\n"
+        text += f"• عدد المنشورات اليومية: {len(slots)}\n"
+        if schedule_info["next_run"]:
+            text += f"• أقرب نشر: {schedule_info['next_run']}\n"
         
         text += "\n🔄 البوت ينشر المحتوى تلقائياً حسب الجدول أعلاه"
         
@@ -140,6 +159,16 @@ class CombinedBotHandler:
     
     def start_bot_polling(self):
         """Start bot polling in a separate thread - NEVER STOPS"""
+        if self.polling_thread and self.polling_thread.is_alive():
+            logger.info("✅ Bot polling already running")
+            return
+        if self.dispatch_mode == "asyncio":
+            self.start_async_dispatcher()
+            return
+        if self.dispatch_mode == "sharded" and self.shard_worker_factory:
+            self.start_sharded_dispatcher()
+            return
+        
         def bot_polling():
             logger.info("🤖 Starting interactive bot polling...")
             polling_restart_count = 0
@@ -174,10 +203,63 @@ class CombinedBotHandler:
         # Start single polling thread to avoid Telegram conflicts
         bot_thread = threading.Thread(target=bot_polling, daemon=True, name="BotPolling-Main")
         bot_thread.start()
+        self.polling_thread = bot_thread
         logger.info("✅ Bot polling thread started")
         
         logger.info("✅ Interactive bot started successfully")
     
+    def start_async_dispatcher(self):
+        """Start the asyncio dispatcher in a separate thread - NEVER STOPS"""
+        def async_polling():
+            dispatcher_restart_count = 0
+            
+            while True:
+                try:
+                    dispatcher_restart_count += 1
+                    logger.info(f"🔄 Async dispatcher attempt #{dispatcher_restart_count}")
+                    dispatcher = AsyncUpdateDispatcher(self.bot, workers=self.dispatch_workers)
+                    dispatcher.run_forever()
+                except Exception as e:
+                    logger.error(f"❌ Async dispatcher error: {e} - restarting in 10 seconds...")
+                    time.sleep(10)
+                    continue
+        
+        bot_thread = threading.Thread(target=async_polling, daemon=True, name="BotPolling-Async")
+        bot_thread.start()
+        self.polling_thread = bot_thread
+        logger.info("✅ Async dispatcher thread started")
+        
+        logger.info("✅ Interactive bot started successfully")
+    
+    def start_sharded_dispatcher(self):
+        """Start the receiver for the sharded worker processes in a separate thread - NEVER STOPS"""
+        def sharded_polling():
+            dispatcher_restart_count = 0
+            
+            while True:
+                try:
+                    dispatcher_restart_count += 1
+                    logger.info(f"🔄 Sharded dispatcher attempt #{dispatcher_restart_count}")
+                    dispatcher = ShardedDispatcher(
+                        self.bot.token, self.shard_worker_factory, workers=self.shard_workers,
+                        local_bot=self.bot, local_commands=SCHEDULE_COMMANDS
+                    )
+                    # Callbacks are handled in the workers - report their users and edits
+                    for gauge in (ACTIVE_USERS, EDITS_PENDING):
+                        gauge.set_function(lambda name=gauge.name: dispatcher.gauge_total(name))
+                    dispatcher.run_forever()
+                except Exception as e:
+                    logger.error(f"❌ Sharded dispatcher error: {e} - restarting in 10 seconds...")
+                    time.sleep(10)
+                    continue
+        
+        bot_thread = threading.Thread(target=sharded_polling, daemon=True, name="BotPolling-Sharded")
+        bot_thread.start()
+        self.polling_thread = bot_thread
+        logger.info("✅ Sharded dispatcher thread started")
+        
+        logger.info("✅ Interactive bot started successfully")
+    
     def start_scheduler(self):
         """Start the content scheduler - NEVER STOPS"""
         logger.info("📅 Starting content scheduler...")
@@ -195,45 +277,33 @@ class CombinedBotHandler:
                 continue
         
         # Run scheduler forever with multiple protection layers
-        scheduler_iteration = 0
+        scheduler_restarts = 0
         consecutive_errors = 0
         
         while True:  # Infinite scheduler loop
             try:
-                scheduler_iteration += 1
-                
-                # Log periodic status
-                if scheduler_iteration % 120 == 0:  # Every hour (30s * 120)
-                    logger.info(f"📅 Scheduler running strong - iteration #{scheduler_iteration}")
-                
-                # Run pending tasks with protection
-                try:
-                    self.scheduler.run_pending_tasks()
-                    consecutive_errors = 0  # Reset error counter on success
-                except KeyboardInterrupt:
-                    logger.info("📶 Ignoring keyboard interrupt in scheduler tasks...")
-                    time.sleep(5)
-                    continue
-                except SystemExit:
-                    logger.info("📶 Ignoring system exit in scheduler tasks...")
-                    time.sleep(5)
-                    continue
-                except Exception as task_error:
-                    consecutive_errors += 1
-                    logger.error(f"❌ Scheduler task error #{consecutive_errors}: {task_error}")
-                    
-                    # Increase delay for consecutive errors
-                    error_delay = min(300, 30 + (consecutive_errors * 30))  # Max 5 minutes
-                    time.sleep(error_delay)
-                    continue
-                
-                # Normal operation - check every 30 seconds
-                time.sleep(30)
+                scheduler_restarts += 1
+                if scheduler_restarts > 1:
+                    logger.info(f"📅 Scheduler loop restarted (#{scheduler_restarts})")
                 
+                # Sleeps until the next job is due - no periodic polling
+                self.scheduler.run_forever()
+                consecutive_errors = 0
+            except KeyboardInterrupt:
+                logger.info("📶 Ignoring keyboard interrupt in scheduler tasks...")
+                time.sleep(5)
+                continue
+            except SystemExit:
+                logger.info("📶 Ignoring system exit in scheduler tasks...")
+                time.sleep(5)
+                continue
             except Exception as e:
                 consecutive_errors += 1
-                logger.error(f"❌ Scheduler outer error #{consecutive_errors}: {e} - continuing in 60 seconds...")
-                time.sleep(60)
+                logger.error(f"❌ Scheduler error #{consecutive_errors}: {e}")
+                
+                # Increase delay for consecutive errors
+                error_delay = min(300, 30 + (consecutive_errors * 30))  # Max 5 minutes
+                time.sleep(error_delay)
                 continue
     
     def stop(self):
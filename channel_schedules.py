@@ -0,0 +1,78 @@
+"""
+Channel Schedules
+Per-channel posting tables (timezone + slot times) loaded from a JSON file
+
+File format:
+{
+  "defaults": {"morning_azkar": "06:00", ...},          (optional)
+  "channels": [
+    {"channel_id": "@channel", "timezone": "Africa/Cairo",
+     "latitude": 30.04, "longitude": 31.24, "method": "Egypt", "asr": "shafi",
+     "slots": {"morning_azkar": "fajr+20", "evening_azkar": "asr+30", "daily_hadith": "12:00"}}
+  ]
+}
+A channel without "slots" uses the defaults; "timezone" defaults to server local time.
+Prayer-relative slots need coordinates (the channel's, or the default location).
+"""
+
+import json
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from event_scheduler import parse_time
+from prayer_times import PrayerLocation, parse_prayer_slot
+from logger_config import setup_logger
+
+logger = setup_logger()
+
+class ChannelSchedule:
+    """Posting table of one channel"""
+    __slots__ = ("channel_id", "timezone", "tz", "slots", "location")
+
+    def __init__(self, channel_id, timezone=None, slots=None, location=None):
+        self.channel_id = str(channel_id)
+        self.timezone = timezone
+        self.tz = ZoneInfo(timezone) if timezone else None
+        self.slots = dict(slots or {})
+        self.location = location  # PrayerLocation (None = default location)
+
+    def __repr__(self):
+        return f"<ChannelSchedule {self.channel_id} {self.timezone or 'local'} {len(self.slots)} slots>"
+
+
+def load_channel_schedules(path, default_slots=None):
+    """Load channel schedules from a JSON file, skipping invalid entries"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    defaults = data.get("defaults") or default_slots or {}
+    schedules = []
+    for entry in data.get("channels", []):
+        channel_id = entry.get("channel_id")
+        try:
+            if not channel_id:
+                raise ValueError("missing channel_id")
+            slots = entry.get("slots") or defaults
+            location = None
+            if entry.get("latitude") is not None and entry.get("longitude") is not None:
+                location = PrayerLocation(
+                    entry["latitude"], entry["longitude"],
+                    entry.get("method", "MWL"), entry.get("asr", "shafi")
+                )
+            for time_str in slots.values():
+                if parse_prayer_slot(time_str) is None:
+                    parse_time(time_str)
+            schedules.append(ChannelSchedule(channel_id, entry.get("timezone"), slots, location))
+        except (ValueError, TypeError, ZoneInfoNotFoundError) as e:
+            logger.error(f"❌ Invalid schedule for channel {channel_id}: {e} - skipped")
+
+    logger.info(f"📅 Loaded schedules for {len(schedules)} channels from {path}")
+    return schedules
+
+def load_configured_channel_schedules(config):
+    """Channel schedules from the file named in BotConfig (None if unset or unreadable)"""
+    if not config.channel_schedules_file:
+        return None
+    try:
+        return load_channel_schedules(config.channel_schedules_file, config.get_schedule_times())
+    except Exception as e:
+        logger.error(f"❌ Could not load channel schedules: {e} - using the default schedule only")
+        return None
@@ -0,0 +1,165 @@
+"""
+Content Catalog
+Versioned JSON Lines catalog of Islamic content with an offset index,
+memory-mapped and decoded per content type on demand
+"""
+
+import hashlib
+import json
+import mmap
+import os
+from array import array
+from logger_config import setup_logger
+
+logger = setup_logger()
+
+CATALOG_FORMAT = "islamic-content"
+CATALOG_VERSION = 1
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "islamic_content.jsonl")
+
+class ContentCatalog:
+    def __init__(self, path=DEFAULT_CATALOG_PATH):
+        """Initialize catalog - nothing is read until content is requested"""
+        self.path = path
+        self.index_path = os.path.splitext(path)[0] + ".idx.json"
+        self.version = None
+        self._file = None
+        self._mmap = None
+        self._offsets = None   # content_type -> array of line offsets
+        self._loaded = {}      # content_type -> list of decoded texts
+
+    def _open(self):
+        """Memory-map the catalog and read its header line"""
+        if self._mmap is not None:
+            return
+
+        self._file = open(self.path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header = json.loads(self._mmap.readline())
+        if header.get("format") != CATALOG_FORMAT or header.get("version") != CATALOG_VERSION:
+            raise ValueError(f"Unsupported catalog {self.path}: {header}")
+        self.version = header["version"]
+
+    def _ensure_index(self):
+        if self._offsets is not None:
+            return
+        self._open()
+
+        index = self._read_index_file()
+        if index is None:
+            logger.warning(f"⚠️ Catalog index missing or stale, rebuilding: {self.index_path}")
+            index = self._build_index()
+            self._write_index_file(index)
+
+        self._offsets = {
+            content_type: array("Q", offsets) for content_type, offsets in index["types"].items()
+        }
+
+    def _read_index_file(self):
+        """Load the sidecar index if it matches the catalog file"""
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if (index.get("version") != self.version or index.get("size") != len(self._mmap)
+                or index.get("hash") != self._content_hash()):
+            return None
+        return index
+
+    def _content_hash(self):
+        # Keyed on the bytes, not the mtime: git checkouts and deploys reset mtimes,
+        # and an edit that keeps the byte size still changes the hash
+        return hashlib.blake2b(self._mmap, digest_size=16).hexdigest()
+
+    def _build_index(self):
+        """Scan the catalog once and record the offset of every item"""
+        types = {}
+        self._mmap.seek(0)
+        self._mmap.readline()  # header
+        while True:
+            offset = self._mmap.tell()
+            line = self._mmap.readline()
+            if not line:
+                break
+            if line.strip():
+                types.setdefault(json.loads(line)["type"], []).append(offset)
+        return {"version": self.version, "size": len(self._mmap), "hash": self._content_hash(), "types": types}
+
+    def _write_index_file(self, index):
+        try:
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(index, f)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            # Read-only deployments just keep the in-memory index
+            logger.debug(f"Could not write catalog index: {e}")
+
+    def _read_item(self, offset):
+        end = self._mmap.find(b"\n", offset)
+        if end == -1:
+            end = len(self._mmap)
+        return json.loads(self._mmap[offset:end])["text"]
+
+    def content_types(self):
+        """Return all content types in the catalog"""
+        self._ensure_index()
+        return list(self._offsets)
+
+    def count(self, content_type):
+        """Return the number of items of a content type (0 if unknown)"""
+        self._ensure_index()
+        offsets = self._offsets.get(content_type)
+        return len(offsets) if offsets is not None else 0
+
+    def get(self, content_type, index):
+        """Return one item, decoding only that line unless the type is already loaded"""
+        loaded = self._loaded.get(content_type)
+        if loaded is not None:
+            return loaded[index]
+
+        self._ensure_index()
+        return self._read_item(self._offsets[content_type][index])
+
+    def items(self, content_type):
+        """Return (and keep) every item of a content type"""
+        loaded = self._loaded.get(content_type)
+        if loaded is None:
+            self._ensure_index()
+            loaded = [self._read_item(offset) for offset in self._offsets.get(content_type, ())]
+            self._loaded[content_type] = loaded
+        return loaded
+
+    def close(self):
+        """Unmap the catalog file"""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+            self._mmap = None
+            self._file = None
+
+
+def write_catalog(path, content):
+    """Write a {content_type: [texts]} dict as a catalog file plus its index"""
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        f.write(json.dumps({"format": CATALOG_FORMAT, "version": CATALOG_VERSION}) + "\n")
+        for content_type, texts in content.items():
+            for text in texts:
+                f.write(json.dumps({"type": content_type, "text": text}, ensure_ascii=False) + "\n")
+
+    catalog = ContentCatalog(path)
+    catalog._open()
+    catalog._write_index_file(catalog._build_index())
+    catalog.close()
+
+
+if __name__ == "__main__":
+    # Rebuild the index after editing the catalog by hand
+    catalog = ContentCatalog()
+    catalog._open()
+    catalog._write_index_file(catalog._build_index())
+    for content_type in catalog.content_types():
+        logger.info(f"   {content_type}: {catalog.count(content_type)} items")
@@ -0,0 +1,238 @@
+"""
+Content Selector
+No-repeat content selection: shuffled epochs without replacement, a
+"not posted in the last N days" window and per-channel history
+"""
+
+import random
+import threading
+from array import array
+from datetime import date
+from state_db import connect_state_db
+from logger_config import setup_logger
+
+logger = setup_logger()
+
+NEVER_POSTED = -(1 << 30)
+
+class _Lane:
+    """Selection state of one (channel, content_type)"""
+    __slots__ = ("size", "seed", "position", "order", "last_posted")
+
+    def __init__(self, size, seed, position=0):
+        self.size = size
+        self.last_posted = array("l", [NEVER_POSTED]) * size
+        self.start_epoch(seed, position)
+
+    def start_epoch(self, seed, position=0):
+        # The permutation is derived from the seed, so only the seed needs to be stored
+        self.seed = seed
+        self.position = position
+        self.order = array("I", range(self.size))
+        random.Random(seed).shuffle(self.order)
+
+
+class ContentSelector:
+    """In-memory selector - history is lost on restart"""
+
+    def __init__(self, no_repeat_days=0):
+        """Initialize selector with an optional no-repeat window in days"""
+        self.no_repeat_days = no_repeat_days
+        self._lanes = {}
+        self._lock = threading.Lock()
+
+    def pick(self, channel_id, content_type, size, day=None):
+        """Pick the index of the next item to post (amortized O(1))
+
+        `day` is the ordinal of the day the post goes out (default today), so posts
+        rendered ahead of time count against the right no-repeat window.
+        """
+        day = day if day is not None else date.today().toordinal()
+        key = (str(channel_id), content_type)
+
+        with self._lock:
+            lane = self._lanes.get(key)
+            if lane is None or lane.size != size:
+                lane = self._load_lane(key, size, lane)
+                self._lanes[key] = lane
+
+            item = self._next_item(lane, day)
+            lane.last_posted[item] = max(lane.last_posted[item], day)
+            self._record(key, lane, item, day)
+            return item
+
+    def _next_item(self, lane, day):
+        """Walk the permutation, skipping items posted inside the window"""
+        window = self.no_repeat_days
+        for _ in range(lane.size):
+            if lane.position >= lane.size:
+                lane.start_epoch(random.getrandbits(62))
+            item = lane.order[lane.position]
+            lane.position += 1
+            if window <= 0 or day - lane.last_posted[item] >= window:
+                return item
+
+        # Everything was posted recently (window longer than the catalog) - take the oldest
+        return min(range(lane.size), key=lane.last_posted.__getitem__)
+
+    def _load_lane(self, key, size, previous=None):
+        lane = _Lane(size, random.getrandbits(62))
+        if previous is not None:
+            # Catalog changed size: start a new epoch but keep the recent history
+            for item in range(min(size, previous.size)):
+                lane.last_posted[item] = previous.last_posted[item]
+        return lane
+
+    def _record(self, key, lane, item, day):
+        pass
+
+    def close(self):
+        """Release resources"""
+        pass
+
+
+class SQLiteContentSelector(ContentSelector):
+    """Selector whose epochs and history live in the state database
+
+    Every pick is one immediate transaction that re-reads the stored seed/position and
+    the history other processes added, so shard workers, replicas and webhook
+    instances sharing the database never repeat each other's picks.
+    """
+
+    def __init__(self, db_path, no_repeat_days=0, history_days=90):
+        """Open the state database"""
+        super().__init__(no_repeat_days)
+        self.db_path = db_path
+        self.history_days = max(history_days, no_repeat_days)
+        self._pruned_day = None
+        self._synced = {}   # lane key -> last content_history rowid merged into the lane
+        self._conn = connect_state_db(db_path)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS selector_epochs (
+                channel_id TEXT NOT NULL,
+                content_type TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                seed INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                PRIMARY KEY (channel_id, content_type)
+            );
+            CREATE TABLE IF NOT EXISTS content_history (
+                channel_id TEXT NOT NULL,
+                content_type TEXT NOT NULL,
+                item INTEGER NOT NULL,
+                day INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS content_history_lookup
+                ON content_history (channel_id, content_type, day);
+            """
+        )
+
+    def pick(self, channel_id, content_type, size, day=None):
+        """Pick the next item inside a write transaction (see ContentSelector.pick)"""
+        day = day if day is not None else date.today().toordinal()
+        key = (str(channel_id), content_type)
+
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock, so concurrent processes never read the same position
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                lane = self._lanes.get(key)
+                if lane is None or lane.size != size:
+                    lane = self._load_lane(key, size, lane)
+                    self._lanes[key] = lane
+                else:
+                    self._refresh_lane(key, lane)
+
+                item = self._next_item(lane, day)
+                lane.last_posted[item] = max(lane.last_posted[item], day)
+                self._record(key, lane, item, day)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return item
+
+    def _refresh_lane(self, key, lane):
+        """Catch up with picks other processes stored since this lane was last used"""
+        row = self._conn.execute(
+            "SELECT size, seed, position FROM selector_epochs WHERE channel_id = ? AND content_type = ?",
+            key
+        ).fetchone()
+        if row and row[0] == lane.size:
+            if row[1] != lane.seed:
+                lane.start_epoch(row[1], row[2])
+            else:
+                lane.position = row[2]
+        self._merge_history(key, lane, self._synced.get(key, 0))
+
+    def _merge_history(self, key, lane, after_rowid):
+        rows = self._conn.execute(
+            """
+            SELECT rowid, item, day FROM content_history
+            WHERE channel_id = ? AND content_type = ? AND rowid > ?
+            """,
+            (*key, after_rowid)
+        )
+        for rowid, item, day in rows:
+            if item < lane.size and day > lane.last_posted[item]:
+                lane.last_posted[item] = day
+            after_rowid = max(after_rowid, rowid)
+        self._synced[key] = after_rowid
+
+    def _load_lane(self, key, size, previous=None):
+        """Restore a lane from its stored seed/position and the recent history"""
+        row = self._conn.execute(
+            "SELECT size, seed, position FROM selector_epochs WHERE channel_id = ? AND content_type = ?",
+            key
+        ).fetchone()
+
+        if row and row[0] == size:
+            lane = _Lane(size, row[1], row[2])
+        else:
+            lane = _Lane(size, random.getrandbits(62))
+
+        self._merge_history(key, lane, 0)
+        return lane
+
+    def _record(self, key, lane, item, day):
+        """Store the new position and the posted item (inside pick's transaction)"""
+        self._conn.execute(
+            """
+            INSERT INTO selector_epochs (channel_id, content_type, size, seed, position)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (channel_id, content_type)
+            DO UPDATE SET size = excluded.size, seed = excluded.seed, position = excluded.position
+            """,
+            (*key, lane.size, lane.seed, lane.position)
+        )
+        cursor = self._conn.execute(
+            "INSERT INTO content_history (channel_id, content_type, item, day) VALUES (?, ?, ?, ?)",
+            (*key, item, day)
+        )
+        self._synced[key] = max(self._synced.get(key, 0), cursor.lastrowid)
+        if self._pruned_day != day:
+            self._conn.execute(
+                "DELETE FROM content_history WHERE day < ?", (day - self.history_days,)
+            )
+            self._pruned_day = day
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+
+def create_content_selector(mode="rotate", db_path=None, no_repeat_days=0):
+    """Create the selector for a selection mode (None for plain rotation, SQLite when a path is given)"""
+    if mode != "shuffle":
+        return None
+
+    if not db_path:
+        return ContentSelector(no_repeat_days)
+
+    try:
+        return SQLiteContentSelector(db_path, no_repeat_days)
+    except Exception as e:
+        logger.error(f"❌ Could not open selector database {db_path}: {e} - falling back to memory")
+        return ContentSelector(no_repeat_days)
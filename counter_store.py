@@ -0,0 +1,367 @@
+"""
+Counter Store
+Storage backends for the azkar counter (in-memory and SQLite write-behind)
+"""
+
+import heapq
+import os
+import sqlite3
+import threading
+import time
+import atexit
+from array import array
+from state_db import connect_state_db
+from logger_config import setup_logger
+
+logger = setup_logger()
+
+class CounterStore:
+    """In-memory counter store - fast but lost on every restart
+
+    All counts live in one flat array: row r holds one user's counts, one 4-byte
+    slot per azkar key ordinal. The user id -> row dict is the only per-user
+    Python object, so a cached user costs about 100 bytes instead of a dict of dicts.
+    """
+
+    def __init__(self, azkar_keys=()):
+        """Initialize empty in-memory counters"""
+        self._keys = []            # ordinal -> azkar key
+        self._ordinals = {}        # azkar key -> ordinal
+        self._rows = {}            # user_id (int) -> row
+        self._free = []            # rows of evicted users, reused first
+        self._slab = array("I")    # row * width + ordinal -> count
+        self._seen = array("I")    # row -> last access (seconds since _epoch)
+        self._epoch = time.monotonic()
+        self._lock = threading.Lock()
+        self.register_keys(azkar_keys)
+
+    def __len__(self):
+        """Number of users held in memory"""
+        return len(self._rows)
+
+    def register_keys(self, azkar_keys):
+        """Give azkar keys their slots up front (unknown keys are added on first use)"""
+        with self._lock:
+            for azkar_key in azkar_keys:
+                self._ordinal(azkar_key)
+
+    def _ordinal(self, azkar_key):
+        ordinal = self._ordinals.get(azkar_key)
+        if ordinal is None:
+            # New key: widen every row by one slot (normally only at startup, before any user)
+            width = len(self._keys)
+            ordinal = width
+            self._keys.append(azkar_key)
+            self._ordinals[azkar_key] = ordinal
+            if len(self._seen):
+                slab = array("I")
+                for row in range(len(self._seen)):
+                    slab.extend(self._slab[row * width:(row + 1) * width])
+                    slab.append(0)
+                self._slab = slab
+        return ordinal
+
+    def _load_user(self, user_id):
+        """Stored counts of a user not in memory as (azkar_key, count) pairs (nothing in memory)"""
+        return []
+
+    def _row(self, user_id, create=True):
+        """Row of a user, loading it on a cache miss (None if the user has no counts and create is False)"""
+        row = self._rows.get(user_id)
+        if row is None:
+            stored = self._load_user(user_id)
+            if not stored and not create:
+                return None
+            row = self._new_row(user_id)
+            for azkar_key, count in stored:
+                ordinal = self._ordinal(azkar_key)
+                self._slab[row * len(self._keys) + ordinal] = count
+        self._seen[row] = int(time.monotonic() - self._epoch)
+        return row
+
+    def _new_row(self, user_id):
+        width = len(self._keys)
+        if self._free:
+            row = self._free.pop()
+            for index in range(row * width, (row + 1) * width):
+                self._slab[index] = 0
+        else:
+            row = len(self._seen)
+            self._slab.extend(array("I", bytes(4 * width)))
+            self._seen.append(0)
+        self._rows[user_id] = row
+        return row
+
+    def _mark_dirty(self, user_id, ordinal):
+        pass
+
+    def get_counts(self, user_id):
+        """Return all non-zero counts of a user as {azkar_key: count}"""
+        user_id = int(user_id)
+        with self._lock:
+            row = self._row(user_id, create=False)
+            if row is None:
+                return {}
+            width = len(self._keys)
+            base = row * width
+            return {
+                azkar_key: self._slab[base + ordinal]
+                for ordinal, azkar_key in enumerate(self._keys)
+                if self._slab[base + ordinal]
+            }
+
+    def get(self, user_id, azkar_key):
+        """Return the count of one azkar for a user"""
+        user_id = int(user_id)
+        with self._lock:
+            row = self._row(user_id, create=False)
+            if row is None:
+                return 0
+            ordinal = self._ordinal(azkar_key)
+            return self._slab[row * len(self._keys) + ordinal]
+
+    def increment(self, user_id, azkar_key, amount=1):
+        """Increment a counter and return its new value"""
+        user_id = int(user_id)
+        with self._lock:
+            ordinal = self._ordinal(azkar_key)
+            index = self._row(user_id) * len(self._keys) + ordinal
+            value = self._slab[index] + amount
+            self._slab[index] = value
+            self._mark_dirty(user_id, ordinal)
+            return value
+
+    def set_count(self, user_id, azkar_key, value):
+        """Set a counter to an explicit value"""
+        user_id = int(user_id)
+        with self._lock:
+            ordinal = self._ordinal(azkar_key)
+            self._slab[self._row(user_id) * len(self._keys) + ordinal] = value
+            self._mark_dirty(user_id, ordinal)
+
+    def reset_user(self, user_id):
+        """Clear all counters of a user"""
+        user_id = int(user_id)
+        with self._lock:
+            row = self._rows.get(user_id)
+            if row is not None:
+                width = len(self._keys)
+                for index in range(row * width, (row + 1) * width):
+                    self._slab[index] = 0
+
+    def evict_idle(self, idle_seconds, max_users=None):
+        """Drop idle users from memory (nothing to evict to for the in-memory store)"""
+        return 0
+
+    def flush(self):
+        """Persist pending changes (no-op for the in-memory store)"""
+        return 0
+
+    def close(self):
+        """Release resources"""
+        self.flush()
+
+
+class SQLiteCounterStore(CounterStore):
+    """SQLite (WAL) backed store with an in-memory hot cache and write-behind flushes"""
+
+    def __init__(self, db_path, flush_interval_ms=500, idle_seconds=1800, max_users=0):
+        """Open (or recover) the database and start the background flusher"""
+        super().__init__()
+        self.db_path = db_path
+        self.flush_interval = max(flush_interval_ms, 10) / 1000.0
+        self.idle_seconds = idle_seconds    # flushed users idle this long are dropped from memory
+        self.max_users = max_users          # 0 = no cap on cached users
+        self.evict_interval = 60
+        self._dirty = set()          # (user_id, ordinal) changed since last flush
+        self._reset_users = set()    # users whose rows must be deleted on next flush
+        self._db_lock = threading.Lock()
+        self._stop = threading.Event()
+
+        self._conn = self._open_database()
+
+        self._flush_thread = threading.Thread(
+            target=self._flush_loop, daemon=True, name="CounterStore-Flush"
+        )
+        self._flush_thread.start()
+        atexit.register(self.close)
+
+    def _open_database(self):
+        """Open the database, moving a corrupt file aside so the bot keeps working"""
+        try:
+            conn = self._connect()
+            result = conn.execute("PRAGMA quick_check").fetchone()
+            if result and result[0] == "ok":
+                return conn
+            conn.close()
+            logger.error(f"❌ Counter database {self.db_path} failed integrity check: {result}")
+        except sqlite3.DatabaseError as e:
+            logger.error(f"❌ Counter database {self.db_path} is unreadable: {e}")
+
+        corrupt_path = f"{self.db_path}.corrupt-{int(time.time())}"
+        try:
+            os.replace(self.db_path, corrupt_path)
+            logger.warning(f"⚠️ Moved corrupt counter database to {corrupt_path}")
+        except OSError as e:
+            logger.error(f"❌ Could not move corrupt counter database: {e}")
+        return self._connect()
+
+    def _connect(self):
+        conn = connect_state_db(self.db_path)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS azkar_counts (
+                user_id TEXT NOT NULL,
+                azkar_key TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (user_id, azkar_key)
+            ) WITHOUT ROWID
+            """
+        )
+        return conn
+
+    def _load_user(self, user_id):
+        """Cache miss - read the user's rows from disk"""
+        with self._db_lock:
+            return self._conn.execute(
+                "SELECT azkar_key, count FROM azkar_counts WHERE user_id = ?", (str(user_id),)
+            ).fetchall()
+
+    def _mark_dirty(self, user_id, ordinal):
+        self._dirty.add((user_id, ordinal))
+
+    def reset_user(self, user_id):
+        """Clear all counters of a user (deleted from disk on next flush)"""
+        user_id = int(user_id)
+        with self._lock:
+            row = self._rows.get(user_id)
+            if row is None:
+                # Not cached: a zeroed row keeps the old counts on disk from being loaded back before the flush
+                row = self._new_row(user_id)
+            else:
+                width = len(self._keys)
+                for index in range(row * width, (row + 1) * width):
+                    self._slab[index] = 0
+            self._seen[row] = int(time.monotonic() - self._epoch)
+            self._reset_users.add(user_id)
+
+    def evict_idle(self, idle_seconds, max_users=None):
+        """Drop users idle for idle_seconds (and the oldest beyond max_users) from memory
+
+        Only users without unflushed changes are dropped - their counts are on disk
+        and are read back on their next tap. Returns the number of users evicted.
+        """
+        with self._lock:
+            pending = {user_id for user_id, _ in self._dirty} | self._reset_users
+            cutoff = int(time.monotonic() - self._epoch) - idle_seconds
+            idle = [user_id for user_id, row in self._rows.items()
+                    if self._seen[row] < cutoff and user_id not in pending]
+            if max_users and len(self._rows) - len(idle) > max_users:
+                idle_set = set(idle)
+                candidates = [(self._seen[row], user_id) for user_id, row in self._rows.items()
+                              if user_id not in idle_set and user_id not in pending]
+                extra = len(self._rows) - len(idle) - max_users
+                idle.extend(user_id for _, user_id in heapq.nsmallest(extra, candidates))
+
+            for user_id in idle:
+                self._free.append(self._rows.pop(user_id))
+            if len(self._free) > len(self._rows):
+                self._compact()
+        if idle:
+            logger.debug(f"🧹 Evicted {len(idle)} idle users from the counter cache")
+        return len(idle)
+
+    def _compact(self):
+        """Rebuild the slab without free rows so memory shrinks after a burst of users"""
+        width = len(self._keys)
+        slab, seen = array("I"), array("I")
+        for new_row, (user_id, row) in enumerate(list(self._rows.items())):
+            slab.extend(self._slab[row * width:(row + 1) * width])
+            seen.append(self._seen[row])
+            self._rows[user_id] = new_row
+        self._slab, self._seen, self._free = slab, seen, []
+
+    def flush(self):
+        """Write all pending changes in a single transaction, returns rows written"""
+        with self._lock:
+            if not self._dirty and not self._reset_users:
+                return 0
+            dirty, self._dirty = self._dirty, set()
+            reset_users, self._reset_users = self._reset_users, set()
+            now = time.time()
+            rows = []
+            width = len(self._keys)
+            for user_id, ordinal in dirty:
+                row = self._rows.get(user_id)
+                if row is not None:
+                    rows.append((str(user_id), self._keys[ordinal], self._slab[row * width + ordinal], now))
+
+        try:
+            with self._db_lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    if reset_users:
+                        self._conn.executemany(
+                            "DELETE FROM azkar_counts WHERE user_id = ?",
+                            [(str(user_id),) for user_id in reset_users]
+                        )
+                    self._conn.executemany(
+                        """
+                        INSERT INTO azkar_counts (user_id, azkar_key, count, updated_at)
+                        VALUES (?, ?, ?, ?)
+                        ON CONFLICT (user_id, azkar_key)
+                        DO UPDATE SET count = excluded.count, updated_at = excluded.updated_at
+                        """,
+                        rows
+                    )
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+        except Exception as e:
+            # Put the changes back so the next flush retries them
+            with self._lock:
+                self._dirty |= dirty
+                self._reset_users |= reset_users
+            logger.error(f"❌ Counter flush failed ({len(rows)} rows): {e}")
+            return 0
+
+        logger.debug(f"💾 Flushed {len(rows)} counter rows")
+        return len(rows)
+
+    def _flush_loop(self):
+        """Background write-behind loop (also evicts idle users once a minute)"""
+        last_eviction = time.monotonic()
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+                if self.idle_seconds and time.monotonic() - last_eviction >= self.evict_interval:
+                    last_eviction = time.monotonic()
+                    self.evict_idle(self.idle_seconds, self.max_users)
+            except Exception as e:
+                logger.error(f"❌ Counter flush loop error: {e}")
+
+    def close(self):
+        """Stop the flusher and write everything that is still pending"""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
+
+
+def create_counter_store(db_path=None, flush_interval_ms=500, idle_seconds=1800, max_users=0):
+    """Create the configured counter store (SQLite when a path is given)"""
+    if not db_path:
+        logger.info("📿 Using in-memory azkar counter store")
+        return CounterStore()
+
+    try:
+        store = SQLiteCounterStore(db_path, flush_interval_ms, idle_seconds, max_users)
+        logger.info(f"📿 Using SQLite azkar counter store: {db_path} (flush every {flush_interval_ms}ms)")
+        return store
+    except Exception as e:
+        logger.error(f"❌ Could not open counter database {db_path}: {e} - falling back to memory")
+        return CounterStore()
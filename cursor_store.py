@@ -0,0 +1,85 @@
+"""
+Cursor Store
+Rotation cursors for content selection, shared by every process using the same state DB
+"""
+
+import threading
+from state_db import connect_state_db
+from logger_config import setup_logger
+
+logger = setup_logger()
+
+class CursorStore:
+    """In-memory cursors - reset on restart and private to this process"""
+
+    def __init__(self):
+        """Initialize empty cursors"""
+        self._positions = {}
+        self._lock = threading.Lock()
+
+    def next_index(self, name, modulo):
+        """Return the current position of a cursor (mod modulo) and advance it"""
+        with self._lock:
+            position = self._positions.get(name, 0)
+            self._positions[name] = position + 1
+        return position % modulo
+
+    def close(self):
+        """Release resources"""
+        pass
+
+
+class SQLiteCursorStore(CursorStore):
+    """Durable cursors, atomically advanced with an immediate transaction"""
+
+    def __init__(self, db_path):
+        """Open the state database"""
+        super().__init__()
+        self.db_path = db_path
+        self._conn = connect_state_db(db_path)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS content_cursors (
+                name TEXT PRIMARY KEY,
+                position INTEGER NOT NULL
+            )
+            """
+        )
+
+    def next_index(self, name, modulo):
+        """Return the current position of a cursor (mod modulo) and advance it"""
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock, so concurrent workers never read the same position
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO content_cursors (name, position) VALUES (?, 0)", (name,)
+                )
+                position = self._conn.execute(
+                    "SELECT position FROM content_cursors WHERE name = ?", (name,)
+                ).fetchone()[0]
+                self._conn.execute(
+                    "UPDATE content_cursors SET position = position + 1 WHERE name = ?", (name,)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return position % modulo
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+
+def create_cursor_store(db_path=None):
+    """Create the configured cursor store (SQLite when a path is given)"""
+    if not db_path:
+        return CursorStore()
+
+    try:
+        return SQLiteCursorStore(db_path)
+    except Exception as e:
+        logger.error(f"❌ Could not open cursor database {db_path}: {e} - falling back to memory")
+        return CursorStore()
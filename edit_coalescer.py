@@ -0,0 +1,105 @@
+"""
+Edit Coalescer
+Collapses bursts of message edits so only the latest state is sent, at a bounded rate
+"""
+
+import heapq
+import threading
+import time
+from metrics import EDITS
+from logger_config import setup_logger
+
+logger = setup_logger()
+
+class EditCoalescer:
+    def __init__(self, bot, min_interval_ms=1000):
+        """Initialize coalescer for a telebot instance"""
+        self.bot = bot
+        self.min_interval = min_interval_ms / 1000.0
+        self._pending = {}      # (chat_id, message_id) -> (text, reply_markup)
+        self._due = []          # heap of (due_time, key)
+        self._last_sent = {}    # key -> monotonic time of last edit
+        self._cond = threading.Condition()
+
+        self._thread = threading.Thread(target=self._run, daemon=True, name="EditCoalescer")
+        self._thread.start()
+
+    def submit(self, chat_id, message_id, text, reply_markup=None):
+        """Queue an edit; replaces any edit still waiting for the same message"""
+        key = (chat_id, message_id)
+        with self._cond:
+            EDITS.labels("submitted").inc()
+            if key in self._pending:
+                EDITS.labels("coalesced").inc()
+                self._pending[key] = (text, reply_markup)
+                return
+
+            self._pending[key] = (text, reply_markup)
+            now = time.monotonic()
+            due = max(now, self._last_sent.get(key, 0) + self.min_interval)
+            heapq.heappush(self._due, (due, key))
+            self._cond.notify()
+
+    def discard(self, chat_id, message_id):
+        """Drop a pending edit (the message is about to be replaced by something else)"""
+        with self._cond:
+            if self._pending.pop((chat_id, message_id), None) is not None:
+                EDITS.labels("coalesced").inc()
+
+    def pending(self):
+        """Number of edits waiting to be sent"""
+        with self._cond:
+            return len(self._pending)
+
+    def _next_edit(self):
+        """Block until an edit is due, then pop it"""
+        with self._cond:
+            while True:
+                if not self._due:
+                    self._cond.wait()
+                    continue
+
+                due, key = self._due[0]
+                if key not in self._pending:
+                    heapq.heappop(self._due)  # discarded
+                    continue
+
+                now = time.monotonic()
+                if due > now:
+                    self._cond.wait(due - now)
+                    continue
+
+                heapq.heappop(self._due)
+                text, reply_markup = self._pending.pop(key)
+                self._last_sent[key] = now
+                self._prune_last_sent(now)
+                return key, text, reply_markup
+
+    def _prune_last_sent(self, now):
+        # Only entries younger than the interval can still delay an edit
+        if len(self._last_sent) > 1024:
+            cutoff = now - self.min_interval
+            self._last_sent = {k: t for k, t in self._last_sent.items() if t > cutoff}
+
+    def _run(self):
+        """Background sender loop"""
+        while True:
+            try:
+                (chat_id, message_id), text, reply_markup = self._next_edit()
+            except Exception as e:
+                logger.error(f"❌ Edit coalescer error: {e}")
+                time.sleep(1)
+                continue
+
+            try:
+                self.bot.edit_message_text(text, chat_id, message_id, reply_markup=reply_markup)
+                result = "sent"
+            except Exception as e:
+                if "message is not modified" in str(e).lower():
+                    result = "not_modified"
+                    logger.debug(f"Edit skipped, message not modified: {chat_id}/{message_id}")
+                else:
+                    result = "failed"
+                    logger.warning(f"⚠️ Edit message failed for {chat_id}/{message_id}: {e}")
+
+            EDITS.labels(result).inc()
@@ -0,0 +1,231 @@
+"""
+Event Scheduler
+Heap-based daily job scheduler that sleeps exactly until the next due job
+"""
+
+import heapq
+import itertools
+import threading
+from collections import deque
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+from metrics import SCHEDULER_LAG
+from logger_config import setup_logger
+
+logger = setup_logger()
+
+class SystemClock:
+    """Wall clock used in production"""
+
+    def now(self):
+        return datetime.now(timezone.utc)
+
+    def wait(self, condition, timeout):
+        condition.wait(timeout)
+
+
+class FakeClock:
+    """Manually advanced clock for tests and simulations"""
+
+    def __init__(self, start):
+        self.current = start
+
+    def now(self):
+        return self.current
+
+    def advance(self, seconds):
+        self.current += timedelta(seconds=seconds)
+
+    def wait(self, condition, timeout):
+        # Jump straight to the wake-up time instead of sleeping
+        if timeout is not None:
+            self.advance(timeout)
+
+
+def parse_time(time_str):
+    """Parse "HH:MM" or "HH:MM:SS" into a datetime.time"""
+    parts = [int(part) for part in time_str.split(":")]
+    return time(*parts)
+
+def resolve_timezone(name):
+    """Return a tzinfo for a zone name (None = server local time, DST-aware)"""
+    if not name:
+        return None
+    return ZoneInfo(name)
+
+
+class DailyJob:
+    """A callback that runs every day at a wall-clock time in a timezone
+
+    `at` may also be a function date -> aware datetime for times that move
+    every day (e.g. prayer times); the date is the local date in `tz`.
+    """
+    __slots__ = ("job_id", "at", "tz", "callback", "args", "tag", "next_run", "last_run", "last_lag", "cancelled")
+
+    def __init__(self, job_id, at, tz, callback, args, tag):
+        self.job_id = job_id
+        self.at = at
+        self.tz = tz
+        self.callback = callback
+        self.args = args
+        self.tag = tag
+        self.next_run = None
+        self.last_run = None
+        self.last_lag = None
+        self.cancelled = False
+
+    def compute_next_run(self, after):
+        """First occurrence strictly after `after`, as an aware UTC datetime"""
+        # tz None: naive datetimes are interpreted in the server's local time by astimezone()
+        local_after = after.astimezone(self.tz)
+        day = local_after.date()
+        if callable(self.at):
+            # A moving time may fall just before local midnight, so start one day earlier
+            day -= timedelta(days=1)
+            for _ in range(3):
+                candidate = self.at(day)
+                if candidate > after:
+                    return candidate
+                day += timedelta(days=1)
+            raise ValueError(f"{self!r} has no run after {after}")
+        while True:
+            candidate = datetime.combine(day, self.at, tzinfo=self.tz).astimezone(timezone.utc)
+            if candidate > after:
+                return candidate
+            day += timedelta(days=1)
+
+    def __repr__(self):
+        at = getattr(self.at, "spec", "dynamic") if callable(self.at) else self.at.strftime('%H:%M')
+        return f"<DailyJob {self.tag} at {at} {self.tz or 'local'} next={self.next_run}>"
+
+
+class EventScheduler:
+    def __init__(self, clock=None, guard=None, catch_up_seconds=300):
+        """Initialize an empty scheduler
+
+        guard() is checked before each due job (e.g. "is this replica the leader").
+        Jobs skipped by the guard are kept for catch_up_seconds and run if the guard
+        passes again within that window - a standby that takes over just after a
+        slot still posts it.
+        """
+        self.clock = clock or SystemClock()
+        self.guard = guard
+        self.catch_up = timedelta(seconds=catch_up_seconds)
+        self._missed = deque()   # (job, planned) skipped by the guard, oldest first
+        self._heap = []   # (next_run, sequence, job) - cancelled jobs are skipped lazily
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+
+    def _push(self, job):
+        heapq.heappush(self._heap, (job.next_run, next(self._sequence), job))
+
+    def add_daily(self, at, callback, *args, tz=None, tag=None):
+        """Schedule callback(*args) every day at `at` ("HH:MM", time or date -> datetime function) in timezone `tz`"""
+        at = parse_time(at) if isinstance(at, str) else at
+        tz = resolve_timezone(tz) if tz is None or isinstance(tz, str) else tz
+
+        with self._cond:
+            job = DailyJob(next(self._ids), at, tz, callback, args, tag)
+            job.next_run = job.compute_next_run(self.clock.now())
+            self._jobs[job.job_id] = job
+            self._push(job)
+            self._cond.notify_all()  # the new job may be due before the current sleep ends
+        return job
+
+    def cancel(self, job):
+        """Remove one job"""
+        with self._cond:
+            job.cancelled = True
+            self._jobs.pop(job.job_id, None)
+            self._cond.notify_all()
+
+    def clear(self, tag=None):
+        """Remove all jobs (or all jobs with a tag)"""
+        with self._cond:
+            for job in list(self._jobs.values()):
+                if tag is None or job.tag == tag:
+                    job.cancelled = True
+                    del self._jobs[job.job_id]
+            if tag is None:
+                self._heap = []
+            self._cond.notify_all()
+
+    @property
+    def jobs(self):
+        """All active jobs"""
+        with self._cond:
+            return list(self._jobs.values())
+
+    def interrupt(self):
+        """Wake the run loop so it re-reads the schedule"""
+        with self._cond:
+            self._cond.notify_all()
+
+    def _peek(self):
+        while self._heap and self._heap[0][2].cancelled:
+            heapq.heappop(self._heap)
+        return self._heap[0][2] if self._heap else None
+
+    def next_run_time(self):
+        """Time of the next due job (None if no jobs)"""
+        with self._cond:
+            job = self._peek()
+            return job.next_run if job else None
+
+    def _pop_due(self, now):
+        due = []
+        while True:
+            job = self._peek()
+            if job is None or job.next_run > now:
+                return due
+            heapq.heappop(self._heap)
+            due.append((job, job.next_run))
+            job.next_run = job.compute_next_run(max(now, job.next_run))
+            self._push(job)
+
+    def _run_job(self, job, planned, now):
+        job.last_run = now
+        job.last_lag = (now - planned).total_seconds()
+        SCHEDULER_LAG.labels(job.tag or "job").observe(job.last_lag)
+        try:
+            job.callback(*job.args)
+        except Exception as e:
+            logger.error(f"❌ Scheduled job {job.tag or job.job_id} failed: {e}")
+
+    def run_pending(self):
+        """Run every job that is due now, returns the number of jobs run"""
+        with self._cond:
+            now = self.clock.now()
+            due = self._pop_due(now)
+            while self._missed and now - self._missed[0][1] > self.catch_up:
+                self._missed.popleft()
+
+            if self.guard is not None and not self.guard():
+                self._missed.extend(due)
+                return 0
+            # Guard passes again: skipped jobs still within the catch-up window run first
+            due = [(job, planned) for job, planned in self._missed if not job.cancelled] + due
+            self._missed.clear()
+
+        for job, planned in due:
+            self._run_job(job, planned, now)
+        return len(due)
+
+    def run_forever(self, stop_event=None):
+        """Sleep until the next job is due, run it, repeat"""
+        while stop_event is None or not stop_event.is_set():
+            with self._cond:
+                job = self._peek()
+                if job is None:
+                    timeout = 3600
+                else:
+                    timeout = (job.next_run - self.clock.now()).total_seconds()
+                if self._missed and (self.guard is None or self.guard()):
+                    timeout = 0  # catch up on skipped jobs now
+                if timeout > 0:
+                    # notify_all() from add/cancel/clear/interrupt ends the wait early
+                    self.clock.wait(self._cond, min(timeout, 3600))
+                    continue
+            self.run_pending()
@@ -0,0 +1,103 @@
+"""
+Fan-out Publisher
+Sends the same post to many channels/groups concurrently within Telegram's rate limits
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from rate_limit import TokenBucket
+from prerender import render_post
+from message_splitter import split_message
+from telegram_bot import DEFERRED
+from logger_config import setup_logger
+
+logger = setup_logger()
+
+# Telegram limits: ~30 messages/sec overall, 1/sec per chat, 20/min per group
+GLOBAL_RATE = 30
+CHAT_RATE = 1
+GROUP_RATE = 20 / 60
+
+def is_group_chat(chat_id):
+    """Groups have negative ids without the -100 prefix used by channels and supergroups"""
+    chat_id = str(chat_id)
+    return chat_id.startswith("-") and not chat_id.startswith("-100")
+
+class FanoutPublisher:
+    def __init__(self, telegram_bot, destinations, workers=8, global_rate=GLOBAL_RATE):
+        """Initialize publisher for a list of chat ids"""
+        self.telegram_bot = telegram_bot
+        self.destinations = list(destinations)
+        self.workers = workers
+        self.global_bucket = TokenBucket(global_rate)
+        self._chat_buckets = {}
+        self._buckets_lock = threading.Lock()
+
+    def _chat_bucket(self, chat_id):
+        with self._buckets_lock:
+            bucket = self._chat_buckets.get(chat_id)
+            if bucket is None:
+                rate = GROUP_RATE if is_group_chat(chat_id) else CHAT_RATE
+                bucket = TokenBucket(rate, capacity=1)
+                self._chat_buckets[chat_id] = bucket
+            return bucket
+
+    def _deliver(self, chat_id, send, cost=1):
+        """Send to one destination after waiting for both buckets (`cost` = messages in the batch)"""
+        started = time.monotonic()
+        throttled = self._chat_bucket(chat_id).acquire(cost) + self.global_bucket.acquire(cost)
+        try:
+            result = send(chat_id)
+            error = None
+        except Exception as e:
+            result = False
+            error = str(e)
+
+        return {
+            "chat_id": chat_id,
+            "success": result is True,
+            "deferred": result == DEFERRED,  # rate limited - the retry queue finishes it
+            "latency": time.monotonic() - started,
+            "throttled": throttled,
+            "error": error
+        }
+
+    def publish(self, send, destinations=None, cost=1):
+        """Run send(chat_id) for every destination concurrently, returns per-destination results"""
+        destinations = destinations or self.destinations
+        if not destinations:
+            return []
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(destinations)),
+                                thread_name_prefix="Fanout") as executor:
+            results = list(executor.map(lambda chat_id: self._deliver(chat_id, send, cost), destinations))
+
+        self._log_results(results)
+        return results
+
+    def publish_message(self, message, destinations=None, on_result=None):
+        """Send a message to every destination
+
+        on_result(chat_id, sent) reports the outcome of destinations that were deferred.
+        """
+        def send(chat_id):
+            report = on_result and (lambda sent: on_result(chat_id, sent))
+            return self.telegram_bot.send_message(message, chat_id=chat_id, on_result=report)
+        return self.publish(send, destinations, cost=len(split_message(message)))
+
+    def publish_formatted(self, content_type, content, destinations=None, on_result=None):
+        """Send formatted content to every destination (rendered once for all of them)"""
+        message, problems = render_post(self.telegram_bot, content_type, content)
+        if problems:
+            logger.warning(f"⚠️ Fixed {content_type} message before fan-out: {'; '.join(problems)}")
+        return self.publish_message(message, destinations, on_result)
+
+    def _log_results(self, results):
+        delivered = sum(1 for result in results if result["success"])
+        deferred = sum(1 for result in results if result["deferred"])
+        slowest = max(result["latency"] for result in results)
+        logger.info(f"📡 Fan-out delivered {delivered}/{len(results)}, {deferred} queued (slowest {slowest:.2f}s)")
+        for result in results:
+            if not result["success"] and not result["deferred"]:
+                logger.error(f"❌ Fan-out to {result['chat_id']} failed: {result['error'] or 'send returned False'}")
@@ -1,7 +1,8 @@
 
-from flask import Flask
+from flask import Flask, Response
 from threading import Thread
 import socket
+from metrics import REGISTRY, CONTENT_TYPE
 
 app = Flask('')
 
@@ -9,6 +10,11 @@ app = Flask('')
 def home():
     return "أنا شغال تمام 😎"
 
+@app.route('/metrics')
+def metrics():
+    # Prometheus scrape endpoint
+    return Response(REGISTRY.render(), headers={"Content-Type": CONTENT_TYPE})
+
 def run():
     app.run(host='0.0.0.0', port=8080)
 
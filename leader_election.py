@@ -0,0 +1,181 @@
+"""
+Leader Election
+Lease-based election so only one replica runs the scheduled posting jobs
+"""
+
+import atexit
+import os
+import socket
+import threading
+import time
+import uuid
+from state_db import connect_state_db
+from logger_config import setup_logger
+
+logger = setup_logger()
+
+class MemoryLeaseBackend:
+    """Leases inside one process - for a single replica and for tests"""
+
+    def __init__(self):
+        """Initialize an empty lease table"""
+        self._leases = {}   # name -> (holder, expires_at)
+        self._lock = threading.Lock()
+
+    def try_acquire(self, name, holder, ttl, now):
+        """Take or renew the lease if it is free, expired or already ours"""
+        with self._lock:
+            current = self._leases.get(name)
+            if current is None or current[0] == holder or current[1] <= now:
+                self._leases[name] = (holder, now + ttl)
+                return True
+            return False
+
+    def release(self, name, holder):
+        """Give the lease up so another replica can take it right away"""
+        with self._lock:
+            if self._leases.get(name, (None,))[0] == holder:
+                del self._leases[name]
+
+    def holder(self, name):
+        """Current (holder, expires_at) or None"""
+        with self._lock:
+            return self._leases.get(name)
+
+
+class SQLiteLeaseBackend:
+    """Leases in the shared state database - works for replicas on one host or a shared volume
+
+    Another backend (Redis, etcd, a database server) only needs the same three methods.
+    """
+
+    def __init__(self, db_path):
+        """Open the database and create the lease table"""
+        self._conn = connect_state_db(db_path)
+        self._lock = threading.Lock()
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS leases (
+                name TEXT PRIMARY KEY,
+                holder TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+
+    def try_acquire(self, name, holder, ttl, now):
+        """Take or renew the lease if it is free, expired or already ours (one atomic statement)"""
+        with self._lock:
+            cursor = self._conn.execute(
+                """
+                INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT (name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at
+                WHERE leases.holder = excluded.holder OR leases.expires_at <= ?
+                """,
+                (name, holder, now + ttl, now)
+            )
+            return cursor.rowcount == 1
+
+    def release(self, name, holder):
+        """Give the lease up so another replica can take it right away"""
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder))
+
+    def holder(self, name):
+        """Current (holder, expires_at) or None"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT holder, expires_at FROM leases WHERE name = ?", (name,)
+            ).fetchone()
+
+
+class LeaderElector:
+    def __init__(self, backend, name="scheduler", ttl=10, holder_id=None, clock=time.time):
+        """Initialize the elector (call start() to begin heartbeating)
+
+        The leader renews its lease every ttl/3 seconds. If it dies, another replica
+        takes over at most ttl + ttl/3 seconds later.
+        """
+        self.backend = backend
+        self.name = name
+        self.ttl = ttl
+        self.interval = ttl / 3
+        self.holder_id = holder_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.clock = clock
+        self.on_elected = None   # called (from the heartbeat thread) when this replica becomes leader
+        self.on_demoted = None   # called when it loses the lease
+        self._leader = False
+        self._expires_at = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def is_leader(self):
+        """True while this replica holds an unexpired lease"""
+        return self._leader and self.clock() < self._expires_at
+
+    def step(self):
+        """Try to take or renew the lease once, returns whether we are leader"""
+        now = self.clock()
+        try:
+            held = self.backend.try_acquire(self.name, self.holder_id, self.ttl, now)
+        except Exception as e:
+            # Keep acting only while the last renewal is still valid
+            logger.error(f"❌ Lease heartbeat failed: {e}")
+            held = self.is_leader
+        else:
+            if held:
+                self._expires_at = now + self.ttl
+
+        if held and not self._leader:
+            self._leader = True
+            logger.info(f"👑 {self.holder_id} is now the {self.name} leader")
+            self._notify(self.on_elected)
+        elif not held and self._leader:
+            self._leader = False
+            logger.warning(f"⚠️ {self.holder_id} lost the {self.name} lease - standing by")
+            self._notify(self.on_demoted)
+        return held
+
+    def _notify(self, callback):
+        if callback is None:
+            return
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"❌ Leader change callback failed: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.step()
+
+    def start(self):
+        """Start the background heartbeat thread (idempotent)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self.step()  # decide before the scheduler starts, not one interval later
+        self._thread = threading.Thread(target=self._run, daemon=True, name="LeaderElector")
+        self._thread.start()
+        atexit.register(self.stop)
+        logger.info(f"🗳️ Leader election started for {self.name} (lease {self.ttl}s, holder {self.holder_id})")
+
+    def stop(self):
+        """Stop heartbeating and release the lease so a standby takes over immediately"""
+        self._stop.set()
+        if self._leader:
+            self._leader = False
+            try:
+                self.backend.release(self.name, self.holder_id)
+            except Exception as e:
+                logger.error(f"❌ Could not release the {self.name} lease: {e}")
+
+
+def create_leader_elector(db_path=None, ttl=10, name="scheduler"):
+    """Create an elector on the shared state database (in-memory lease when no path is given)"""
+    if db_path:
+        try:
+            return LeaderElector(SQLiteLeaseBackend(db_path), name, ttl)
+        except Exception as e:
+            logger.error(f"❌ Could not open lease database {db_path}: {e} - using an in-memory lease")
+    return LeaderElector(MemoryLeaseBackend(), name, ttl)
@@ -3,23 +3,159 @@ Logging Configuration
 Centralized logging setup for the Islamic Telegram Bot
 """
 
+import atexit
+import json
 import logging
+import logging.handlers
+import queue
+import re
 import sys
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
 import os
 
-def setup_logger(name="IslamicBot", level=logging.INFO):
-    """Setup centralized logger with proper formatting"""
-    
-    # Create logger
-    logger = logging.getLogger(name)
-    logger.setLevel(level)
-    
-    # Avoid duplicate handlers
-    if logger.handlers:
-        return logger
-    
-    # Create formatters
+class LogQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that leaves formatting to the listener thread
+
+    The stock prepare() formats every record on the calling thread. The queue
+    never leaves the process, so the record can be handed over as it is.
+    """
+
+    def prepare(self, record):
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per line (for log shippers)"""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of records per level (1 of every N, no randomness)
+
+    Runs on the calling thread, so dropped records cost almost nothing.
+    """
+
+    def __init__(self, rates):
+        """rates: {level: fraction to keep}, levels not listed are always kept"""
+        super().__init__()
+        self.every = {level: max(1, round(1 / rate)) if rate > 0 else 0 for level, rate in rates.items()}
+        self.seen = dict.fromkeys(self.every, 0)
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        every = self.every.get(record.levelno)
+        if every is None:
+            return True
+        if every == 0:
+            return False
+        with self._lock:
+            count = self.seen[record.levelno]
+            self.seen[record.levelno] = count + 1
+        return count % every == 0
+
+
+class DedupFilter(logging.Filter):
+    """Collapse repeated log lines into one line plus a periodic "repeated N times" summary
+
+    The first occurrence of a message is logged. Repeats within `window` seconds are
+    only counted, and the count is logged when the window closes. Short numbers
+    (attempt counters, delays) are ignored when comparing messages; chat ids are not.
+    At most max_keys messages are tracked, so memory stays bounded during long outages.
+    """
+
+    COUNTER = re.compile(r"(?<!\d)\d{1,4}(?!\d)")
+
+    def __init__(self, window=60, level=logging.WARNING, max_keys=1000, clock=time.monotonic):
+        """Initialize the filter for records at `level` and above"""
+        super().__init__()
+        self.window = window
+        self.level = level
+        self.max_keys = max_keys
+        self.clock = clock
+        self._entries = OrderedDict()   # key -> [window_start, suppressed, last_record]
+        self._next_sweep = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if getattr(record, "dedup_summary", False):
+            return True
+        now = self.clock()
+        summaries = []
+        allowed = True
+
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now, summaries)
+
+            if record.levelno >= self.level:
+                key = (record.levelno, self.COUNTER.sub("#", record.getMessage()))
+                entry = self._entries.get(key)
+                if entry is not None and now - entry[0] < self.window:
+                    entry[1] += 1
+                    entry[2] = record
+                    allowed = False
+                else:
+                    if entry is not None and entry[1]:
+                        summaries.append(entry)
+                    self._entries[key] = [now, 0, None]
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_keys:
+                    _, evicted = self._entries.popitem(last=False)
+                    if evicted[1]:
+                        summaries.append(evicted)
+
+        for entry in summaries:
+            self._emit_summary(entry)
+        return allowed
+
+    def _sweep(self, now, summaries):
+        """Close expired windows (once per window, so the cost stays constant)"""
+        self._next_sweep = now + self.window
+        expired = [key for key, entry in self._entries.items() if now - entry[0] >= self.window]
+        for key in expired:
+            entry = self._entries.pop(key)
+            if entry[1]:
+                summaries.append(entry)
+
+    def _emit_summary(self, entry):
+        _, suppressed, last = entry
+        summary = logging.LogRecord(
+            last.name, last.levelno, last.pathname, last.lineno,
+            f"🔁 {last.getMessage()} - repeated {suppressed} times in the last {self.window:g}s",
+            None, None
+        )
+        summary.dedup_summary = True
+        logging.getLogger(last.name).handle(summary)
+
+
+def parse_sampling(spec):
+    """Parse "DEBUG=0,INFO=0.1" into {level: fraction to keep}"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+        name, _, rate = item.partition("=")
+        rates[logging.getLevelName(name.strip().upper())] = float(rate)
+    return rates
+
+def create_handlers(level=logging.INFO, log_file=None, json_lines=False, max_bytes=0,
+                    backup_count=5, rotate_when=None, stream=None):
+    """Console handler plus an optional (rotating) file handler"""
     detailed_formatter = logging.Formatter(
         '%(asctime)s | %(levelname)8s | %(name)s | %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
@@ -29,24 +165,100 @@ def setup_logger(name="IslamicBot", level=logging.INFO):
         '%(asctime)s | %(levelname)s | %(message)s',
         datefmt='%H:%M:%S'
     )
+    json_formatter = JsonLinesFormatter()
     
     # Console handler
-    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler = logging.StreamHandler(stream or sys.stdout)
     console_handler.setLevel(level)
-    console_handler.setFormatter(simple_formatter)
-    logger.addHandler(console_handler)
+    console_handler.setFormatter(json_formatter if json_lines else simple_formatter)
+    handlers = [console_handler]
     
-    # File handler (optional - only if LOG_FILE is set)
-    log_file = os.getenv("LOG_FILE")
     if log_file:
-        try:
+        if rotate_when:
+            file_handler = logging.handlers.TimedRotatingFileHandler(
+                log_file, when=rotate_when, backupCount=backup_count, encoding='utf-8'
+            )
+        elif max_bytes:
+            file_handler = logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+            )
+        else:
             file_handler = logging.FileHandler(log_file, encoding='utf-8')
-            file_handler.setLevel(logging.DEBUG)
-            file_handler.setFormatter(detailed_formatter)
-            logger.addHandler(file_handler)
-            logger.info(f"📝 Logging to file: {log_file}")
-        except Exception as e:
-            logger.warning(f"⚠️ Could not setup file logging: {e}")
+        file_handler.setLevel(logging.DEBUG)
+        file_handler.setFormatter(json_formatter if json_lines else detailed_formatter)
+        handlers.append(file_handler)
+    
+    return handlers
+
+def start_queue_logging(logger, handlers):
+    """Route a logger through a queue - handlers run on one background listener thread"""
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(LogQueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(stop_queue_logging, listener)  # writes what is still queued
+    return listener
+
+def stop_queue_logging(listener):
+    """Write everything still queued and stop the listener (safe to call twice)"""
+    if listener._thread is not None:
+        listener.stop()
+
+def setup_logger(name="IslamicBot", level=logging.INFO):
+    """Setup centralized logger with proper formatting
+    
+    Environment: LOG_FILE, LOG_ASYNC (queue + listener thread, default true),
+    LOG_JSON (JSON lines), LOG_MAX_BYTES / LOG_BACKUP_COUNT (size rotation),
+    LOG_ROTATE_WHEN (time rotation, e.g. "midnight"), LOG_SAMPLING ("DEBUG=0,INFO=0.1")
+    and LOG_DEDUP_WINDOW / LOG_DEDUP_LEVEL (collapse repeated warnings and errors, 0 = off).
+    """
+    
+    # Create logger
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+    
+    # Avoid duplicate handlers
+    if logger.handlers:
+        return logger
+    
+    log_file = os.getenv("LOG_FILE")
+    file_error = None
+    try:
+        handlers = create_handlers(
+            level,
+            log_file,
+            json_lines=os.getenv("LOG_JSON", "false").lower() == "true",
+            max_bytes=int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+            backup_count=int(os.getenv("LOG_BACKUP_COUNT", "5")),
+            rotate_when=os.getenv("LOG_ROTATE_WHEN") or None
+        )
+    except Exception as e:
+        file_error = e
+        handlers = create_handlers(level)
+    
+    # Writes happen on a listener thread, the polling and scheduler threads only enqueue
+    if os.getenv("LOG_ASYNC", "true").lower() == "true":
+        start_queue_logging(logger, handlers)
+    else:
+        for handler in handlers:
+            logger.addHandler(handler)
+    
+    # Retry loops can repeat the same error for hours - log it once per window with a count
+    dedup_window = float(os.getenv("LOG_DEDUP_WINDOW", "60"))
+    if dedup_window > 0:
+        dedup_level = logging.getLevelName(os.getenv("LOG_DEDUP_LEVEL", "WARNING").upper())
+        if not isinstance(dedup_level, int):
+            dedup_level = logging.WARNING  # unknown names come back as "Level X"
+        logger.addFilter(DedupFilter(dedup_window, dedup_level))
+    
+    sampling = parse_sampling(os.getenv("LOG_SAMPLING"))
+    if sampling:
+        logger.addFilter(SamplingFilter(sampling))
+    
+    if file_error:
+        logger.warning(f"⚠️ Could not setup file logging: {file_error}")
+    elif log_file:
+        logger.info(f"📝 Logging to file: {log_file}")
     
     # Set third-party loggers to WARNING to reduce noise
     logging.getLogger("httpx").setLevel(logging.WARNING)
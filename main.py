@@ -14,9 +14,20 @@ from keep_alive import keep_alive
 from logger_config import setup_logger
 from bot_config import BotConfig
 from scheduler import ContentScheduler
+from channel_schedules import load_configured_channel_schedules
 from telegram_bot import TelegramBot
+from api_client import create_shared_bot
+from rate_limit import UserRateLimiter
+from metrics import SCHEDULER_JOBS, SCHEDULER_LEADER, ACTIVE_USERS, OUTBOX_DEPTH, RETRY_QUEUE_DEPTH, EDITS_PENDING
+from leader_election import create_leader_elector
+from post_ledger import create_post_ledger
+from fanout_publisher import FanoutPublisher
+from outbox import create_outbox, OutboxDrainer
 from content_generator import IslamicContentGenerator
 from azkar_counter import AzkarCounter
+from counter_store import create_counter_store
+from cursor_store import create_cursor_store
+from content_selector import create_content_selector
 from bot_handler import CombinedBotHandler
 
 # Setup logging
@@ -26,18 +37,107 @@ class IslamicTelegramBot:
     def __init__(self):
         """Initialize the Islamic Telegram Bot"""
         self.config = BotConfig()
-        self.telegram_bot = TelegramBot(self.config.telegram_token, self.config.channel_id)
-        self.content_generator = IslamicContentGenerator()
-        self.scheduler = ContentScheduler(self.telegram_bot, self.content_generator)
-        self.azkar_counter = AzkarCounter(self.config.telegram_token)
+        # One TeleBot and one connection pool shared by the sender, the counter and the handler
+        self.bot = create_shared_bot(
+            self.config.telegram_token,
+            self.config.api_pool_size,
+            self.config.api_connect_timeout,
+            self.config.api_read_timeout
+        )
+        self.telegram_bot = TelegramBot(self.config.telegram_token, self.config.channel_id, bot=self.bot)
+        self.content_generator = IslamicContentGenerator(
+            cursor_store=create_cursor_store(self.config.state_db_path),
+            selector=create_content_selector(
+                self.config.content_selection,
+                self.config.state_db_path,
+                self.config.no_repeat_days
+            )
+        )
+        self.publisher = None
+        if len(self.config.channel_ids) > 1:
+            self.publisher = FanoutPublisher(
+                self.telegram_bot,
+                self.config.channel_ids,
+                self.config.fanout_workers
+            )
+        # With several replicas only the lease holder posts - all of them serve users
+        self.leader = None
+        if self.config.leader_election:
+            self.leader = create_leader_elector(self.config.state_db_path, self.config.leader_lease_seconds)
+        self.outbox = None
+        self.outbox_drainer = None
+        if self.config.outbox_enabled:
+            self.outbox = create_outbox(self.config.state_db_path)
+            self.outbox_drainer = OutboxDrainer(
+                self.outbox, self.telegram_bot, guard=self.leader and (lambda: self.leader.is_leader)
+            )
+        self.scheduler = ContentScheduler(
+            self.telegram_bot,
+            self.content_generator,
+            self.publisher,
+            self.outbox,
+            self.config.schedule_timezone,
+            channel_schedules=self._load_channel_schedules(),
+            location=self.config.prayer_location,
+            prerender_at=self.config.prerender_time,
+            prerender_hours=self.config.prerender_hours,
+            leader=self.leader,
+            ledger=create_post_ledger(self.config.state_db_path)
+        )
+        if self.leader:
+            # A new leader wakes the scheduler right away to post slots it skipped as standby
+            self.leader.on_elected = self.scheduler.event_scheduler.interrupt
+        # Configured times (fixed or prayer-relative) replace the built-in defaults
+        self.scheduler.default_schedule.update(self.config.get_schedule_times())
+        # Sharded workers count taps themselves - this process only receives updates
+        self.counter_store = None
+        self.azkar_counter = None
+        if self.config.dispatch_mode != "sharded":
+            self.counter_store = create_counter_store(
+                self.config.state_db_path,
+                self.config.counter_flush_interval_ms,
+                self.config.counter_idle_seconds,
+                self.config.counter_max_cached_users
+            )
+            self.azkar_counter = AzkarCounter(
+                self.config.telegram_token,
+                self.counter_store,
+                self.config.edit_interval_ms,
+                bot=self.bot,
+                rate_limiter=UserRateLimiter(
+                    self.config.callback_rate,
+                    self.config.callback_burst,
+                    self.config.callback_max_users
+                )
+            )
         self.bot_handler = CombinedBotHandler(
             self.config.telegram_token, 
             self.config.channel_id, 
             self.scheduler, 
-            self.azkar_counter
+            self.azkar_counter,
+            self.config.dispatch_mode,
+            self.config.dispatch_workers,
+            bot=self.bot,
+            shard_workers=self.config.shard_workers,
+            shard_worker_factory=create_shard_worker
         )
         self.running = False
         
+        # Values read when /metrics is scraped
+        SCHEDULER_JOBS.set_function(lambda: len(self.scheduler.event_scheduler.jobs))
+        SCHEDULER_LEADER.set_function(lambda: int(self.leader is None or self.leader.is_leader))
+        RETRY_QUEUE_DEPTH.set_function(self.telegram_bot.queued_retries)
+        if self.azkar_counter:
+            ACTIVE_USERS.set_function(self.azkar_counter.active_users)
+            if self.azkar_counter.edit_coalescer:
+                EDITS_PENDING.set_function(self.azkar_counter.edit_coalescer.pending)
+        if self.outbox:
+            OUTBOX_DEPTH.set_function(self.outbox.depth)
+        
+    def _load_channel_schedules(self):
+        """Load per-channel schedule tables if a file is configured"""
+        return load_configured_channel_schedules(self.config)
+    
     def start(self):
         """Start the bot with both scheduled content and interactive features - NEVER STOPS"""
         # Run forever - never give up, never shut down
@@ -93,6 +193,14 @@ class IslamicTelegramBot:
                         time.sleep(10)
                         continue
                 
+                # Take (or wait for) the scheduler lease before any job can fire
+                if self.leader:
+                    self.leader.start()
+                
+                # Deliver queued posts (including ones left over from before a restart)
+                if self.outbox_drainer:
+                    self.outbox_drainer.start()
+                
                 # Start scheduler with infinite retry and health monitoring
                 scheduler_restart_count = 0
                 health_check_counter = 0
@@ -149,16 +257,56 @@ class IslamicTelegramBot:
         logger.info(f"📶 Received signal {signum} - IGNORING shutdown request! Bot will keep running...")
         # Completely ignore shutdown signals - bot must never stop!
 
+def create_shard_worker(index):
+    """Build the interactive handlers inside a sharded worker process (counters, commands, callbacks)
+
+    Each worker only sees its own users, so its counter cache and rate limiter stay
+    consistent; the SQLite counter database is shared by all workers.
+    """
+    config = BotConfig()
+    bot = create_shared_bot(
+        config.telegram_token,
+        config.api_pool_size,
+        config.api_connect_timeout,
+        config.api_read_timeout,
+        threaded=False
+    )
+    telegram_bot = TelegramBot(config.telegram_token, config.channel_id, bot=bot)
+    content_generator = IslamicContentGenerator(
+        cursor_store=create_cursor_store(config.state_db_path),
+        selector=create_content_selector(config.content_selection, config.state_db_path, config.no_repeat_days)
+    )
+    counter_store = create_counter_store(
+        config.state_db_path, config.counter_flush_interval_ms,
+        config.counter_idle_seconds, config.counter_max_cached_users
+    )
+    azkar_counter = AzkarCounter(
+        config.telegram_token, counter_store, config.edit_interval_ms, bot=bot,
+        rate_limiter=UserRateLimiter(config.callback_rate, config.callback_burst, config.callback_max_users)
+    )
+    # /schedule is answered by the receiver from the main scheduler, this one has no jobs
+    scheduler = ContentScheduler(telegram_bot, content_generator)
+    CombinedBotHandler(config.telegram_token, config.channel_id, scheduler, azkar_counter, bot=bot)
+    # Read with every metrics report sent to the main process
+    ACTIVE_USERS.set_function(azkar_counter.active_users)
+    if azkar_counter.edit_coalescer:
+        EDITS_PENDING.set_function(azkar_counter.edit_coalescer.pending)
+    logger.info(f"🧩 Shard worker {index} ready")
+    return bot
+
 def main():
     """Main entry point - NEVER STOPS"""
     # Start the keep alive server
     keep_alive()
     
     # Run forever - never exit under any circumstances
+    # The bot (and its stores, threads and connections) is built once and reused on restart
+    bot = None
     while True:
         try:
             # Start the Islamic bot
-            bot = IslamicTelegramBot()
+            if bot is None:
+                bot = IslamicTelegramBot()
             bot.start()  # This will also run forever
         except KeyboardInterrupt:
             logger.info("📶 Ignoring keyboard interrupt - Bot will continue running!")
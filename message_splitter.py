@@ -0,0 +1,127 @@
+"""
+Message Splitter
+Splits long HTML messages into parts that fit Telegram's limit, breaking on
+paragraph, line, verse/sentence and word boundaries while keeping tags balanced
+"""
+
+import html
+import re
+from prerender import MAX_MESSAGE_LENGTH, TAG_PATTERN, ENTITY_PATTERN, utf16_length
+
+# Cut priorities (higher = better place to split)
+PARAGRAPH, LINE, SENTENCE, WORD, ANYWHERE = 4, 3, 2, 1, 0
+
+SENTENCE_ENDINGS = ".!?؟۔﴾﴿"
+MAX_ATOM = 512  # words longer than this (e.g. long URLs) may be cut anywhere
+TEXT_ATOM = re.compile(r"\n\s*\n\s*|\n\s*|[ \t\u00a0]+|\S+|\s")
+MARKUP_START = re.compile(r"[<&]")
+
+class _Unit:
+    """One indivisible piece of the message"""
+    __slots__ = ("raw", "length", "cut", "tag", "closing")
+
+    def __init__(self, raw, length, cut=ANYWHERE, tag=None, closing=False):
+        self.raw = raw
+        self.length = length    # visible UTF-16 units
+        self.cut = cut          # priority of splitting right after this unit (None = never)
+        self.tag = tag
+        self.closing = closing
+
+def _text_units(text):
+    units = []
+    for atom in TEXT_ATOM.findall(text):
+        if atom.isspace():
+            if atom.count("\n") >= 2:
+                cut = PARAGRAPH
+            elif "\n" in atom:
+                cut = LINE
+            elif units and units[-1].raw[-1:] in SENTENCE_ENDINGS:
+                cut = SENTENCE
+            else:
+                cut = WORD
+            units.append(_Unit(atom, utf16_length(atom), cut))
+        else:
+            for start in range(0, len(atom), MAX_ATOM):
+                piece = atom[start:start + MAX_ATOM]
+                units.append(_Unit(piece, utf16_length(piece), ANYWHERE))
+    return units
+
+def _tokenize(message):
+    """Tags, entities and text atoms in message order"""
+    units = []
+    text_start = 0
+    position = 0
+    while True:
+        found = MARKUP_START.search(message, position)
+        if not found:
+            break
+        position = found.start()
+        if message[position] == "<":
+            match = TAG_PATTERN.match(message, position)
+            unit = match and _Unit(match.group(0), 0, None, match.group(2).lower(), bool(match.group(1)))
+        else:
+            match = ENTITY_PATTERN.match(message, position)
+            unit = match and _Unit(match.group(0), utf16_length(html.unescape(match.group(0))), ANYWHERE)
+        if not match:
+            position += 1  # a stray '<' or '&' stays part of the text
+            continue
+        units.extend(_text_units(message[text_start:position]))
+        units.append(unit)
+        position = text_start = match.end()
+    units.extend(_text_units(message[text_start:]))
+    return units
+
+def _apply(stack, unit):
+    """Track open tags (keeps the full opening tag so attributes survive a split)"""
+    if unit.tag is None:
+        return
+    if not unit.closing:
+        stack.append((unit.tag, unit.raw))
+    elif stack and stack[-1][0] == unit.tag:
+        stack.pop()
+
+def split_message(message, limit=MAX_MESSAGE_LENGTH):
+    """Split a message into parts of at most `limit` visible UTF-16 units (one part if it fits)
+
+    Each part is cut at the best boundary in its last three quarters (paragraph > line >
+    sentence/verse > word > anywhere); tags open at a cut are closed and reopened.
+    """
+    units = _tokenize(message)
+    if sum(unit.length for unit in units) <= limit:
+        return [message]
+
+    parts = []
+    stack = []             # tags open at the start of the current part
+    start = 0
+    min_fill = limit // 4  # never cut so early that parts become tiny
+
+    while start < len(units):
+        scan_stack = list(stack)
+        visible = 0
+        best = {}          # cut priority -> (last unit index, tags open after it)
+        end, end_stack = len(units) - 1, None
+        for index in range(start, len(units)):
+            unit = units[index]
+            if visible + unit.length > limit and index > start:
+                if best:
+                    end, end_stack = best[max(best)]
+                else:
+                    end, end_stack = index - 1, scan_stack
+                break
+            visible += unit.length
+            _apply(scan_stack, unit)
+            if unit.cut is not None and visible >= min_fill:
+                best[unit.cut] = (index, list(scan_stack))
+        if end_stack is None:
+            end_stack = scan_stack
+
+        chunk = units[start:end + 1]
+        if any(unit.length and not unit.raw.isspace() for unit in chunk):
+            prefix = "".join(raw for _, raw in stack)
+            suffix = "".join(f"</{tag}>" for tag, _ in reversed(end_stack))
+            parts.append((prefix + "".join(unit.raw for unit in chunk) + suffix).strip())
+
+        stack = end_stack
+        start = end + 1
+
+    return parts
@@ -0,0 +1,294 @@
+"""
+Metrics
+Low-overhead counters, gauges and histograms with Prometheus text exposition
+"""
+
+import bisect
+import threading
+import time
+
+# Latency buckets in seconds (Telegram calls, callbacks, scheduler lag)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base class: a named family of children, one per label combination"""
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def labels(self, *values):
+        """Child metric for one label combination (cached - keep label values low-cardinality)"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            yield from child.samples(self.name, self.labelnames, values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+    def merge(self, delta):
+        self.inc(delta)
+
+    def samples(self, name, labelnames, values):
+        yield f"{name}{_format_labels(labelnames, values)} {_format_value(self.value)}"
+
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._children[()].inc(amount)
+
+
+class _GaugeChild:
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0
+        self.function = None
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, function):
+        """Read the value from function() at scrape time instead"""
+        self.function = function
+
+    def snapshot(self):
+        if self.function is None:
+            return self.value
+        try:
+            return self.function()
+        except Exception:
+            return float("nan")
+
+    def samples(self, name, labelnames, values):
+        value = self.snapshot()
+        yield f"{name}{_format_labels(labelnames, values)} {_format_value(value)}"
+
+
+class Gauge(Metric):
+    """Value that goes up and down"""
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._children[()].set(value)
+
+    def set_function(self, function):
+        self._children[()].set_function(function)
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum
+
+    def merge(self, delta):
+        counts, total = delta
+        with self._lock:
+            for index, count in enumerate(counts):
+                self.counts[index] += count
+            self.sum += total
+
+    def samples(self, name, labelnames, values):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            yield f"{name}_bucket{_format_labels(labelnames, values, ('le', _format_value(bound)))} {cumulative}"
+        yield f"{name}_sum{_format_labels(labelnames, values)} {_format_value(total)}"
+        yield f"{name}_count{_format_labels(labelnames, values)} {cumulative}"
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets"""
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(float(bound) for bound in buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._children[()].observe(value)
+
+
+class Registry:
+    """Collection of metrics rendered together on /metrics"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+
+    def get(self, name):
+        """Registered metric by name (None if unknown)"""
+        return self._metrics.get(name)
+
+    def metrics(self):
+        """Snapshot list of the registered metrics"""
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        return "\n".join(metric.render() for metric in self.metrics()) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class DeltaReporter:
+    """Picklable metric reports of a worker process, applied to the parent's registry
+
+    Counters and histograms travel as increments since the last report, so the parent
+    just adds them; gauges travel as current values (the parent decides how to combine).
+    """
+
+    def __init__(self, registry=None):
+        self.registry = registry if registry is not None else REGISTRY
+        self._last = {}   # (name, label values) -> snapshot already reported
+
+    def collect(self):
+        """{"deltas": {(name, values): increment}, "gauges": {(name, values): value}}"""
+        deltas, gauges = {}, {}
+        for metric in self.registry.metrics():
+            for values, child in list(metric._children.items()):
+                key = (metric.name, values)
+                current = child.snapshot()
+                if metric.kind == "gauge":
+                    gauges[key] = current
+                    continue
+                previous = self._last.get(key)
+                self._last[key] = current
+                if metric.kind == "histogram":
+                    counts, total = current
+                    if previous is not None:
+                        counts = [count - before for count, before in zip(counts, previous[0])]
+                        total -= previous[1]
+                    if any(counts):
+                        deltas[key] = (counts, total)
+                elif current != (previous or 0):
+                    deltas[key] = current - (previous or 0)
+        return {"deltas": deltas, "gauges": gauges}
+
+
+def apply_deltas(deltas, registry=None):
+    """Add a worker's counter and histogram increments to this process's metrics"""
+    registry = registry if registry is not None else REGISTRY
+    for (name, values), delta in deltas.items():
+        metric = registry.get(name)
+        if metric is not None:
+            metric.labels(*values).merge(delta)
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Bot metrics (instrumented in telegram_bot, api_client, azkar_counter, edit_coalescer and event_scheduler)
+START_TIME = Gauge("bot_start_time_seconds", "Unix time the bot process started")
+START_TIME.set(time.time())
+
+API_LATENCY = Histogram("telegram_api_request_seconds", "Telegram Bot API call latency", ["method"])
+API_RATE_LIMITED = Counter("telegram_api_rate_limited_total", "Telegram 429 Too Many Requests responses", ["method"])
+API_ERRORS = Counter("telegram_api_errors_total", "Telegram API calls that failed before a response", ["method"])
+
+MESSAGES = Counter("telegram_messages_total", "Channel messages by outcome (sent, deferred, unknown, failed)", ["result"])
+SEND_LATENCY = Histogram("telegram_send_message_seconds", "TelegramBot.send_message duration including retries")
+THROTTLE_RETRY_AFTER = Histogram(
+    "telegram_throttle_retry_after_seconds", "Waits requested by Telegram rate limits (retry_after)",
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 3600)
+)
+SENDS_DEFERRED = Counter("telegram_sends_deferred_total", "Rate-limited sends queued for a later retry")
+RETRY_QUEUE_DEPTH = Gauge("telegram_retry_queue_depth", "Rate-limited sends waiting in the retry queue")
+
+CALLBACK_LATENCY = Histogram("azkar_callback_seconds", "Callback handling latency by action", ["action"])
+CALLBACKS_REJECTED = Counter(
+    "azkar_callbacks_rejected_total", "Callbacks not handled normally (dropped, coalesced, invalid)", ["reason"]
+)
+ACTIVE_USERS = Gauge("azkar_active_users", "Users with a callback in the last 5 minutes")
+EDITS = Counter(
+    "azkar_edits_total", "Counter message edits by outcome (submitted, coalesced, sent, not_modified, failed)", ["result"]
+)
+EDITS_PENDING = Gauge("azkar_edits_pending", "Coalesced edits waiting to be sent")
+
+SCHEDULER_LAG = Histogram(
+    "scheduler_lag_seconds", "Actual minus planned fire time of scheduled jobs", ["job"],
+    buckets=(0.001, 0.01, 0.1, 0.5, 1, 5, 30, 60, 300)
+)
+SCHEDULER_JOBS = Gauge("scheduler_jobs", "Scheduled daily jobs")
+SCHEDULER_LEADER = Gauge("scheduler_leader", "1 if this replica runs the scheduled posts")
+OUTBOX_DEPTH = Gauge("outbox_depth", "Posts waiting in the outbox")
@@ -0,0 +1,259 @@
+"""
+Outbox
+Durable queue of posts to deliver, with idempotency keys and a background drainer
+"""
+
+import threading
+import time
+from state_db import connect_state_db
+from rate_limit import TokenBucket
+from fanout_publisher import GLOBAL_RATE
+from message_splitter import split_message
+from logger_config import setup_logger
+
+logger = setup_logger()
+
+class Outbox:
+    def __init__(self, db_path=":memory:", claim_timeout=300):
+        """Open the outbox table in the state database"""
+        self.db_path = db_path
+        self.claim_timeout = claim_timeout  # seconds before a 'sending' row is considered abandoned (unknown)
+        self.new_items = threading.Event()
+        self._lock = threading.Lock()
+        self._conn = connect_state_db(db_path)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                idempotency_key TEXT NOT NULL UNIQUE,
+                chat_id TEXT NOT NULL,
+                content_type TEXT,
+                text TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                claimed_at REAL,
+                created_at REAL NOT NULL,
+                sent_at REAL,
+                last_error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);
+            """
+        )
+
+    def enqueue(self, idempotency_key, chat_id, text, content_type=None, not_before=None):
+        """Add a post; returns False if a post with the same key already exists"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                """
+                INSERT OR IGNORE INTO outbox
+                    (idempotency_key, chat_id, content_type, text, next_attempt_at, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (idempotency_key, str(chat_id), content_type, text, not_before or now, now)
+            )
+        added = cursor.rowcount == 1
+        if added:
+            self.new_items.set()
+        else:
+            logger.info(f"📭 Outbox already has {idempotency_key} - not enqueued twice")
+        return added
+
+    def exists(self, idempotency_key):
+        """True if a post with this key was ever enqueued"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM outbox WHERE idempotency_key = ?", (idempotency_key,)
+            ).fetchone() is not None
+
+    def claim_due(self, limit=20, now=None):
+        """Mark due posts as 'sending' and return them as dicts
+
+        A post left in 'sending' longer than claim_timeout belongs to a drainer that
+        crashed mid-send: Telegram may have it, so it becomes 'unknown', never resent.
+        """
+        now = now or time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                abandoned = self._conn.execute(
+                    """
+                    UPDATE outbox SET status = 'unknown', last_error = 'abandoned while sending'
+                    WHERE status = 'sending' AND claimed_at <= ?
+                    """,
+                    (now - self.claim_timeout,)
+                ).rowcount
+                rows = self._conn.execute(
+                    """
+                    SELECT id, idempotency_key, chat_id, content_type, text, attempts FROM outbox
+                    WHERE status = 'pending' AND next_attempt_at <= ?
+                    ORDER BY next_attempt_at
+                    LIMIT ?
+                    """,
+                    (now, limit)
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE outbox SET status = 'sending', claimed_at = ? WHERE id = ?",
+                    [(now, row[0]) for row in rows]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        if abandoned:
+            logger.warning(f"⚠️ {abandoned} outbox posts were abandoned mid-send - marked unknown, not resent")
+        columns = ("id", "idempotency_key", "chat_id", "content_type", "text", "attempts")
+        return [dict(zip(columns, row)) for row in rows]
+
+    def mark_sent(self, item_id):
+        """Record a successful delivery"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = 'sent', sent_at = ?, attempts = attempts + 1 WHERE id = ?",
+                (time.time(), item_id)
+            )
+
+    def mark_retry(self, item_id, delay, error, text=None):
+        """Put a post back in the queue to try again after `delay` seconds (optionally with new text)"""
+        with self._lock:
+            self._conn.execute(
+                """
+                UPDATE outbox SET status = 'pending', attempts = attempts + 1,
+                    next_attempt_at = ?, last_error = ?, text = COALESCE(?, text)
+                WHERE id = ?
+                """,
+                (time.time() + delay, error, text, item_id)
+            )
+
+    def mark_unknown(self, item_id, error):
+        """Park a post whose send timed out after it went out - Telegram may have it, never resent"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = 'unknown', attempts = attempts + 1, last_error = ? WHERE id = ?",
+                (error, item_id)
+            )
+
+    def mark_failed(self, item_id, error):
+        """Give up on a post (kept in the table for inspection)"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = 'failed', attempts = attempts + 1, last_error = ? WHERE id = ?",
+                (error, item_id)
+            )
+
+    def depth(self):
+        """Number of posts not delivered yet"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM outbox WHERE status IN ('pending', 'sending')"
+            ).fetchone()[0]
+
+    def next_due_in(self, now=None):
+        """Seconds until the next pending post is due (None if nothing is pending)"""
+        now = now or time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(next_attempt_at) FROM outbox WHERE status = 'pending'"
+            ).fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - now)
+
+    def prune(self, older_than_days=30):
+        """Delete delivered, failed and unknown posts older than the given age"""
+        cutoff = time.time() - older_than_days * 86400
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM outbox WHERE status IN ('sent', 'failed', 'unknown') AND created_at < ?", (cutoff,)
+            )
+
+
+class OutboxDrainer:
+    def __init__(self, outbox, telegram_bot, max_attempts=10, rate=GLOBAL_RATE, guard=None):
+        """Initialize drainer delivering outbox posts through a TelegramBot"""
+        self.outbox = outbox
+        self.telegram_bot = telegram_bot
+        self.max_attempts = max_attempts
+        self.guard = guard  # deliver only while guard() is true (e.g. leader replica)
+        self.bucket = TokenBucket(rate)
+        self._thread = None
+
+    def start(self):
+        """Start the background delivery thread (idempotent)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True, name="OutboxDrainer")
+        self._thread.start()
+        logger.info(f"📮 Outbox drainer started ({self.outbox.depth()} posts pending)")
+
+    def _backoff(self, attempts):
+        return min(3600, 10 * (2 ** attempts))
+
+    def deliver(self, item):
+        """Try one post once and record the outcome"""
+        # A long post is one batch: reserve the budget for all its parts up front
+        parts = split_message(item["text"])
+        self.bucket.acquire(len(parts))
+        status, retry_after, error, sent = self.telegram_bot.try_send_parts(parts, chat_id=item["chat_id"])
+
+        if status == "sent":
+            self.outbox.mark_sent(item["id"])
+            logger.info(f"✅ Outbox delivered {item['idempotency_key']}")
+        elif status == "unknown":
+            self.outbox.mark_unknown(item["id"], error)
+            logger.warning(f"⚠️ Outbox {item['idempotency_key']} may have been posted - not resending: {error}")
+        elif status == "retry" and item["attempts"] + 1 < self.max_attempts:
+            delay = retry_after or self._backoff(item["attempts"])
+            # Parts already delivered are dropped so the retry does not post them twice
+            remaining = "\n\n".join(parts[sent:]) if sent else None
+            self.outbox.mark_retry(item["id"], delay, error, remaining)
+            logger.warning(f"⏳ Outbox retry for {item['idempotency_key']} in {delay}s: {error}")
+        else:
+            self.outbox.mark_failed(item["id"], error)
+            logger.error(f"❌ Outbox gave up on {item['idempotency_key']}: {error}")
+        return status
+
+    def drain_once(self):
+        """Deliver every post that is due now, returns how many were attempted"""
+        items = self.outbox.claim_due()
+        for item in items:
+            try:
+                self.deliver(item)
+            except Exception as e:
+                self.outbox.mark_retry(item["id"], self._backoff(item["attempts"]), str(e))
+                logger.error(f"❌ Outbox delivery error for {item['idempotency_key']}: {e}")
+        return len(items)
+
+    def _run(self):
+        last_prune = 0
+        while True:
+            try:
+                if self.guard is not None and not self.guard():
+                    time.sleep(1)  # standby replica - check again soon for a fast takeover
+                    continue
+
+                if self.drain_once():
+                    continue  # more may be due right away
+
+                if time.time() - last_prune > 86400:
+                    self.outbox.prune()
+                    last_prune = time.time()
+
+                # Sleep until the next post is due or something new is enqueued
+                wait = self.outbox.next_due_in()
+                self.outbox.new_items.wait(60 if wait is None else min(wait, 60))
+                self.outbox.new_items.clear()
+            except Exception as e:
+                logger.error(f"❌ Outbox drainer error: {e} - retrying in 10 seconds...")
+                time.sleep(10)
+
+
+def create_outbox(db_path=None):
+    """Create the outbox (in-memory SQLite when no path is given)"""
+    try:
+        return Outbox(db_path or ":memory:")
+    except Exception as e:
+        logger.error(f"❌ Could not open outbox database {db_path}: {e} - falling back to memory")
+        return Outbox(":memory:")
@@ -0,0 +1,198 @@
+"""
+Post Ledger
+Idempotency ledger of scheduled posts per (channel, content type, date) so retries
+and restarts never post the same slot twice
+"""
+
+import threading
+import time
+from datetime import date, timedelta
+from state_db import connect_state_db
+from logger_config import setup_logger
+
+logger = setup_logger()
+
+SENDING = "sending"   # an attempt started - if it never finished, the outcome is unknown
+SENT = "sent"
+FAILED = "failed"     # Telegram definitely did not take it - safe to try again
+
+class PostLedger:
+    """In-memory ledger - survives re-registered jobs and stack restarts, not a new process
+
+    Lookups are one dict access; entries are grouped by date so pruning drops whole days.
+    """
+
+    def __init__(self, keep_days=3, max_attempts=3):
+        """Initialize an empty ledger"""
+        self.keep_days = keep_days
+        self.max_attempts = max_attempts
+        self._entries = {}   # (chat_id, content_type, post_date) -> [status, attempts]
+        self._by_date = {}   # post_date -> keys of that day
+        self._pruned_on = None
+        self._lock = threading.Lock()
+
+    def _key(self, chat_id, content_type, post_date):
+        return (str(chat_id), content_type, post_date.isoformat())
+
+    def begin(self, chat_id, content_type, post_date):
+        """Claim the next send attempt, returns its number or None when it must not be sent
+
+        None means the post is already sent, an earlier attempt ended without a
+        known outcome (timeout, crash), or all attempts are used up.
+        """
+        key = self._key(chat_id, content_type, post_date)
+        with self._lock:
+            self._prune_if_new_day()
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = [FAILED, 0]
+                self._entries[key] = entry
+                self._by_date.setdefault(key[2], set()).add(key)
+            if entry[0] != FAILED or entry[1] >= self.max_attempts:
+                return None
+            entry[0], entry[1] = SENDING, entry[1] + 1
+            self._save(key, entry)
+            return entry[1]
+
+    def finish(self, chat_id, content_type, post_date, sent):
+        """Record the outcome of the current attempt"""
+        key = self._key(chat_id, content_type, post_date)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry[0] = SENT if sent else FAILED
+            self._save(key, entry)
+
+    def status(self, chat_id, content_type, post_date):
+        """(status, attempts) of a post, or None if it was never attempted"""
+        entry = self._entries.get(self._key(chat_id, content_type, post_date))
+        return tuple(entry) if entry else None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _prune_if_new_day(self):
+        today = date.today()
+        if self._pruned_on != today:
+            self._pruned_on = today
+            self.prune(today - timedelta(days=self.keep_days))
+
+    def prune(self, before):
+        """Forget every post dated before `before` (caller holds the lock)"""
+        cutoff = before.isoformat()
+        old_dates = [post_date for post_date in self._by_date if post_date < cutoff]
+        for post_date in old_dates:
+            for key in self._by_date.pop(post_date):
+                self._entries.pop(key, None)
+        self._delete_before(cutoff)
+        if old_dates:
+            logger.debug(f"🧹 Post ledger pruned {len(old_dates)} old days")
+
+    def _save(self, key, entry):
+        pass
+
+    def _delete_before(self, cutoff):
+        pass
+
+
+class SQLitePostLedger(PostLedger):
+    """Ledger persisted in the state database - also covers process restarts, crashes and replicas
+
+    Claims are one atomic statement on the shared table, so a replica that takes over
+    the scheduler sees (and respects) the attempts of the previous leader.
+    """
+
+    def __init__(self, db_path, keep_days=3, max_attempts=3):
+        """Open the database and load the ledger of the last keep_days days"""
+        super().__init__(keep_days, max_attempts)
+        self._conn = connect_state_db(db_path)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS post_ledger (
+                chat_id TEXT NOT NULL,
+                content_type TEXT NOT NULL,
+                post_date TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (chat_id, content_type, post_date)
+            ) WITHOUT ROWID
+            """
+        )
+        cutoff = (date.today() - timedelta(days=keep_days)).isoformat()
+        rows = self._conn.execute(
+            "SELECT chat_id, content_type, post_date, status, attempts FROM post_ledger WHERE post_date >= ?",
+            (cutoff,)
+        ).fetchall()
+        for chat_id, content_type, post_date, status, attempts in rows:
+            key = (chat_id, content_type, post_date)
+            self._entries[key] = [status, attempts]
+            self._by_date.setdefault(post_date, set()).add(key)
+
+    def begin(self, chat_id, content_type, post_date):
+        """Claim the next send attempt in the database (see PostLedger.begin)"""
+        key = self._key(chat_id, content_type, post_date)
+        with self._lock:
+            self._prune_if_new_day()
+            cursor = self._conn.execute(
+                """
+                INSERT INTO post_ledger (chat_id, content_type, post_date, status, attempts, updated_at)
+                VALUES (?, ?, ?, ?, 1, ?)
+                ON CONFLICT (chat_id, content_type, post_date)
+                DO UPDATE SET status = excluded.status, attempts = post_ledger.attempts + 1,
+                    updated_at = excluded.updated_at
+                WHERE post_ledger.status = ? AND post_ledger.attempts < ?
+                """,
+                (*key, SENDING, time.time(), FAILED, self.max_attempts)
+            )
+            entry = self._load(key)
+            if cursor.rowcount != 1:
+                return None
+            return entry[1]
+
+    def status(self, chat_id, content_type, post_date):
+        """(status, attempts) of a post as stored by any replica, or None if never attempted"""
+        with self._lock:
+            entry = self._load(self._key(chat_id, content_type, post_date))
+        return tuple(entry) if entry else None
+
+    def _load(self, key):
+        # Refresh the cached entry from the table (another replica may have changed it)
+        row = self._conn.execute(
+            "SELECT status, attempts FROM post_ledger WHERE chat_id = ? AND content_type = ? AND post_date = ?",
+            key
+        ).fetchone()
+        if row is None:
+            return None
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = [None, 0]
+            self._by_date.setdefault(key[2], set()).add(key)
+        entry[0], entry[1] = row
+        return entry
+
+    def _save(self, key, entry):
+        # Only the outcome is written - attempts are counted by the atomic claim in begin()
+        self._conn.execute(
+            """
+            INSERT INTO post_ledger (chat_id, content_type, post_date, status, attempts, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (chat_id, content_type, post_date)
+            DO UPDATE SET status = excluded.status, updated_at = excluded.updated_at
+            """,
+            (*key, entry[0], entry[1], time.time())
+        )
+
+    def _delete_before(self, cutoff):
+        self._conn.execute("DELETE FROM post_ledger WHERE post_date < ?", (cutoff,))
+
+
+def create_post_ledger(db_path=None, keep_days=3):
+    """Create the post ledger (SQLite when a path is given)"""
+    if db_path:
+        try:
+            return SQLitePostLedger(db_path, keep_days)
+        except Exception as e:
+            logger.error(f"❌ Could not open post ledger {db_path}: {e} - falling back to memory")
+    return PostLedger(keep_days)
@@ -0,0 +1,210 @@
+"""
+Prayer Times
+Offline prayer time calculator with cached yearly tables per location
+
+Times are computed from the sun position (standard astronomical formulas) and
+stored as seconds from UTC midnight, so a table does not depend on a timezone.
+Schedule slots can be written relative to a prayer: "fajr+20", "maghrib-10", "asr".
+"""
+
+import math
+import re
+import threading
+from array import array
+from datetime import date, datetime, timedelta, timezone
+from logger_config import setup_logger
+
+logger = setup_logger()
+
+PRAYERS = ("fajr", "sunrise", "dhuhr", "asr", "maghrib", "isha")
+PRAYER_INDEX = {prayer: index for index, prayer in enumerate(PRAYERS)}
+UTC_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+EPOCH_ORDINAL = UTC_EPOCH.toordinal()
+
+# name -> (fajr angle, isha angle or minutes after maghrib)
+METHODS = {
+    "MWL": (18.0, 17.0),        # Muslim World League
+    "ISNA": (15.0, 15.0),       # Islamic Society of North America
+    "Egypt": (19.5, 17.5),      # Egyptian General Authority of Survey
+    "Makkah": (18.5, "90min"),  # Umm al-Qura University, Makkah
+    "Karachi": (18.0, 18.0),    # University of Islamic Sciences, Karachi
+}
+
+# Shadow length factor for Asr
+ASR_FACTORS = {"shafi": 1, "hanafi": 2}
+
+SLOT_PATTERN = re.compile(r"^\s*(fajr|sunrise|dhuhr|asr|maghrib|isha)\s*(?:([+-])\s*(\d+))?\s*$", re.IGNORECASE)
+
+def parse_prayer_slot(spec):
+    """Parse "fajr+20" into ("fajr", 20); returns None for fixed "HH:MM" times"""
+    if not isinstance(spec, str):
+        return None
+    match = SLOT_PATTERN.match(spec)
+    if not match:
+        return None
+    prayer, sign, minutes = match.groups()
+    offset = int(minutes or 0)
+    return prayer.lower(), -offset if sign == "-" else offset
+
+
+def _sun_position(day):
+    """Declination (degrees) and equation of time (hours) at noon of a date"""
+    d = day.toordinal() - date(2000, 1, 1).toordinal()  # days since J2000 noon, at noon
+    g = math.radians((357.529 + 0.98560028 * d) % 360)
+    q = (280.459 + 0.98564736 * d) % 360
+    lam = math.radians((q + 1.915 * math.sin(g) + 0.020 * math.sin(2 * g)) % 360)
+    e = math.radians(23.439 - 0.00000036 * d)
+
+    ra = math.degrees(math.atan2(math.cos(e) * math.sin(lam), math.cos(lam))) / 15
+    decl = math.degrees(math.asin(math.sin(e) * math.sin(lam)))
+    eqt = q / 15 - ra % 24
+    eqt = (eqt + 12) % 24 - 12
+    return decl, eqt
+
+def _hour_angle(angle, lat, decl):
+    """Hours between noon and the moment the sun is `angle` degrees below the horizon (None if never)"""
+    lat_r, decl_r = math.radians(lat), math.radians(decl)
+    cos_h = (-math.sin(math.radians(angle)) - math.sin(decl_r) * math.sin(lat_r)) / (math.cos(decl_r) * math.cos(lat_r))
+    if cos_h < -1 or cos_h > 1:
+        return None
+    return math.degrees(math.acos(cos_h)) / 15
+
+def compute_day(day, latitude, longitude, method="MWL", asr="shafi", sun=None):
+    """Prayer times of one date as seconds from UTC midnight (may be negative east of Greenwich)"""
+    fajr_angle, isha_param = METHODS[method]
+    decl, eqt = sun or _sun_position(day)
+    dhuhr = 12 - longitude / 15 - eqt
+
+    half_day = _hour_angle(0.833, latitude, decl)
+    if half_day is None:
+        # Polar day/night - fall back to a 12 hour day around solar noon
+        half_day = 6.0
+    sunrise, maghrib = dhuhr - half_day, dhuhr + half_day
+    night = 24 - 2 * half_day
+
+    # Twilight that never reaches the angle (high latitudes): use the angle-based night portion
+    fajr_offset = _hour_angle(fajr_angle, latitude, decl)
+    fajr_offset = min(fajr_offset or 24, half_day + night * fajr_angle / 60)
+    fajr = dhuhr - fajr_offset
+
+    if isinstance(isha_param, str):
+        isha = maghrib + int(isha_param[:-3]) / 60
+    else:
+        isha_offset = _hour_angle(isha_param, latitude, decl)
+        isha = dhuhr + min(isha_offset or 24, half_day + night * isha_param / 60)
+
+    # Asr: the shadow reaches `factor` times the object length plus the noon shadow
+    factor = ASR_FACTORS[asr]
+    asr_angle = -math.degrees(math.atan(1 / (factor + math.tan(math.radians(abs(latitude - decl))))))
+    asr_offset = _hour_angle(asr_angle, latitude, decl)
+    asr_time = dhuhr + (asr_offset if asr_offset is not None else half_day / 2)
+
+    return tuple(round(hours * 3600) for hours in (fajr, sunrise, dhuhr, asr_time, maghrib, isha))
+
+
+class PrayerTable:
+    """Prayer times of every day of one year for one location"""
+    __slots__ = ("year", "first_ordinal", "seconds")
+
+    def __init__(self, year, latitude, longitude, method, asr):
+        self.year = year
+        self.first_ordinal = date(year, 1, 1).toordinal()
+        self.seconds = array("i")
+        day = date(year, 1, 1)
+        for sun in _sun_year(year):
+            self.seconds.extend(compute_day(day, latitude, longitude, method, asr, sun))
+            day += timedelta(days=1)
+
+    def time_of(self, prayer, day):
+        """Prayer time of a date as an aware UTC datetime"""
+        ordinal = day.toordinal()
+        seconds = self.seconds[(ordinal - self.first_ordinal) * 6 + PRAYER_INDEX[prayer]]
+        return UTC_EPOCH + timedelta(days=ordinal - EPOCH_ORDINAL, seconds=seconds)
+
+
+_tables = {}
+_sun_years = {}
+_tables_lock = threading.Lock()
+
+def _sun_year(year):
+    """Sun positions of every day of a year (shared by all locations)"""
+    positions = _sun_years.get(year)
+    if positions is None:
+        day, positions = date(year, 1, 1), []
+        while day.year == year:
+            positions.append(_sun_position(day))
+            day += timedelta(days=1)
+        _sun_years[year] = positions
+    return positions
+
+def get_prayer_table(latitude, longitude, method="MWL", asr="shafi", year=None):
+    """Cached yearly table (locations are rounded to ~1 km so nearby channels share a table)"""
+    year = year or date.today().year
+    key = (round(latitude, 2), round(longitude, 2), method, asr, year)
+    table = _tables.get(key)
+    if table is None:
+        with _tables_lock:
+            table = _tables.get(key)
+            if table is None:
+                table = PrayerTable(year, key[0], key[1], method, asr)
+                _tables[key] = table
+    return table
+
+
+class PrayerLocation:
+    """Coordinates and calculation settings of a place"""
+    __slots__ = ("latitude", "longitude", "method", "asr")
+
+    def __init__(self, latitude, longitude, method="MWL", asr="shafi"):
+        if method not in METHODS:
+            raise ValueError(f"unknown calculation method {method!r} (use one of {', '.join(METHODS)})")
+        if asr not in ASR_FACTORS:
+            raise ValueError(f"unknown asr method {asr!r} (use shafi or hanafi)")
+        if not (-90 < float(latitude) < 90 and -180 <= float(longitude) <= 180):
+            raise ValueError(f"invalid coordinates {latitude}, {longitude}")
+        self.latitude = float(latitude)
+        self.longitude = float(longitude)
+        self.method = method
+        self.asr = asr
+
+    def time_of(self, prayer, day):
+        """Prayer time of a date as an aware UTC datetime"""
+        table = get_prayer_table(self.latitude, self.longitude, self.method, self.asr, day.year)
+        return table.time_of(prayer, day)
+
+    def times(self, day):
+        """All prayer times of a date"""
+        return {prayer: self.time_of(prayer, day) for prayer in PRAYERS}
+
+    def slot_time(self, spec):
+        """Turn "fajr+20" into a function date -> UTC datetime (for EventScheduler.add_daily)"""
+        parsed = parse_prayer_slot(spec)
+        if parsed is None:
+            raise ValueError(f"not a prayer-relative time: {spec!r}")
+        prayer, offset = parsed
+        shift = timedelta(minutes=offset)
+        tables = {}  # year -> table, saves the shared cache lookup on every call
+
+        def time_for(day):
+            table = tables.get(day.year)
+            if table is None:
+                table = tables[day.year] = get_prayer_table(
+                    self.latitude, self.longitude, self.method, self.asr, day.year
+                )
+            return table.time_of(prayer, day) + shift
+        time_for.spec = spec
+        return time_for
+
+    def __repr__(self):
+        return f"<PrayerLocation {self.latitude:.4f},{self.longitude:.4f} {self.method}/{self.asr}>"
+
+
+if __name__ == "__main__":
+    # Print today's times, e.g.: python prayer_times.py 30.0444 31.2357 Egypt Africa/Cairo
+    import sys
+    from zoneinfo import ZoneInfo
+    lat, lon = float(sys.argv[1]), float(sys.argv[2])
+    location = PrayerLocation(lat, lon, sys.argv[3] if len(sys.argv) > 3 else "MWL")
+    tz = ZoneInfo(sys.argv[4]) if len(sys.argv) > 4 else None
+    for prayer, moment in location.times(date.today()).items():
+        print(f"{prayer:8} {moment.astimezone(tz).strftime('%H:%M')}")
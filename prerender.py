@@ -0,0 +1,87 @@
+"""
+Post Pre-rendering
+Builds final channel messages ahead of time and validates them offline
+(Telegram HTML subset, balanced tags, entities)
+"""
+
+import html
+import re
+from logger_config import setup_logger
+
+logger = setup_logger()
+
+MAX_MESSAGE_LENGTH = 4096
+
+# Tags accepted by Telegram's HTML parse mode
+ALLOWED_TAGS = {
+    "b", "strong", "i", "em", "u", "ins", "s", "strike", "del", "a", "code", "pre",
+    "span", "tg-spoiler", "blockquote", "tg-emoji"
+}
+TAG_PATTERN = re.compile(r"<(/?)([a-zA-Z][\w-]*)((?:\s[^<>]*)?)>")
+ENTITY_PATTERN = re.compile(r"&(?:lt|gt|amp|quot|#\d+|#x[0-9a-fA-F]+);")
+
+def utf16_length(text):
+    """Length as Telegram counts it (UTF-16 code units)"""
+    return len(text.encode("utf-16-le")) // 2
+
+def validate_html(message):
+    """Check a message against Telegram's HTML rules, returns (problems, visible_length)"""
+    problems = []
+    stack = []
+    visible = []
+    position = 0
+    length = len(message)
+
+    while position < length:
+        char = message[position]
+        if char == "<":
+            match = TAG_PATTERN.match(message, position)
+            if not match or match.group(2).lower() not in ALLOWED_TAGS:
+                problems.append(f"unsupported or broken tag at {position}")
+                position += 1
+                continue
+            closing, tag = match.group(1), match.group(2).lower()
+            if not closing:
+                stack.append(tag)
+            elif not stack or stack.pop() != tag:
+                problems.append(f"unbalanced </{tag}> at {position}")
+            position = match.end()
+        elif char == "&":
+            match = ENTITY_PATTERN.match(message, position)
+            if not match:
+                problems.append(f"unescaped '&' at {position}")
+                visible.append(char)
+                position += 1
+                continue
+            visible.append(html.unescape(match.group(0)))
+            position = match.end()
+        elif char == ">":
+            problems.append(f"unescaped '>' at {position}")
+            visible.append(char)
+            position += 1
+        else:
+            visible.append(char)
+            position += 1
+
+    if stack:
+        problems.append(f"unclosed tags: {', '.join(stack)}")
+
+    return problems, utf16_length("".join(visible))
+
+def render_post(telegram_bot, content_type, content):
+    """Format content into a message that Telegram will accept, returns (message, problems)
+
+    Invalid HTML in the content is escaped (the title markup is ours and always valid).
+    Length is not limited here: long messages are split into parts when sent.
+    """
+    message = telegram_bot.format_content(content_type, content)
+    problems, _ = validate_html(message)
+
+    if problems:
+        content = html.escape(content, quote=False)
+        message = telegram_bot.format_content(content_type, content)
+        problems_after, _ = validate_html(message)
+        if problems_after:
+            raise ValueError(f"cannot render {content_type}: {problems_after}")
+
+    return message, problems
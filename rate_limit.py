@@ -0,0 +1,84 @@
+"""
+Rate Limiting
+Token buckets for Telegram's global and per-chat sending limits, and per-user
+limits on incoming callbacks
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        """Initialize bucket refilling `rate` tokens per second up to `capacity`"""
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def try_acquire(self, tokens=1):
+        """Take tokens if available, never blocks"""
+        with self._lock:
+            self._refill(self.clock())
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+    def reserve(self, tokens=1):
+        """Take tokens now (possibly going into debt) and return how long to wait before using them"""
+        with self._lock:
+            self._refill(self.clock())
+            self.tokens -= tokens
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def acquire(self, tokens=1):
+        """Block until tokens are available, returns the time waited"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class UserRateLimiter:
+    def __init__(self, rate, burst=None, max_users=100000, clock=time.monotonic):
+        """Initialize per-user token buckets, keeping at most `max_users` (least recently seen are dropped)"""
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(rate, 1))
+        self.max_users = max_users
+        self.clock = clock
+        self._buckets = OrderedDict()  # user_id -> [tokens, updated]
+        self._lock = threading.Lock()
+
+    def allow(self, user_id):
+        """Take one token from the user's bucket, False when the user is over the limit"""
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(user_id)
+            if bucket is None:
+                # A forgotten user starts with a full bucket, like a new one
+                bucket = self._buckets[user_id] = [self.burst, now]
+                if len(self._buckets) > self.max_users:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(user_id)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True
+            return False
+
+    def __len__(self):
+        return len(self._buckets)
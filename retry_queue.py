@@ -0,0 +1,57 @@
+"""
+Retry Queue
+Timer queue that runs delayed retries on its own thread so callers never sleep
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from logger_config import setup_logger
+
+logger = setup_logger()
+
+class RetryQueue:
+    def __init__(self, name="RetryQueue"):
+        """Initialize an empty queue, the worker thread starts with the first retry"""
+        self.name = name
+        self._heap = []                  # (due_time, sequence, func, args, kwargs)
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def schedule(self, delay, func, *args, **kwargs):
+        """Run func(*args, **kwargs) after `delay` seconds"""
+        with self._cond:
+            due = time.monotonic() + max(delay, 0)
+            heapq.heappush(self._heap, (due, next(self._sequence), func, args, kwargs))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name=self.name)
+                self._thread.start()
+            self._cond.notify()
+
+    def pending(self):
+        """Number of retries waiting to run"""
+        with self._cond:
+            return len(self._heap)
+
+    def _next_task(self):
+        with self._cond:
+            while True:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                due = self._heap[0][0]
+                now = time.monotonic()
+                if due > now:
+                    self._cond.wait(due - now)
+                    continue
+                return heapq.heappop(self._heap)[2:]
+
+    def _run(self):
+        while True:
+            func, args, kwargs = self._next_task()
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                logger.error(f"❌ Retry task {getattr(func, '__name__', func)} failed: {e}")
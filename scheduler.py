@@ -3,18 +3,40 @@ Content Scheduler
 Handles timing and scheduling of content posts
 """
 
-import schedule
+import heapq
 import time
-from datetime import datetime
+from datetime import datetime, timedelta, timezone as dt_timezone
+from event_scheduler import DailyJob, EventScheduler, parse_time, resolve_timezone
+from prayer_times import parse_prayer_slot
+from prerender import render_post
+from message_splitter import split_message
+from post_ledger import PostLedger, FAILED
+from telegram_bot import DEFERRED
 from logger_config import setup_logger
 
 logger = setup_logger()
 
 class ContentScheduler:
-    def __init__(self, telegram_bot, content_generator):
+    def __init__(self, telegram_bot, content_generator, publisher=None, outbox=None,
+                 timezone=None, event_scheduler=None, channel_schedules=None, location=None,
+                 prerender_at=None, prerender_hours=30, leader=None, ledger=None):
         """Initialize scheduler with bot and content generator"""
         self.telegram_bot = telegram_bot
         self.content_generator = content_generator
+        self.publisher = publisher  # optional FanoutPublisher for many destinations
+        self.outbox = outbox        # optional durable Outbox - posts are enqueued, not sent inline
+        self.timezone = timezone    # IANA zone name for schedule times (None = server local time)
+        self.event_scheduler = event_scheduler or EventScheduler()
+        self.channel_schedules = channel_schedules or []  # per-channel tables (ChannelSchedule)
+        self.location = location    # PrayerLocation for prayer-relative times like "fajr+20"
+        self.prerender_at = prerender_at        # daily time to build upcoming posts into the outbox (None = off)
+        self.prerender_hours = prerender_hours  # how far ahead each pre-render run looks
+        self.leader = leader        # optional LeaderElector - only the leader replica runs jobs
+        # (channel, content type, date) -> attempts - consulted before every direct send
+        self.ledger = ledger if ledger is not None else PostLedger()
+        if leader is not None:
+            # Jobs stay scheduled on every replica (for /schedule), followers skip them
+            self.event_scheduler.guard = lambda: leader.is_leader
         self.scheduled_jobs = []
         
         # Default schedule times (can be overridden by config)
@@ -35,14 +57,16 @@ class ContentScheduler:
         
         logger.info("📅 Setting up content schedule...")
         
-        # Clear existing jobs
-        schedule.clear()
+        # Clear existing jobs (wakes the run loop so it picks up the new times)
+        self.event_scheduler.clear()
+        self.scheduled_jobs = []
         
         # Schedule each content type
         for content_type, time_str in schedule_times.items():
             try:
-                job = schedule.every().day.at(time_str).do(
-                    self._generate_and_send_content, content_type
+                job = self.event_scheduler.add_daily(
+                    self._resolve_time(time_str, self.location), self._run_default_slot, content_type,
+                    tz=self.timezone, tag=content_type
                 )
                 self.scheduled_jobs.append((content_type, time_str, job))
                 logger.info(f"   📍 {content_type} scheduled at {time_str}")
@@ -50,15 +74,173 @@ class ContentScheduler:
                 logger.error(f"❌ Failed to schedule {content_type} at {time_str}: {e}")
         
         logger.info(f"✅ Successfully scheduled {len(self.scheduled_jobs)} content types")
+        
+        if self.channel_schedules:
+            self._setup_channel_schedules()
+        
+        if self.prerender_at and self.outbox:
+            self.event_scheduler.add_daily(
+                self.prerender_at, self.prerender_upcoming, tz=self.timezone, tag="prerender"
+            )
+            logger.info(f"   📍 pre-render of upcoming posts scheduled at {self.prerender_at}")
+            if self.leader is None or self.leader.is_leader:
+                self.prerender_upcoming()
+        
         self._log_next_runs()
     
+    def _setup_channel_schedules(self):
+        """Add one job per (channel, slot) - the heap keeps picking due jobs O(log n)"""
+        channel_jobs = 0
+        for channel in self.channel_schedules:
+            for content_type, time_str in channel.slots.items():
+                try:
+                    self.event_scheduler.add_daily(
+                        self._resolve_time(time_str, channel.location or self.location),
+                        self._run_channel_slot, channel, content_type,
+                        tz=channel.tz, tag=content_type
+                    )
+                    channel_jobs += 1
+                except Exception as e:
+                    logger.error(f"❌ Failed to schedule {content_type} for {channel.channel_id}: {e}")
+        
+        logger.info(f"✅ Scheduled {channel_jobs} posts for {len(self.channel_schedules)} channels")
+    
+    def _resolve_time(self, time_str, location):
+        """Fixed "HH:MM" times pass through, "fajr+20" becomes a daily-moving time"""
+        if parse_prayer_slot(time_str) is None:
+            return time_str
+        if location is None:
+            raise ValueError(f"{time_str} needs a location (set PRAYER_LATITUDE/PRAYER_LONGITUDE)")
+        # Times come from the location's cached yearly table - no calculation at fire time
+        return location.slot_time(time_str)
+    
+    def _slot_key(self, content_type, local_date):
+        """Idempotency key of one slot on one (local) day - shared by pre-render and fire time"""
+        return f"{content_type}:{local_date.strftime('%Y-%m-%d')}"
+    
+    def _run_default_slot(self, content_type):
+        """Post one slot of the default schedule (keyed by the schedule's local date)"""
+        local_date = datetime.now(resolve_timezone(self.timezone))
+        self._generate_and_send_content(
+            content_type, self._slot_key(content_type, local_date), post_date=local_date.date()
+        )
+    
+    def _run_channel_slot(self, channel, content_type):
+        """Post one slot of a channel's own schedule (keyed by the channel's local date)"""
+        local_date = datetime.now(channel.tz)
+        self._generate_and_send_content(
+            content_type, self._slot_key(content_type, local_date), channel_id=channel.channel_id,
+            post_date=local_date.date()
+        )
+    
+    def _destinations(self, channel_id=None):
+        """Chats a post goes to"""
+        if channel_id:
+            return [channel_id]
+        if self.publisher:
+            return self.publisher.destinations
+        return [self.telegram_bot.channel_id]
+    
+    def prerender_upcoming(self, hours=None):
+        """Render every post due in the next `hours` into the outbox, returns how many were queued
+        
+        Posts are queued with not_before = their slot time, so at fire time the job finds
+        its key already in the outbox and nothing is generated or formatted.
+        """
+        if not self.outbox:
+            return 0
+        
+        now = datetime.now(dt_timezone.utc)
+        horizon = now + timedelta(hours=hours or self.prerender_hours)
+        queued = 0
+        failed = 0
+        
+        for job in self.event_scheduler.jobs:
+            if job.callback == self._run_default_slot:
+                channel_id, content_type = None, job.args[0]
+            elif job.callback == self._run_channel_slot:
+                channel_id, content_type = job.args[0].channel_id, job.args[1]
+            else:
+                continue
+            
+            run_at = job.compute_next_run(now)
+            while run_at <= horizon:
+                local_run = run_at.astimezone(job.tz)
+                slot_key = self._slot_key(content_type, local_run)
+                try:
+                    queued += self._prerender_slot(content_type, slot_key, channel_id, run_at, local_run.date())
+                except Exception as e:
+                    failed += 1
+                    logger.error(f"❌ Pre-render failed for {slot_key} ({channel_id or 'default'}): {e}")
+                run_at = job.compute_next_run(run_at)
+        
+        logger.info(f"🧾 Pre-rendered {queued} posts for the next {hours or self.prerender_hours}h ({failed} failed)")
+        return queued
+    
+    def _prerender_slot(self, content_type, slot_key, channel_id, run_at, post_date):
+        destinations = [
+            chat_id for chat_id in self._destinations(channel_id)
+            if not self.outbox.exists(f"{slot_key}:{chat_id}")
+        ]
+        if not destinations:
+            return 0
+        
+        content = self.content_generator.generate_content(content_type, channel_id=channel_id, post_date=post_date)
+        if not content:
+            raise ValueError("no content generated")
+        message, problems = render_post(self.telegram_bot, content_type, content)
+        if problems:
+            logger.warning(f"⚠️ Fixed {slot_key} while pre-rendering: {'; '.join(problems)}")
+        
+        queued = 0
+        for chat_id in destinations:
+            if self.outbox.enqueue(f"{slot_key}:{chat_id}", chat_id, message, content_type,
+                                   not_before=run_at.timestamp()):
+                queued += 1
+        return queued
+    
+    def _already_queued(self, idempotency_key, channel_id=None):
+        """True when every destination of this slot already has a (pre-rendered) post"""
+        if not (self.outbox and idempotency_key):
+            return False
+        return all(
+            self.outbox.exists(f"{idempotency_key}:{chat_id}") for chat_id in self._destinations(channel_id)
+        )
+    
+    def _already_posted(self, content_type, post_date, channel_id=None):
+        """True when no destination may be sent this slot any more (sent, or outcome unknown)"""
+        if post_date is None:
+            return False
+        for chat_id in self._destinations(channel_id):
+            entry = self.ledger.status(chat_id, content_type, post_date)
+            if entry is None or (entry[0] == FAILED and entry[1] < self.ledger.max_attempts):
+                return False
+        return True
+    
+    def _ledger_finish(self, content_type, post_date):
+        """Callback finish(chat_id, sent) recording a send's outcome (None without a post date)"""
+        if post_date is None:
+            return None
+        return lambda chat_id, sent: self.ledger.finish(chat_id, content_type, post_date, sent)
+    
+    def _claim_destinations(self, content_type, post_date, destinations):
+        """Destinations this slot may still be sent to (each gets a ledger attempt)"""
+        if post_date is None:
+            return list(destinations)
+        claimed = [chat_id for chat_id in destinations
+                   if self.ledger.begin(chat_id, content_type, post_date) is not None]
+        if len(claimed) < len(destinations):
+            logger.info(f"🔁 {content_type} {post_date}: skipping {len(destinations) - len(claimed)} "
+                        f"destinations already posted (or with an unknown outcome)")
+        return claimed
+    
     def run_pending_tasks(self):
         """Run any pending scheduled tasks with bulletproof protection"""
         max_retries = 5
         for attempt in range(max_retries):
             try:
                 # Try to run pending tasks
-                schedule.run_pending()
+                self.event_scheduler.run_pending()
                 return  # Success - exit retry loop
             except KeyboardInterrupt:
                 logger.info("📶 Ignoring keyboard interrupt in pending tasks...")
@@ -77,10 +259,27 @@ class ContentScheduler:
                     logger.error("❌ All retry attempts failed - continuing anyway...")
                     return
     
-    def _generate_and_send_content(self, content_type):
-        """Generate and send content for the specified type with bulletproof protection"""
+    def run_forever(self):
+        """Block running jobs exactly when due (wakes early when the schedule changes)"""
+        self.event_scheduler.run_forever()
+    
+    def _generate_and_send_content(self, content_type, idempotency_key=None, channel_id=None, post_date=None):
+        """Generate and send content for the specified type with bulletproof protection
+        
+        With a post_date every direct send goes through the post ledger first, so a
+        re-run job, a restarted stack or a retry after a timeout never posts the slot twice.
+        """
         max_send_attempts = 3
         
+        if self._already_queued(idempotency_key, channel_id):
+            # Pre-rendered: the outbox drainer sends it when due
+            logger.info(f"📬 {idempotency_key} was pre-rendered - nothing to generate")
+            return
+        
+        if self._already_posted(content_type, post_date, channel_id):
+            logger.info(f"🔁 {content_type} for {post_date} was already posted - not posting again")
+            return
+        
         # Wrap everything in bulletproof protection
         for main_attempt in range(3):
             try:
@@ -91,7 +290,9 @@ class ContentScheduler:
                 content = None
                 for gen_attempt in range(3):
                     try:
-                        content = self.content_generator.generate_content(content_type)
+                        content = self.content_generator.generate_content(
+                            content_type, channel_id=channel_id, post_date=post_date
+                        )
                         if content:
                             break
                         else:
@@ -102,12 +303,51 @@ class ContentScheduler:
                         time.sleep(3)
                         continue
                 
+                if content and self.outbox:
+                    # Delivery (and its retries) happens on the outbox drainer thread
+                    self._enqueue_post(content_type, content, idempotency_key, channel_id)
+                    return
+                
+                if content and self.publisher and not channel_id:
+                    # One send per destination - each send already retries, so never resend to all
+                    destinations = self._claim_destinations(content_type, post_date, self.publisher.destinations)
+                    if not destinations:
+                        return
+                    finish = self._ledger_finish(content_type, post_date)
+                    results = self.publisher.publish_formatted(content_type, content, destinations, finish)
+                    for result in results:
+                        if finish and result["error"] is None and not result["deferred"]:
+                            # A raised error leaves the attempt open: Telegram may have posted it,
+                            # a deferred send is finished by the retry queue
+                            finish(result["chat_id"], result["success"])
+                    delivered = sum(1 for result in results if result["success"])
+                    logger.info(f"✅ Posted {content_type} to {delivered}/{len(results)} destinations")
+                    return
+                
                 if content:
                     # Send to Telegram with multiple attempts
                     send_success = False
+                    chat_id = channel_id or self.telegram_bot.channel_id
+                    finish = self._ledger_finish(content_type, post_date)
+                    message, problems = render_post(self.telegram_bot, content_type, content)
+                    if problems:
+                        logger.warning(f"⚠️ Fixed {content_type} message before sending: {'; '.join(problems)}")
+                    parts = split_message(message)
                     for send_attempt in range(max_send_attempts):
+                        if not self._claim_destinations(content_type, post_date, [chat_id]):
+                            return
                         try:
-                            success = self.telegram_bot.send_formatted_content(content_type, content)
+                            success, sent = self.telegram_bot.send_parts(
+                                parts, chat_id, on_result=finish and (lambda sent: finish(chat_id, sent))
+                            )
+                            # A long post that failed midway continues after the parts already posted
+                            parts = parts[sent:]
+                            if success == DEFERRED:
+                                # Rate limited: the retry queue sends it and records the outcome
+                                logger.info(f"⏳ {content_type} queued for a rate-limit retry")
+                                return
+                            if finish:
+                                finish(chat_id, success)
                             if success:
                                 logger.info(f"✅ Successfully posted {content_type} (send attempt #{send_attempt+1})")
                                 send_success = True
@@ -117,6 +357,10 @@ class ContentScheduler:
                                 time.sleep(5 * (send_attempt + 1))
                         except Exception as send_error:
                             logger.error(f"❌ Send error for {content_type} (attempt {send_attempt+1}): {send_error}")
+                            if post_date is not None:
+                                # Telegram may already have the post - the ledger keeps it from being resent
+                                logger.warning(f"⚠️ {content_type} for {post_date} may have been posted - not resending")
+                                return
                             time.sleep(5 * (send_attempt + 1))
                             continue
                     
@@ -144,41 +388,77 @@ class ContentScheduler:
                     logger.error(f"❌ All attempts failed for {content_type} - task will be retried later")
                     return
     
+    def _enqueue_post(self, content_type, content, idempotency_key=None, channel_id=None):
+        """Put a formatted post in the outbox for every destination (or just channel_id)"""
+        slot_key = idempotency_key or self._slot_key(content_type, datetime.now())
+        message, problems = render_post(self.telegram_bot, content_type, content)
+        if problems:
+            logger.warning(f"⚠️ Fixed {slot_key} before queueing: {'; '.join(problems)}")
+        destinations = self._destinations(channel_id)
+        
+        queued = 0
+        for chat_id in destinations:
+            if self.outbox.enqueue(f"{slot_key}:{chat_id}", chat_id, message, content_type):
+                queued += 1
+        logger.info(f"📮 Queued {content_type} for {queued}/{len(destinations)} destinations")
+    
     def _log_next_runs(self):
         """Log the next scheduled runs"""
         logger.info("🔜 Next scheduled posts:")
         
-        # Get all jobs sorted by next run time
-        jobs_info = []
-        for job in schedule.jobs:
-            next_run = job.next_run
-            if next_run:
-                # Find the content type for this job
-                content_type = "unknown"
-                for ct, time_str, scheduled_job in self.scheduled_jobs:
-                    if scheduled_job == job:
-                        content_type = ct
-                        break
-                
-                jobs_info.append((next_run, content_type))
+        # Get the earliest jobs without sorting thousands of channel jobs
+        jobs_info = heapq.nsmallest(
+            3, ((job.next_run, job.tag or "unknown") for job in self.event_scheduler.jobs)
+        )
         
-        jobs_info.sort(key=lambda x: x[0])
-        
-        for next_run, content_type in jobs_info[:3]:  # Show next 3 runs
-            formatted_time = next_run.strftime("%Y-%m-%d %H:%M")
+        for next_run, content_type in jobs_info:  # Show next 3 runs
+            formatted_time = next_run.astimezone().strftime("%Y-%m-%d %H:%M")
             logger.info(f"   📍 {content_type}: {formatted_time}")
     
     def get_schedule_status(self):
-        """Get current schedule status"""
+        """Get current schedule status
+
+        Slots come from the configured schedule (default and per-channel tables), so a
+        process that never registered jobs - like the webhook - still shows them.
+        """
+        now = self.event_scheduler.clock.now()
+        tables = [(None, resolve_timezone(self.timezone), self.location, self.default_schedule)]
+        tables += [
+            (channel.channel_id, channel.tz, channel.location or self.location, channel.slots)
+            for channel in self.channel_schedules
+        ]
+        
+        upcoming = []
+        for channel_id, tz, location, slots in tables:
+            for content_type, time_str in slots.items():
+                try:
+                    at = self._resolve_time(time_str, location)
+                    at = parse_time(at) if isinstance(at, str) else at
+                    next_run = DailyJob(None, at, tz, None, (), content_type).compute_next_run(now)
+                except Exception as e:
+                    logger.warning(f"⚠️ Cannot compute next run of {content_type} at {time_str}: {e}")
+                    continue
+                upcoming.append((next_run, channel_id, content_type, time_str, tz))
+        upcoming.sort(key=lambda slot: slot[0])
+        
         status = {
-            "total_jobs": len(schedule.jobs),
+            "total_jobs": len(self.event_scheduler.jobs),
             "scheduled_content_types": len(self.scheduled_jobs),
-            "next_run": None
+            "next_run": None,
+            "slots": []
         }
+        if upcoming:
+            status["next_run"] = upcoming[0][0].astimezone(resolve_timezone(self.timezone)).strftime("%Y-%m-%d %H:%M:%S")
         
-        if schedule.jobs:
-            next_job = min(schedule.jobs, key=lambda x: x.next_run)
-            status["next_run"] = next_job.next_run.strftime("%Y-%m-%d %H:%M:%S")
+        # Slots in the order they fire next, times in their schedule's timezone
+        for next_run, channel_id, content_type, time_str, tz in upcoming:
+            status["slots"].append({
+                "channel": channel_id,
+                "content_type": content_type,
+                "title": self.telegram_bot._get_content_title(content_type),
+                "time": time_str,
+                "next_run": next_run.astimezone(tz).strftime("%Y-%m-%d %H:%M")
+            })
         
         return status
     
@@ -189,7 +469,7 @@ class ContentScheduler:
             return False
         
         logger.info(f"🚀 Manually triggering {content_type}")
-        self._generate_and_send_content(content_type)
+        self._generate_and_send_content(content_type, f"manual:{content_type}:{time.time()}")
         return True
     
     def test_all_content_types(self):
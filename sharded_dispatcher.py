@@ -0,0 +1,276 @@
+"""
+Sharded Update Dispatcher
+One receiver polls Telegram and hands updates to N worker processes,
+sharded by consistent hash of the user id so each user's state lives in one worker
+"""
+
+import bisect
+import collections
+import hashlib
+import multiprocessing
+import queue
+import time
+from telebot import apihelper, types
+from metrics import DeltaReporter, apply_deltas
+from logger_config import setup_logger
+
+logger = setup_logger()
+
+def get_user_key(raw_update):
+    """Return the id an update is sharded by (the sender, or the chat for channel posts)"""
+    for field in ("callback_query", "message", "edited_message", "inline_query",
+                  "chosen_inline_result", "my_chat_member", "chat_member"):
+        payload = raw_update.get(field)
+        if payload:
+            sender = payload.get("from")
+            if sender:
+                return sender["id"]
+            if "chat" in payload:
+                return payload["chat"]["id"]
+
+    for field in ("channel_post", "edited_channel_post"):
+        payload = raw_update.get(field)
+        if payload:
+            return payload["chat"]["id"]
+
+    return 0  # everything else goes to one fixed shard
+
+
+def get_command(raw_update):
+    """Bot command of a message update ("schedule" for "/schedule@bot now"), or None"""
+    text = (raw_update.get("message") or {}).get("text") or ""
+    words = text[1:].split(maxsplit=1) if text.startswith("/") else None
+    return words[0].split("@", 1)[0] if words else None
+
+
+class ShardRing:
+    """Consistent hash ring - adding or removing a worker moves only ~1/N of the users"""
+
+    def __init__(self, shards, vnodes=64):
+        """Initialize the ring with `vnodes` points per shard"""
+        self.shards = shards
+        points = sorted(
+            (self._hash(f"{shard}:{vnode}"), shard)
+            for shard in range(shards) for vnode in range(vnodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._owners = [shard for _, shard in points]
+
+    @staticmethod
+    def _hash(key):
+        return int.from_bytes(hashlib.blake2b(str(key).encode(), digest_size=8).digest(), "big")
+
+    def shard_for(self, key):
+        """Shard index owning a user/chat id"""
+        index = bisect.bisect(self._hashes, self._hash(key))
+        return self._owners[index % len(self._owners)]
+
+
+def _worker_main(index, worker_factory, updates, ready, done, taken, report_interval=1.0):
+    """Worker process: build the bot with its handlers, then handle batches in order
+
+    `taken` counts the batches this shard has taken off its queue, so after a crash
+    the parent can tell the batch that died with the worker from the ones still queued.
+    Each finished batch is acknowledged on `done`; at most every report_interval
+    seconds (and whenever the worker goes idle) the acknowledgement carries the
+    worker's metrics, so /metrics in the main process covers every shard.
+    """
+    bot = worker_factory(index)
+    bot.threaded = False  # handlers run inline, one user's updates stay ordered
+    reporter = DeltaReporter()
+    last_report = time.monotonic()
+    ready.put(index)
+
+    while True:
+        batch = updates.get()
+        if batch is None:
+            break
+        taken.value += 1
+        try:
+            bot.process_new_updates([types.Update.de_json(raw_update) for raw_update in batch])
+        except Exception as e:
+            logger.error(f"❌ Shard {index} handler error: {e}")
+
+        report = None
+        now = time.monotonic()
+        if now - last_report >= report_interval or updates.empty():
+            report, last_report = reporter.collect(), now
+        done.put((index, len(batch), report))
+
+
+class ShardedDispatcher:
+    def __init__(self, token, worker_factory, workers=4, poll_timeout=20, start_timeout=60,
+                 local_bot=None, local_commands=()):
+        """Initialize the dispatcher
+
+        worker_factory(index) runs inside each worker process and returns a TeleBot
+        with its handlers registered. It must be importable (module-level), since
+        workers are spawned, not forked - the parent has threads and open databases.
+        Messages with one of `local_commands` are handled by `local_bot` in this
+        process instead (e.g. /schedule, which needs the main process's scheduler).
+        """
+        self.token = token
+        self.worker_factory = worker_factory
+        self.workers = workers
+        self.poll_timeout = poll_timeout
+        self.start_timeout = start_timeout
+        self.offset = 0
+        self.ring = ShardRing(workers)
+
+        self._context = multiprocessing.get_context("spawn")
+        self._processes = [None] * workers
+        self._queues = [self._context.Queue() for _ in range(workers)]
+        self._ready = self._context.Queue()  # worker index once its bot is built
+        self._done = self._context.Queue()   # (shard, batch size, metrics report or None)
+        self._pending = 0
+        self._in_flight = [collections.deque() for _ in range(workers)]  # batches not acknowledged yet
+        self._taken = [self._context.Value("Q", 0, lock=False) for _ in range(workers)]
+        self._acked = [0] * workers
+        self.local_bot = local_bot
+        self.local_commands = frozenset(local_commands)
+        self.shard_gauges = {}   # shard -> {(gauge name, label values): value} of its last report
+        self.stats = {"received": 0, "restarts": 0, "lost": 0}
+
+    def _spawn(self, index):
+        process = self._context.Process(
+            target=_worker_main,
+            args=(index, self.worker_factory, self._queues[index], self._ready, self._done, self._taken[index]),
+            daemon=True,
+            name=f"UpdateShard-{index}"
+        )
+        process.start()
+        self._processes[index] = process
+
+    def start(self):
+        """Start all worker processes and wait until each has built its bot"""
+        for index in range(self.workers):
+            self._spawn(index)
+        deadline = time.monotonic() + self.start_timeout
+        for _ in range(self.workers):
+            self._ready.get(timeout=max(deadline - time.monotonic(), 0.01))
+        logger.info(f"🧩 {self.workers} update shard workers ready")
+
+    def dispatch(self, raw_updates):
+        """Send a batch of raw updates to their shards (one queue put per shard)"""
+        batches = {}
+        local = []
+        for raw_update in raw_updates:
+            if self.local_bot is not None and get_command(raw_update) in self.local_commands:
+                local.append(raw_update)
+                continue
+            shard = self.ring.shard_for(get_user_key(raw_update))
+            batches.setdefault(shard, []).append(raw_update)
+
+        for shard, batch in batches.items():
+            self._queues[shard].put(batch)
+            self._in_flight[shard].append(batch)
+        self._pending += len(batches)
+        self.stats["received"] += len(raw_updates)
+        if local:
+            self._process_local(local)
+
+    def _process_local(self, raw_updates):
+        try:
+            self.local_bot.process_new_updates([types.Update.de_json(raw_update) for raw_update in raw_updates])
+        except Exception as e:
+            logger.error(f"❌ Local handler error: {e}")
+
+    def _finished(self, result):
+        """Account for one handled batch and merge the metrics that came with it"""
+        shard, _, report = result
+        self._in_flight[shard].popleft()
+        self._acked[shard] += 1
+        self._pending -= 1
+        if report is not None:
+            apply_deltas(report["deltas"])
+            self.shard_gauges[shard] = report["gauges"]
+
+    def gauge_total(self, name):
+        """Sum of a gauge over all shards' last reports (e.g. active users, which are sharded)"""
+        return sum(
+            value for gauges in list(self.shard_gauges.values())
+            for (gauge_name, _), value in gauges.items() if gauge_name == name
+        )
+
+    def drain(self, timeout=None):
+        """Wait until every dispatched batch has been handled (or lost with a crashed worker)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._pending:
+            wait = 1.0 if deadline is None else min(1.0, max(deadline - time.monotonic(), 0))
+            try:
+                self._finished(self._done.get(timeout=wait))
+            except queue.Empty:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise
+                self._check_workers()
+
+    def _collect(self):
+        # Count finished batches without blocking so _pending stays small
+        try:
+            while self._pending:
+                self._finished(self._done.get_nowait())
+        except queue.Empty:
+            pass
+
+    def _drop_lost(self, index):
+        """Give up on the batch a crashed worker had taken but not acknowledged
+
+        It is not requeued - the same updates would likely crash the new worker too.
+        """
+        self._collect()  # acknowledgements the worker sent before it died
+        while self._acked[index] < self._taken[index].value:
+            batch = self._in_flight[index].popleft()
+            self._acked[index] += 1
+            self._pending -= 1
+            self.stats["lost"] += len(batch)
+            update_ids = [raw_update.get("update_id") for raw_update in batch]
+            logger.error(f"❌ Shard {index} lost {len(batch)} updates with the crash: {update_ids}")
+
+    def _check_workers(self):
+        """Respawn crashed workers - their queued updates are still waiting for them"""
+        for index, process in enumerate(self._processes):
+            if not process.is_alive():
+                logger.error(f"❌ Shard {index} exited ({process.exitcode}) - restarting")
+                self.stats["restarts"] += 1
+                self._drop_lost(index)
+                self._spawn(index)
+
+    def stop(self):
+        """Let workers finish their queues, then exit"""
+        for update_queue in self._queues:
+            update_queue.put(None)
+        for process in self._processes:
+            if process is not None:
+                process.join(timeout=30)
+
+    def run_forever(self):
+        """Block the calling thread polling Telegram and feeding the shards"""
+        logger.info(f"⚡ Starting sharded update dispatcher ({self.workers} worker processes)")
+        apihelper.delete_webhook(self.token)
+        self.start()
+        try:
+            while True:
+                try:
+                    updates = apihelper.get_updates(
+                        self.token, offset=self.offset, timeout=self.poll_timeout,
+                        long_polling_timeout=self.poll_timeout
+                    )
+                except Exception as e:
+                    logger.error(f"❌ getUpdates error: {e} - retrying in 5 seconds...")
+                    time.sleep(5)
+                    continue
+
+                if updates:
+                    self.offset = updates[-1]["update_id"] + 1
+                    self.dispatch(updates)
+                self._collect()
+                self._check_workers()
+        finally:
+            self.stop()
+
+    def process_batch(self, raw_updates):
+        """Handle a batch of raw updates and return when all are done (used by benchmarks)"""
+        started = time.perf_counter()
+        self.dispatch(raw_updates)
+        self.drain()
+        return time.perf_counter() - started
@@ -0,0 +1,14 @@
+"""
+State Database
+Shared SQLite connection setup for the bot's persistent state (one file, many tables)
+"""
+
+import sqlite3
+
+def connect_state_db(db_path):
+    """Open a WAL-mode connection that can be shared between threads behind a lock"""
+    conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
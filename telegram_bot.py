@@ -4,19 +4,47 @@ Manages communication with Telegram API
 """
 
 import time
+import requests
 import telebot
 from telebot.apihelper import ApiTelegramException
+from retry_queue import RetryQueue
+from prerender import render_post
+from message_splitter import split_message
+from metrics import MESSAGES, SEND_LATENCY, THROTTLE_RETRY_AFTER, SENDS_DEFERRED
 from logger_config import setup_logger
 
 logger = setup_logger()
 
+DEFERRED = "deferred"   # send_message result: rate limited, delivery continues on the retry queue
+
+class SendOutcomeUnknown(Exception):
+    """The request may have reached Telegram (timeout, dropped connection) - resending could post twice"""
+
+
+def _outcome_unknown(error):
+    """True for failures that can happen after Telegram already received the request"""
+    if isinstance(error, ApiTelegramException):
+        error_msg = str(error).lower()
+        return error.error_code in (502, 504) or "timeout" in error_msg or "network" in error_msg
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return False  # never connected, nothing was sent
+    if isinstance(error, requests.exceptions.ConnectionError):
+        # Refused connections and DNS failures happen before the request is written
+        return "NewConnectionError" not in str(error) and "NameResolutionError" not in str(error)
+    return isinstance(error, (requests.exceptions.ReadTimeout, requests.exceptions.ChunkedEncodingError,
+                              TimeoutError, ConnectionResetError))
+
+
 class TelegramBot:
-    def __init__(self, token, channel_id):
-        """Initialize Telegram bot with token and channel ID"""
-        self.bot = telebot.TeleBot(token)
+    def __init__(self, token, channel_id, defer_retries=True, bot=None):
+        """Initialize Telegram bot with token and channel ID (optionally sharing a TeleBot)"""
+        self.bot = bot or telebot.TeleBot(token)
         self.channel_id = channel_id
         self.retry_attempts = 3
         self.retry_delay = 60
+        
+        # Rate-limited sends are retried from this queue instead of sleeping in the caller
+        self.retry_queue = RetryQueue(name="TelegramRetry") if defer_retries else None
     
     def test_connection(self):
         """Test Telegram bot connection"""
@@ -49,30 +77,77 @@ class TelegramBot:
             logger.error(f"❌ Unexpected error testing connection: {e}")
             return False
     
-    def send_message(self, message, retry_count=0):
-        """Send message to the configured channel with bulletproof retry logic"""
+    def send_message(self, message, retry_count=0, chat_id=None, on_result=None):
+        """Send message to the configured channel (or chat_id) with bulletproof retry logic
+        
+        Messages over Telegram's limit are split into parts (see message_splitter)
+        and sent in order. On a 429 the retry is queued for Telegram's retry_after and
+        DEFERRED is returned, so the calling thread is never blocked; on_result(sent)
+        is called with the real outcome once the queued retry finishes.
+        A timeout or dropped connection after the request went out is not resent:
+        SendOutcomeUnknown is raised so the caller can record that the post may exist.
+        """
+        chat_id = chat_id or self.channel_id
+        
+        # Bulletproof message validation and preparation
+        if not message or len(message.strip()) == 0:
+            logger.warning("⚠️ Empty message - skipping send")
+            return False
+        
+        return self.send_parts(split_message(message), chat_id, on_result, retry_count)[0]
+    
+    def send_parts(self, parts, chat_id=None, on_result=None, retry_count=0):
+        """Send already split message parts in order, returns (result, sent)
+        
+        result is as for send_message; `sent` is how many parts were delivered, so a
+        caller retrying a failure continues with parts[sent:] instead of posting them twice.
+        """
+        chat_id = chat_id or self.channel_id
+        if len(parts) > 1:
+            logger.info(f"✂️ Long message split into {len(parts)} parts")
+        started = time.perf_counter()
+        try:
+            return self._send_parts(parts, retry_count, chat_id, on_result)
+        finally:
+            SEND_LATENCY.observe(time.perf_counter() - started)
+    
+    def _send_parts(self, parts, retry_count, chat_id, on_result=None):
+        """Send parts in order - a rate-limited part is queued together with every part after it"""
+        for index, part in enumerate(parts):
+            try:
+                result = self._send_part(part, retry_count, chat_id, parts[index + 1:], on_result)
+            except SendOutcomeUnknown:
+                MESSAGES.labels("unknown").inc()
+                raise
+            if result is None:
+                MESSAGES.labels("deferred").inc()
+                return DEFERRED, index  # the rest of the batch is queued
+            if not result:
+                MESSAGES.labels("failed").inc()
+                return False, index
+        MESSAGES.labels("sent").inc()
+        return True, len(parts)
+    
+    def _retry_parts(self, parts, retry_count, chat_id, on_result):
+        """Queued retry of a rate-limited batch - reports the outcome once it is final"""
+        result, _ = self._send_parts(parts, retry_count, chat_id, on_result)
+        if result is not DEFERRED and on_result is not None:
+            on_result(result)
+    
+    def _send_part(self, message, retry_count, chat_id, following, on_result=None):
+        """Send one message part, returns True/False, or None when it was queued for retry"""
         max_retries = 5
         base_delay = 10
         
         # Multiple layers of protection for message sending
         for attempt in range(max_retries):
             try:
-                logger.info(f"📤 Sending message to {self.channel_id} (attempt {attempt+1}/{max_retries})...")
-                
-                # Bulletproof message validation and preparation
-                if not message or len(message.strip()) == 0:
-                    logger.warning("⚠️ Empty message - skipping send")
-                    return False
-                
-                # Split long messages if needed with safe truncation
-                if len(message) > 4096:
-                    message = message[:4090] + "..."
-                    logger.warning("⚠️ Message truncated to fit Telegram limit")
+                logger.info(f"📤 Sending message to {chat_id} (attempt {attempt+1}/{max_retries})...")
                 
                 # Attempt to send with multiple protection layers
                 try:
                     self.bot.send_message(
-                        chat_id=self.channel_id,
+                        chat_id=chat_id,
                         text=message,
                         parse_mode='HTML',
                         disable_web_page_preview=True
@@ -85,16 +160,30 @@ class TelegramBot:
                     error_msg = str(api_error).lower()
                     
                     # Handle specific API errors with different strategies
-                    if "too many requests" in error_msg:
-                        wait_time = min(300, base_delay * (2 ** attempt))  # Exponential backoff, max 5 min
+                    if api_error.error_code == 429 or "too many requests" in error_msg:
+                        # Telegram tells us exactly how long to wait
+                        fallback_wait = min(300, base_delay * (2 ** attempt))
+                        wait_time = self._get_retry_after(api_error, fallback_wait)
+                        self._record_throttle(wait_time)
+                        
+                        if self.retry_queue:
+                            if retry_count >= max_retries:
+                                # Sleeping here would stall every other retry on the queue thread
+                                logger.error(f"❌ Still rate limited after {retry_count} queued retries - dropping message")
+                                return False
+                            SENDS_DEFERRED.inc()
+                            logger.warning(f"⏳ Rate limited. Retry #{retry_count+1} queued in {wait_time} seconds")
+                            self.retry_queue.schedule(
+                                wait_time, self._retry_parts, [message] + following, retry_count + 1, chat_id, on_result
+                            )
+                            return None
+                        
                         logger.warning(f"⏳ Rate limited. Waiting {wait_time} seconds... (attempt {attempt+1})")
                         time.sleep(wait_time)
                         continue
-                    elif "timeout" in error_msg or "network" in error_msg:
-                        wait_time = min(60, base_delay * (attempt + 1))
-                        logger.warning(f"⏰ Network/timeout error. Waiting {wait_time} seconds... (attempt {attempt+1})")
-                        time.sleep(wait_time)
-                        continue
+                    elif _outcome_unknown(api_error):
+                        logger.warning(f"⏰ Network/timeout error - the message may have been posted, not resending: {api_error}")
+                        raise SendOutcomeUnknown(str(api_error)) from api_error
                     elif "forbidden" in error_msg or "unauthorized" in error_msg:
                         logger.error(f"❌ Permission error: {api_error} - cannot recover")
                         return False
@@ -112,6 +201,9 @@ class TelegramBot:
                             return False
                             
                 except Exception as send_error:
+                    if _outcome_unknown(send_error):
+                        logger.warning(f"⏰ Send timed out - the message may have been posted, not resending: {send_error}")
+                        raise SendOutcomeUnknown(str(send_error)) from send_error
                     logger.error(f"❌ Send error (attempt {attempt+1}): {send_error}")
                     if attempt < max_retries - 1:
                         time.sleep(base_delay * (attempt + 1))
@@ -119,6 +211,8 @@ class TelegramBot:
                     else:
                         return False
                         
+            except SendOutcomeUnknown:
+                raise
             except KeyboardInterrupt:
                 logger.info("📶 Ignoring keyboard interrupt in message send...")
                 time.sleep(2)
@@ -137,14 +231,88 @@ class TelegramBot:
                     return False
         
         logger.error("❌ Failed to send message after all attempts")
-        return True  # Return True to prevent bot shutdown
+        return False
+    
+    def try_send(self, message, chat_id=None):
+        """Single send attempt without sleeping, returns (status, retry_after, error)
+        
+        status is "sent", "retry" (temporary failure), "unknown" (timed out after the
+        request went out - Telegram may have posted it) or "failed" (will never succeed).
+        """
+        status, retry_after, error, _ = self.try_send_parts(split_message(message), chat_id)
+        return status, retry_after, error
+    
+    def try_send_parts(self, parts, chat_id=None):
+        """Send message parts in order without sleeping, returns (status, retry_after, error, sent)
+        
+        Stops at the first part that fails; `sent` is how many parts were delivered,
+        so a retry can continue with parts[sent:] instead of posting earlier parts twice.
+        """
+        for sent, part in enumerate(parts):
+            status, retry_after, error = self._try_send_part(part, chat_id or self.channel_id)
+            if status != "sent":
+                MESSAGES.labels({"retry": "deferred", "unknown": "unknown"}.get(status, "failed")).inc()
+                return status, retry_after, error, sent
+        MESSAGES.labels("sent").inc()
+        return "sent", None, None, len(parts)
     
-    def send_formatted_content(self, content_type, content):
+    def _try_send_part(self, message, chat_id):
+        try:
+            self.bot.send_message(
+                chat_id=chat_id,
+                text=message,
+                parse_mode='HTML',
+                disable_web_page_preview=True
+            )
+            return "sent", None, None
+        except ApiTelegramException as api_error:
+            error_msg = str(api_error).lower()
+            if api_error.error_code == 429 or "too many requests" in error_msg:
+                retry_after = self._get_retry_after(api_error, None)
+                self._record_throttle(retry_after or 0)
+                return "retry", retry_after, str(api_error)
+            if api_error.error_code in (400, 401, 403) or "forbidden" in error_msg or "unauthorized" in error_msg:
+                return "failed", None, str(api_error)
+            if _outcome_unknown(api_error):
+                return "unknown", None, str(api_error)
+            return "retry", None, str(api_error)
+        except Exception as send_error:
+            if _outcome_unknown(send_error):
+                return "unknown", None, str(send_error)
+            # Connection refused, DNS failures - nothing reached Telegram
+            return "retry", None, str(send_error)
+    
+    def _get_retry_after(self, api_error, default):
+        """Read retry_after from a 429 response, falling back to our own backoff"""
+        try:
+            retry_after = api_error.result_json.get("parameters", {}).get("retry_after")
+            if retry_after is not None:
+                return max(1, int(retry_after))
+        except (AttributeError, TypeError, ValueError):
+            pass
+        return default
+    
+    def _record_throttle(self, wait_time):
+        # Count, total and spread of the waits Telegram asked for, exported on /metrics
+        THROTTLE_RETRY_AFTER.observe(wait_time)
+    
+    def queued_retries(self):
+        """Number of rate-limited sends waiting in the retry queue"""
+        return self.retry_queue.pending() if self.retry_queue else 0
+    
+    def send_formatted_content(self, content_type, content, chat_id=None, on_result=None):
         """Send formatted content with appropriate emojis and formatting"""
         if not content:
             logger.error("❌ Cannot send empty content")
             return False
         
+        message, problems = render_post(self, content_type, content)
+        if problems:
+            logger.warning(f"⚠️ Fixed {content_type} message before sending: {'; '.join(problems)}")
+        return self.send_message(message, chat_id=chat_id, on_result=on_result)
+    
+    def format_content(self, content_type, content):
+        """Build the channel message for a content type"""
         # Add content type specific formatting
         emoji_map = {
             "morning_azkar": "🌅",
@@ -158,11 +326,7 @@ class TelegramBot:
         }
         
         emoji = emoji_map.get(content_type, "🕌")
-        
-        # Format the message
-        formatted_message = f"{emoji} <b>{self._get_content_title(content_type)}</b>\n\n{content}"
-        
-        return self.send_message(formatted_message)
+        return f"{emoji} <b>{self._get_content_title(content_type)}</b>\n\n{content}"
     
     def _get_content_title(self, content_type):
         """Get Arabic title for content type"""
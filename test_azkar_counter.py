@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Azkar counter tests
+Checks that a tap flood is fully counted while costing only a handful of Telegram API calls
+"""
+
+import time
+from types import SimpleNamespace
+from azkar_counter import AzkarCounter
+from counter_store import CounterStore
+from rate_limit import UserRateLimiter
+
+class FakeBot:
+    """Records the Telegram API calls the counter makes"""
+
+    def __init__(self):
+        self.answers = []
+        self.edits = []
+
+    def answer_callback_query(self, callback_id, text=None):
+        self.answers.append(text)
+
+    def edit_message_text(self, text, chat_id, message_id, reply_markup=None):
+        self.edits.append(text)
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+def tap(counter, number, data="count_subhan_allah"):
+    counter.handle_callback(SimpleNamespace(
+        id=str(number), data=data, from_user=SimpleNamespace(id=7),
+        message=SimpleNamespace(chat=SimpleNamespace(id=7), message_id=1)
+    ))
+
+def test_tap_flood_costs_few_api_calls():
+    """200 taps at once are all counted, with one answer for the limited ones and coalesced edits"""
+    bot = FakeBot()
+    clock = SimpleNamespace(now=0.0)
+    counter = AzkarCounter("123456:TEST", CounterStore(), edit_interval_ms=200, bot=bot,
+                           rate_limiter=UserRateLimiter(1, burst=2, clock=lambda: clock.now))
+    for number in range(200):
+        tap(counter, number)
+    time.sleep(0.5)
+
+    assert counter.counter_store.get(7, "subhan_allah") == 200
+    assert len(bot.answers) == 3  # two allowed taps and one limited one
+    assert 1 <= len(bot.edits) <= 2  # at most the first tap, then the final count
+    assert "200" in bot.edits[-1]
+
+def test_webhook_limited_tap_answers_inline():
+    """In webhook mode the count of a limited tap goes back in the HTTP response"""
+    bot = FakeBot()
+    counter = AzkarCounter("123456:TEST", CounterStore(), edit_interval_ms=0, bot=bot,
+                           rate_limiter=UserRateLimiter(1, burst=1, clock=lambda: 0.0))
+    counter.answer_callbacks = False
+    tap(counter, 1)
+    edits = len(bot.edits)
+    tap(counter, 2)
+
+    assert counter.pop_inline_answer("2") == "📿 2"
+    assert counter.pop_inline_answer("2") is None
+    assert bot.answers == [] and len(bot.edits) == edits
+
+if __name__ == "__main__":
+    for test in (test_tap_flood_costs_few_api_calls, test_webhook_limited_tap_answers_inline):
+        test()
+        print(f"✅ {test.__name__}")
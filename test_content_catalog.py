@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Content catalog tests
+Checks the shipped index is trusted after a fresh checkout and rebuilt after an edit
+"""
+
+import os
+import shutil
+from content_catalog import ContentCatalog, DEFAULT_CATALOG_PATH
+
+def checkout(directory):
+    """Copy the committed catalog and index like a clone does (new files, new mtimes)"""
+    path = os.path.join(directory, "islamic_content.jsonl")
+    shutil.copyfile(DEFAULT_CATALOG_PATH, path)
+    shutil.copyfile(os.path.splitext(DEFAULT_CATALOG_PATH)[0] + ".idx.json",
+                    os.path.join(directory, "islamic_content.idx.json"))
+    os.utime(path, ns=(1, 1))
+    return path
+
+def test_committed_index_is_used_after_a_checkout(tmp_path):
+    """The shipped index matches the shipped catalog whatever the file times are"""
+    catalog = ContentCatalog(checkout(str(tmp_path)))
+    try:
+        catalog._open()
+        assert catalog._read_index_file() is not None
+        assert catalog.count("morning_azkar") > 0
+    finally:
+        catalog.close()
+
+def test_same_size_edit_rebuilds_the_index(tmp_path):
+    """Changing a text without changing the file size invalidates the index"""
+    path = checkout(str(tmp_path))
+    with open(path, "rb") as f:
+        data = f.read()
+    # Both letters are two bytes in UTF-8
+    edited = data.replace("الله".encode("utf-8"), "اللة".encode("utf-8"), 1)
+    assert len(edited) == len(data) and edited != data
+    with open(path, "wb") as f:
+        f.write(edited)
+
+    catalog = ContentCatalog(path)
+    try:
+        catalog._open()
+        assert catalog._read_index_file() is None
+        assert any("اللة" in text for content_type in catalog.content_types() for text in catalog.items(content_type))
+        assert catalog._read_index_file() is not None  # rewritten for the edited file
+    finally:
+        catalog.close()
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    for test in (test_committed_index_is_used_after_a_checkout, test_same_size_edit_rebuilds_the_index):
+        with tempfile.TemporaryDirectory() as directory:
+            test(Path(directory))
+        print(f"✅ {test.__name__}")
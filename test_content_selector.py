@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Content selector tests
+Two processes sharing the state database must never repeat each other's picks
+"""
+
+from content_selector import SQLiteContentSelector
+
+def test_processes_sharing_a_database_do_not_repeat(tmp_path):
+    """Alternating picks from two selectors walk one shuffled epoch together"""
+    db_path = str(tmp_path / "state.db")
+    first = SQLiteContentSelector(db_path, no_repeat_days=30)
+    second = SQLiteContentSelector(db_path, no_repeat_days=30)
+    try:
+        picks = [(first if turn % 2 else second).pick("@channel", "daily_dua", 20, day=700000)
+                 for turn in range(20)]
+        assert sorted(picks) == list(range(20))
+    finally:
+        first.close()
+        second.close()
+
+def test_pick_counts_for_the_post_day(tmp_path):
+    """An item rendered for tomorrow is blocked from tomorrow on, in every process"""
+    db_path = str(tmp_path / "state.db")
+    prerender = SQLiteContentSelector(db_path, no_repeat_days=2)
+    worker = SQLiteContentSelector(db_path, no_repeat_days=2)
+    try:
+        worker.pick("@channel", "daily_dua", 3, day=700000)  # the worker's lane is cached now
+        item = prerender.pick("@channel", "daily_dua", 3, day=700001)
+        picks = {worker.pick("@channel", "daily_dua", 3, day=700002) for _ in range(2)}
+        assert item not in picks
+    finally:
+        prerender.close()
+        worker.close()
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    for test in (test_processes_sharing_a_database_do_not_repeat, test_pick_counts_for_the_post_day):
+        with tempfile.TemporaryDirectory() as directory:
+            test(Path(directory))
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Counter store tests
+Checks the compact count layout and that evicted users come back from disk
+"""
+
+from counter_store import CounterStore, SQLiteCounterStore
+
+def test_counts_survive_new_keys():
+    """A key first seen after users exist widens the rows without losing counts"""
+    store = CounterStore(["subhan_allah"])
+    store.increment(1, "subhan_allah", 5)
+    store.increment(2, "subhan_allah")
+    store.increment(1, "salawat", 3)
+
+    assert store.get_counts(1) == {"subhan_allah": 5, "salawat": 3}
+    assert store.get_counts(2) == {"subhan_allah": 1}
+    assert store.get(3, "salawat") == 0
+    assert len(store) == 2
+
+def test_evicted_users_are_reloaded(tmp_path):
+    """Idle users leave memory only after a flush and are read back on their next tap"""
+    store = SQLiteCounterStore(str(tmp_path / "counts.db"), flush_interval_ms=60000)
+    try:
+        store.increment(7, "subhan_allah", 33)
+        assert store.evict_idle(-1) == 0  # still unflushed
+        store.flush()
+        assert store.evict_idle(-1) == 1
+        assert len(store) == 0
+
+        assert store.increment(7, "subhan_allah") == 34
+        store.reset_user(7)
+        store.flush()
+        store.evict_idle(-1)
+        assert store.get_counts(7) == {}
+    finally:
+        store.close()
+
+def test_reset_of_an_evicted_user(tmp_path):
+    """Resetting a user who is only on disk does not bring the old counts back"""
+    store = SQLiteCounterStore(str(tmp_path / "counts.db"), flush_interval_ms=60000)
+    try:
+        store.increment(7, "subhan_allah", 30)
+        store.increment(7, "salawat", 9)
+        store.flush()
+        assert store.evict_idle(-1) == 1
+
+        store.reset_user(7)
+        assert store.get_counts(7) == {}
+        assert store.increment(7, "subhan_allah") == 1
+        store.flush()
+        store.evict_idle(-1)
+        assert store.get_counts(7) == {"subhan_allah": 1}
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    test_counts_survive_new_keys()
+    print("✅ test_counts_survive_new_keys")
+    with tempfile.TemporaryDirectory() as directory:
+        test_evicted_users_are_reloaded(Path(directory))
+    print("✅ test_evicted_users_are_reloaded")
+    with tempfile.TemporaryDirectory() as directory:
+        test_reset_of_an_evicted_user(Path(directory))
+    print("✅ test_reset_of_an_evicted_user")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Leader election tests
+Two replicas share one lease database - only one of them may run the scheduled posts
+"""
+
+from datetime import timedelta
+from event_scheduler import EventScheduler, FakeClock
+from leader_election import LeaderElector, SQLiteLeaseBackend
+from test_scheduler import START
+
+class Clock:
+    """Manually advanced wall clock for the lease"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_standby_takes_over_after_the_lease_expires(tmp_path):
+    """The standby only becomes leader once the leader stopped renewing for a full lease"""
+    clock = Clock()
+    db_path = str(tmp_path / "state.db")
+    first = LeaderElector(SQLiteLeaseBackend(db_path), ttl=10, holder_id="first", clock=clock)
+    second = LeaderElector(SQLiteLeaseBackend(db_path), ttl=10, holder_id="second", clock=clock)
+
+    assert first.step() and not second.step()
+    clock.now += 9
+    assert first.step() and not second.step()  # renewed in time
+
+    clock.now += 10.5  # first replica died after its last heartbeat
+    assert not first.is_leader
+    assert second.step() and second.is_leader
+    assert not first.step()
+
+    second.stop()  # a clean shutdown hands over immediately
+    assert first.step()
+
+def test_new_leader_posts_the_slot_it_skipped():
+    """A job skipped on a standby runs as soon as the replica takes over, within the catch-up window"""
+    clock = FakeClock(START + timedelta(hours=5, minutes=59))
+    leader = {"value": False}
+    scheduler = EventScheduler(clock, guard=lambda: leader["value"], catch_up_seconds=60)
+    fired = []
+    scheduler.add_daily("06:00", lambda: fired.append(clock.now()), tz="UTC")
+
+    clock.advance(60)
+    assert scheduler.run_pending() == 0  # standby at 06:00
+
+    clock.advance(20)
+    leader["value"] = True
+    assert scheduler.run_pending() == 1
+    assert fired == [START + timedelta(hours=6, seconds=20)]
+
+    leader["value"] = False
+    clock.advance(86400 - 20)
+    scheduler.run_pending()
+    clock.advance(120)  # took over too late for this slot
+    leader["value"] = True
+    assert scheduler.run_pending() == 0
+
+def test_new_leader_respects_the_old_leaders_posts(tmp_path):
+    """Both replicas claim slots in the shared ledger, so a catch-up run never reposts"""
+    from datetime import date
+    from post_ledger import SQLitePostLedger
+    db_path = str(tmp_path / "state.db")
+    today = date.today()
+    old_leader = SQLitePostLedger(db_path)
+    new_leader = SQLitePostLedger(db_path)  # started before the old leader posted
+
+    assert old_leader.begin("@channel", "morning_azkar", today) == 1
+    assert new_leader.begin("@channel", "morning_azkar", today) is None  # in flight elsewhere
+    old_leader.finish("@channel", "morning_azkar", today, sent=True)
+    assert new_leader.status("@channel", "morning_azkar", today) == ("sent", 1)
+
+    assert old_leader.begin("@channel", "daily_dua", today) == 1
+    old_leader.finish("@channel", "daily_dua", today, sent=False)
+    assert new_leader.begin("@channel", "daily_dua", today) == 2  # definite failure - retried once
+    assert old_leader.begin("@channel", "daily_dua", today) is None
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    with tempfile.TemporaryDirectory() as directory:
+        test_standby_takes_over_after_the_lease_expires(Path(directory))
+    print("✅ test_standby_takes_over_after_the_lease_expires")
+    test_new_leader_posts_the_slot_it_skipped()
+    print("✅ test_new_leader_posts_the_slot_it_skipped")
+    with tempfile.TemporaryDirectory() as directory:
+        test_new_leader_respects_the_old_leaders_posts(Path(directory))
+    print("✅ test_new_leader_respects_the_old_leaders_posts")
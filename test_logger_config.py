@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Logging pipeline tests
+Checks queue delivery, JSON lines, level sampling and error-storm deduplication
+"""
+
+import io
+import json
+import logging
+from logger_config import DedupFilter, SamplingFilter, create_handlers, start_queue_logging, stop_queue_logging
+
+def make_logger(name, stream, **options):
+    """Logger writing JSON lines to `stream` through the queue listener"""
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    listener = start_queue_logging(logger, create_handlers(logging.DEBUG, json_lines=True, stream=stream, **options))
+    return logger, listener
+
+def test_queued_records_are_written_as_json_lines():
+    """Records reach the handler from the listener thread, arguments merged"""
+    stream = io.StringIO()
+    logger, listener = make_logger("test.json", stream)
+    logger.info("📤 Sending message to %s", -100)
+    stop_queue_logging(listener)
+    stop_queue_logging(listener)
+
+    [line] = stream.getvalue().splitlines()
+    entry = json.loads(line)
+    assert entry["message"] == "📤 Sending message to -100"
+    assert entry["level"] == "INFO"
+
+def test_sampling_keeps_one_in_n_per_level():
+    """INFO is sampled 1/10, warnings are always kept"""
+    stream = io.StringIO()
+    logger, listener = make_logger("test.sampling", stream)
+    logger.addFilter(SamplingFilter({logging.INFO: 0.1, logging.DEBUG: 0}))
+    for i in range(100):
+        logger.debug(f"debug {i}")
+        logger.info(f"info {i}")
+    logger.warning("warning")
+    stop_queue_logging(listener)
+
+    levels = [json.loads(line)["level"] for line in stream.getvalue().splitlines()]
+    assert levels.count("INFO") == 10
+    assert levels.count("DEBUG") == 0
+    assert levels[-1] == "WARNING"
+
+def test_repeated_errors_are_collapsed():
+    """An error repeated every few seconds is logged once per window plus a count"""
+    stream = io.StringIO()
+    now = [0.0]
+    logger, listener = make_logger("test.dedup", stream)
+    dedup = DedupFilter(window=60, max_keys=5, clock=lambda: now[0])
+    logger.addFilter(dedup)
+    for attempt in range(1, 31):
+        logger.error(f"❌ Polling inner error: Conflict (409) - restarting in 10 seconds... #{attempt}")
+        now[0] += 5
+    logger.info("still running")
+    for chat_id in range(-1000000000010, -1000000000000):
+        logger.error(f"❌ Fan-out to {chat_id} failed")
+    stop_queue_logging(listener)
+
+    messages = [json.loads(line)["message"] for line in stream.getvalue().splitlines()]
+    polling = [message for message in messages if "Polling" in message]
+    # 150s of errors = 3 windows: first line + summary each (the last one flushed on eviction)
+    assert len(polling) == 6
+    assert polling[1].startswith("🔁") and "repeated 11 times" in polling[1]
+    assert "repeated 5 times" in polling[-1]
+    assert sum("Fan-out" in message for message in messages) == 10  # different chats are kept
+    assert len(dedup._entries) <= 5
+
+if __name__ == "__main__":
+    for test in (test_queued_records_are_written_as_json_lines, test_sampling_keeps_one_in_n_per_level,
+                 test_repeated_errors_are_collapsed):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Message splitter tests
+Checks that long posts are split into valid, ordered parts within Telegram's limit
+"""
+
+import re
+from message_splitter import split_message
+from prerender import validate_html
+
+def visible_text(message):
+    """Text without tags and whitespace, for comparing content before and after a split"""
+    return re.sub(r"<[^<>]+>|\s", "", message)
+
+def test_short_message_is_unchanged():
+    """A message within the limit is sent as-is"""
+    message = "📖 <b>آية من القرآن الكريم</b>\n\nبسم الله الرحمن الرحيم"
+    assert split_message(message) == [message]
+
+def test_parts_are_valid_and_keep_all_content():
+    """Every part has balanced tags, fits the limit and the parts keep the original order"""
+    paragraphs = [f"<i>فقرة {i}</i> " + "سبحان الله وبحمده. " * 40 for i in range(30)]
+    message = "📚 <b>حديث شريف</b>\n\n<blockquote>" + "\n\n".join(paragraphs) + "</blockquote>"
+
+    parts = split_message(message, limit=1000)
+
+    assert len(parts) > 1
+    for part in parts:
+        problems, length = validate_html(part)
+        assert problems == []
+        assert length <= 1000
+        assert part.startswith("<blockquote>") or part.startswith("📚")
+    assert visible_text("".join(parts)) == visible_text(message)
+
+def test_parts_break_on_paragraphs():
+    """Paragraph boundaries are preferred over cutting inside a paragraph"""
+    paragraphs = ["ذكر " * 100 + str(i) for i in range(10)]
+    parts = split_message("\n\n".join(paragraphs), limit=1100)
+    for part in parts:
+        assert part.endswith(tuple(str(i) for i in range(10)))
+
+def test_length_is_measured_in_utf16_units():
+    """Emoji count as two units, like Telegram counts them"""
+    parts = split_message("🤲" * 3000, limit=4096)
+    assert len(parts) == 2
+    assert all(validate_html(part)[1] <= 4096 for part in parts)
+
+if __name__ == "__main__":
+    for test in (test_short_message_is_unchanged, test_parts_are_valid_and_keep_all_content,
+                 test_parts_break_on_paragraphs, test_length_is_measured_in_utf16_units):
+        test()
+        print(f"✅ {test.__name__}")
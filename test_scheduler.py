@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Scheduler accuracy tests
+Runs the event scheduler against a fake clock and checks every job fires on time
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from event_scheduler import EventScheduler, FakeClock
+from prayer_times import PrayerLocation, PRAYERS, parse_prayer_slot
+
+START = datetime(2026, 3, 1, 0, 0, tzinfo=timezone.utc)
+
+def run_until(scheduler, fired, count):
+    """Run the scheduler loop until `count` jobs fired"""
+    stop = threading.Event()
+    original_wait = scheduler.clock.wait
+
+    def wait(condition, timeout):
+        if len(fired) >= count:
+            stop.set()
+            return
+        original_wait(condition, timeout)
+
+    scheduler.clock.wait = wait
+    scheduler.run_forever(stop_event=stop)
+
+def test_jobs_fire_exactly_on_time():
+    """Every firing happens at the planned wall-clock time (zero lag)"""
+    clock = FakeClock(START)
+    scheduler = EventScheduler(clock)
+    fired = []
+    for at in ("06:00", "12:00", "21:00"):
+        scheduler.add_daily(at, lambda at=at: fired.append((at, clock.now())), tz="UTC", tag=at)
+
+    run_until(scheduler, fired, 9)
+
+    assert [at for at, _ in fired] == ["06:00", "12:00", "21:00"] * 3
+    for at, fired_at in fired:
+        assert fired_at.strftime("%H:%M") == at
+    assert all(job.last_lag == 0 for job in scheduler.jobs)
+
+def test_timezone_aware_times():
+    """Times are wall-clock times of the job's timezone, including DST changes"""
+    clock = FakeClock(datetime(2026, 3, 7, 0, 0, tzinfo=timezone.utc))
+    scheduler = EventScheduler(clock)
+    fired = []
+    scheduler.add_daily("06:00", lambda: fired.append(clock.now()), tz="America/New_York")
+
+    run_until(scheduler, fired, 3)
+
+    # New York switches to daylight time on 2026-03-08
+    assert [moment.hour for moment in fired] == [11, 10, 10]
+
+def test_added_earlier_job_fires_first():
+    """A job added later but due earlier fires first"""
+    clock = FakeClock(START)
+    scheduler = EventScheduler(clock)
+    fired = []
+    scheduler.add_daily("20:00", lambda: fired.append("late"), tz="UTC")
+    scheduler.add_daily("05:00", lambda: fired.append("early"), tz="UTC")
+
+    run_until(scheduler, fired, 2)
+    assert fired == ["early", "late"]
+
+def test_many_jobs_fire_in_order():
+    """Thousands of jobs keep their order and fire once per day each"""
+    clock = FakeClock(START - timedelta(seconds=1))
+    scheduler = EventScheduler(clock)
+    fired = []
+    for minute in range(24 * 60):
+        for slot in range(5):
+            at = f"{minute // 60:02d}:{minute % 60:02d}"
+            scheduler.add_daily(at, lambda at=at: fired.append(at), tz="UTC")
+
+    run_until(scheduler, fired, 24 * 60 * 5)
+    assert len(fired) == 24 * 60 * 5
+    assert fired == sorted(fired)
+    assert clock.now() < START + timedelta(days=1)
+
+def test_prayer_times_are_ordered():
+    """Prayers come in order every day of the year, Hanafi Asr after Shafi Asr"""
+    cairo = PrayerLocation(30.0444, 31.2357, "Egypt")
+    cairo_hanafi = PrayerLocation(30.0444, 31.2357, "Egypt", "hanafi")
+    day = START.date()
+    for _ in range(365):
+        times = cairo.times(day)
+        assert [times[prayer] for prayer in PRAYERS] == sorted(times.values())
+        assert cairo_hanafi.time_of("asr", day) > times["asr"]
+        day += timedelta(days=1)
+
+def test_prayer_relative_jobs_follow_the_prayer():
+    """A "fajr+20" job fires 20 minutes after each day's Fajr, which moves daily"""
+    clock = FakeClock(START)
+    scheduler = EventScheduler(clock)
+    cairo = PrayerLocation(30.0444, 31.2357, "Egypt")
+    fired = []
+    scheduler.add_daily(cairo.slot_time("fajr+20"), lambda: fired.append(clock.now()), tz="Africa/Cairo")
+
+    run_until(scheduler, fired, 5)
+
+    assert parse_prayer_slot("maghrib - 10") == ("maghrib", -10)
+    assert parse_prayer_slot("06:00") is None
+    for moment in fired:
+        assert moment - cairo.time_of("fajr", moment.date()) == timedelta(minutes=20)
+    assert len({moment.time() for moment in fired}) > 1
+
+def test_prerendered_posts_are_not_generated_again():
+    """Pre-rendered posts wait in the outbox until their slot, firing the slot adds nothing"""
+    from outbox import Outbox
+    from scheduler import ContentScheduler
+    from telegram_bot import TelegramBot
+
+    class Generator:
+        calls = 0
+        def generate_content(self, content_type, channel_id=None, post_date=None):
+            Generator.calls += 1
+            return f"{content_type} <unknown-tag> & text"
+
+    outbox = Outbox()
+    bot = TelegramBot("123456:TEST", "@channel", defer_retries=False)
+    scheduler = ContentScheduler(bot, Generator(), outbox=outbox, timezone="UTC")
+    scheduler.setup_schedule({"daily_hadith": "12:00"})
+    assert scheduler.prerender_upcoming(hours=48) == 2
+    assert Generator.calls == 2
+
+    [item] = outbox.claim_due(now=4102444800)[:1]
+    assert "&lt;unknown-tag&gt; &amp; text" in item["text"]
+
+    slot_key = item["idempotency_key"].rsplit(":@channel", 1)[0]
+    scheduler._generate_and_send_content("daily_hadith", slot_key)
+    assert Generator.calls == 2
+
+def test_slot_is_not_posted_twice():
+    """A re-run slot is skipped once sent, and a send that timed out is never repeated"""
+    from datetime import date
+    import requests
+    from telebot import apihelper
+    from outbox import Outbox, OutboxDrainer
+    from scheduler import ContentScheduler
+    from telegram_bot import TelegramBot
+
+    requests_made = []
+    timeouts = []
+
+    def fake_transport(method, url, params=None, **kwargs):
+        # Stands in for the HTTP session: the request reaches "Telegram", then maybe the reply is lost
+        requests_made.append(params["text"].split("\n")[0])
+        if timeouts:
+            raise timeouts.pop()
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'{"ok": true, "result": {"message_id": 1, "date": 0, "chat": {"id": 1, "type": "channel"}}}'
+        return response
+
+    class Generator:
+        def generate_content(self, content_type, channel_id=None, post_date=None):
+            return "سبحان الله"
+
+    saved = apihelper.CUSTOM_REQUEST_SENDER
+    apihelper.CUSTOM_REQUEST_SENDER = fake_transport
+    try:
+        bot = TelegramBot("123456:TEST", "@channel", defer_retries=False)
+        scheduler = ContentScheduler(bot, Generator())
+        today = date(2026, 3, 1)
+        for _ in range(2):
+            scheduler._generate_and_send_content("daily_dua", "daily_dua:2026-03-01", post_date=today)
+        assert len(requests_made) == 1
+
+        # Telegram may have accepted the post before the timeout - no blind resend
+        timeouts.append(requests.exceptions.ReadTimeout("read timed out"))
+        for _ in range(2):
+            scheduler._generate_and_send_content("daily_hadith", "daily_hadith:2026-03-01", post_date=today)
+        assert len(requests_made) == 2
+        assert scheduler.ledger.status("@channel", "daily_hadith", today) == ("sending", 1)
+
+        # The outbox parks such a post instead of handing it back to the drainer
+        outbox = Outbox()
+        outbox.enqueue("daily_hadith:2026-03-01:@other", "@other", "حديث", "daily_hadith")
+        timeouts.append(requests.exceptions.ConnectionError("Connection aborted: connection reset by peer"))
+        [item] = outbox.claim_due()
+        assert OutboxDrainer(outbox, bot, rate=1000).deliver(item) == "unknown"
+        assert outbox.claim_due(now=4102444800) == [] and outbox.depth() == 0
+        assert len(requests_made) == 3
+
+        # Neither is a post whose drainer died mid-send (the row stayed 'sending')
+        outbox.enqueue("daily_dua:2026-03-01:@other", "@other", "دعاء", "daily_dua", not_before=1000)
+        [item] = outbox.claim_due(now=1000)
+        assert outbox.claim_due(now=1000 + outbox.claim_timeout) == [] and outbox.depth() == 0
+    finally:
+        apihelper.CUSTOM_REQUEST_SENDER = saved
+
+def test_rate_limited_post_is_recorded_when_sent():
+    """A 429 leaves the slot open until the queued retry really posted it, and never sleeps the queue"""
+    from datetime import date
+    import requests
+    from telebot import apihelper
+    from scheduler import ContentScheduler
+    from telegram_bot import TelegramBot
+
+    responses = []
+
+    def fake_transport(method, url, params=None, **kwargs):
+        response = requests.Response()
+        response.status_code, response._content = responses.pop(0) if responses else (200, (
+            b'{"ok": true, "result": {"message_id": 1, "date": 0, "chat": {"id": 1, "type": "channel"}}}'
+        ))
+        return response
+
+    class Generator:
+        def generate_content(self, content_type, channel_id=None, post_date=None):
+            return "سبحان الله"
+
+    too_many = (429, b'{"ok": false, "error_code": 429, "description": "Too Many Requests: retry after 1", '
+                     b'"parameters": {"retry_after": 1}}')
+    saved = apihelper.CUSTOM_REQUEST_SENDER
+    apihelper.CUSTOM_REQUEST_SENDER = fake_transport
+    try:
+        bot = TelegramBot("123456:TEST", "@channel")
+        scheduler = ContentScheduler(bot, Generator())
+        today = date(2026, 3, 1)
+        responses.append(too_many)
+        scheduler._generate_and_send_content("daily_dua", "daily_dua:2026-03-01", post_date=today)
+        assert scheduler.ledger.status("@channel", "daily_dua", today) == ("sending", 1)
+
+        deadline = time.monotonic() + 5
+        while bot.queued_retries() or scheduler.ledger.status("@channel", "daily_dua", today)[0] == "sending":
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+        assert scheduler.ledger.status("@channel", "daily_dua", today) == ("sent", 1)
+
+        # Out of queued retries: dropped at once instead of sleeping on the queue thread
+        responses.append(too_many)
+        started = time.monotonic()
+        assert bot._send_parts(["x"], 5, "@channel") == (False, 0)
+        assert time.monotonic() - started < 0.5
+    finally:
+        apihelper.CUSTOM_REQUEST_SENDER = saved
+
+def test_long_post_resumes_after_the_delivered_parts():
+    """When part 2 of a split post fails, the retry starts at part 2 - part 1 is not posted again"""
+    from datetime import date
+    import requests
+    from telebot import apihelper
+    from scheduler import ContentScheduler
+    from telegram_bot import TelegramBot
+
+    texts = []
+    failures = []
+
+    def fake_transport(method, url, params=None, **kwargs):
+        texts.append(params["text"])
+        response = requests.Response()
+        if len(texts) > 1 and failures:
+            failures.pop()
+            response.status_code = 400
+            response._content = b'{"ok": false, "error_code": 400, "description": "Bad Request: something broke"}'
+        else:
+            response.status_code = 200
+            response._content = b'{"ok": true, "result": {"message_id": 1, "date": 0, "chat": {"id": 1, "type": "channel"}}}'
+        return response
+
+    class Generator:
+        def generate_content(self, content_type, channel_id=None, post_date=None):
+            return "\n\n".join(f"فقرة {i} " + "سبحان الله وبحمده " * 20 for i in range(20))
+
+    saved = apihelper.CUSTOM_REQUEST_SENDER, time.sleep
+    apihelper.CUSTOM_REQUEST_SENDER, time.sleep = fake_transport, lambda seconds: None
+    try:
+        scheduler = ContentScheduler(TelegramBot("123456:TEST", "@channel", defer_retries=False), Generator())
+        failures.extend([True] * 5)  # part 2 fails every attempt of the first send
+        scheduler._generate_and_send_content("religious_post", "religious_post:2026-03-01", post_date=date(2026, 3, 1))
+    finally:
+        apihelper.CUSTOM_REQUEST_SENDER, time.sleep = saved
+
+    delivered = list(dict.fromkeys(texts))
+    assert len(delivered) >= 2
+    assert texts.count(delivered[0]) == 1
+    assert scheduler.ledger.status("@channel", "religious_post", date(2026, 3, 1)) == ("sent", 2)
+
+def test_schedule_status_without_jobs():
+    """/schedule lists the configured slots even where setup_schedule() never ran (webhook)"""
+    from channel_schedules import ChannelSchedule
+    from scheduler import ContentScheduler
+    from telegram_bot import TelegramBot
+
+    bot = TelegramBot("123456:TEST", "@channel", defer_retries=False)
+    scheduler = ContentScheduler(
+        bot, None, timezone="UTC", event_scheduler=EventScheduler(FakeClock(START + timedelta(hours=7))),
+        channel_schedules=[ChannelSchedule("@cairo", "Africa/Cairo", {"daily_hadith": "12:00"})]
+    )
+    status = scheduler.get_schedule_status()
+
+    assert status["total_jobs"] == 0
+    assert len(status["slots"]) == len(scheduler.default_schedule) + 1
+    first, second = status["slots"][:2]
+    assert (first["content_type"], first["next_run"]) == ("quran_verse", "2026-03-01 08:00")
+    assert (second["channel"], second["next_run"]) == ("@cairo", "2026-03-01 12:00")
+    assert status["slots"][-1]["next_run"] == "2026-03-02 06:00"
+    assert status["next_run"] == "2026-03-01 08:00:00"
+
+if __name__ == "__main__":
+    for test in (test_jobs_fire_exactly_on_time, test_timezone_aware_times,
+                 test_added_earlier_job_fires_first, test_many_jobs_fire_in_order,
+                 test_prayer_times_are_ordered, test_prayer_relative_jobs_follow_the_prayer,
+                 test_prerendered_posts_are_not_generated_again, test_slot_is_not_posted_twice,
+                 test_rate_limited_post_is_recorded_when_sent, test_long_post_resumes_after_the_delivered_parts,
+                 test_schedule_status_without_jobs):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Sharded dispatcher tests
+Checks how updates are keyed, that the hash ring keeps users in place and that a crashed worker is replaced
+"""
+
+import time
+import telebot
+from metrics import Counter, Gauge, Histogram, Registry, DeltaReporter, apply_deltas
+from sharded_dispatcher import ShardRing, ShardedDispatcher, get_command, get_user_key
+
+def build_slow_worker(index):
+    """Worker that hangs on the text "slow" (module-level so spawned workers can import it)"""
+    bot = telebot.TeleBot("123456:TEST", threaded=False)
+
+    @bot.message_handler(func=lambda message: message.text == "slow")
+    def slow(message):
+        time.sleep(60)
+
+    return bot
+
+def text_update(update_id, text):
+    return {"update_id": update_id, "message": {"message_id": update_id, "date": 0, "text": text,
+                                                "chat": {"id": 42, "type": "private"},
+                                                "from": {"id": 42, "is_bot": False, "first_name": "test"}}}
+
+def test_updates_are_keyed_by_sender():
+    """Callbacks and messages of one user land on the same key, channel posts use the chat"""
+    sender = {"id": 42, "is_bot": False, "first_name": "test"}
+    callback = {"update_id": 1, "callback_query": {"id": "1", "from": sender, "data": "count_salawat",
+                                                   "message": {"chat": {"id": -100}}}}
+    message = {"update_id": 2, "message": {"chat": {"id": 42}, "from": sender, "text": "/count"}}
+    channel_post = {"update_id": 3, "channel_post": {"chat": {"id": -100}, "text": "x"}}
+
+    assert get_user_key(callback) == get_user_key(message) == 42
+    assert get_user_key(channel_post) == -100
+
+def test_adding_a_worker_moves_few_users():
+    """Going from 4 to 5 workers only moves users to the new worker (about a fifth of them)"""
+    before, after = ShardRing(4), ShardRing(5)
+    users = range(10**9, 10**9 + 20000)
+    moved = [user for user in users if before.shard_for(user) != after.shard_for(user)]
+
+    assert all(after.shard_for(user) == 4 for user in moved)
+    assert 0.1 < len(moved) / len(users) < 0.3
+    assert {before.shard_for(user) for user in users} == {0, 1, 2, 3}
+
+def test_schedule_commands_are_recognized():
+    """The receiver keeps /schedule (with or without the bot's name) and sends the rest to shards"""
+    assert get_command({"message": {"text": "/schedule@islam_bot now"}}) == "schedule"
+    assert get_command({"message": {"text": "/جدول"}}) == "جدول"
+    assert get_command({"message": {"text": "schedule"}}) is None
+    assert get_command({"message": {"text": "/"}}) is None
+    assert get_command({"callback_query": {"data": "menu"}}) is None
+
+def test_worker_metrics_add_up_in_the_parent():
+    """Reports carry only what changed since the last one, so merging them never double counts"""
+    worker, parent = Registry(), Registry()
+    for registry in (worker, parent):
+        Counter("taps_total", "taps", ["action"], registry=registry)
+        Histogram("latency_seconds", "latency", buckets=(0.1, 1), registry=registry)
+        Gauge("active_users", "users", registry=registry)
+    reporter = DeltaReporter(worker)
+
+    worker.get("taps_total").labels("count").inc(3)
+    worker.get("latency_seconds").observe(0.5)
+    worker.get("active_users").set(7)
+    first = reporter.collect()
+    assert first["gauges"] == {("active_users", ()): 7}
+    apply_deltas(first["deltas"], parent)
+
+    worker.get("taps_total").labels("count").inc()
+    apply_deltas(reporter.collect()["deltas"], parent)
+    assert reporter.collect()["deltas"] == {}
+
+    assert parent.get("taps_total").labels("count").value == 4
+    assert parent.get("latency_seconds").labels().snapshot() == ([0, 1, 0], 0.5)
+
+def test_killed_worker_is_replaced_and_drain_returns():
+    """The batch a worker was killed on is logged as lost, the ones queued behind it still get handled"""
+    dispatcher = ShardedDispatcher("123456:TEST", build_slow_worker, workers=1)
+    dispatcher.start()
+    try:
+        dispatcher.dispatch([text_update(1, "slow")])
+        dispatcher.dispatch([text_update(2, "hello"), text_update(3, "hello")])
+        deadline = time.monotonic() + 30
+        while dispatcher._taken[0].value < 1 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        dispatcher._processes[0].kill()
+        dispatcher._processes[0].join()
+        dispatcher.drain(timeout=60)
+
+        assert dispatcher.stats["restarts"] == 1
+        assert dispatcher.stats["lost"] == 1
+        assert dispatcher._pending == 0
+    finally:
+        dispatcher.stop()
+
+if __name__ == "__main__":
+    for test in (test_updates_are_keyed_by_sender, test_adding_a_worker_moves_few_users,
+                 test_schedule_commands_are_recognized, test_worker_metrics_add_up_in_the_parent,
+                 test_killed_worker_is_replaced_and_drain_returns):
+        test()
+        print(f"✅ {test.__name__}")
@@ -7,8 +7,18 @@ import os
 import sys
 import json
 from flask import Flask, request, jsonify
+from telebot import types
 from telegram_bot import TelegramBot
+from api_client import create_shared_bot
+from rate_limit import UserRateLimiter
 from content_generator import IslamicContentGenerator
+from scheduler import ContentScheduler
+from channel_schedules import load_configured_channel_schedules
+from azkar_counter import AzkarCounter
+from counter_store import create_counter_store
+from cursor_store import create_cursor_store
+from content_selector import create_content_selector
+from bot_handler import CombinedBotHandler
 from bot_config import BotConfig
 from logger_config import setup_logger
 
@@ -23,7 +33,7 @@ bot_instance = None
 config = None
 
 def initialize_bot():
-    """Initialize bot components"""
+    """Initialize bot components - no Telegram API calls, so cold starts stay fast"""
     global bot_instance, config
     
     try:
@@ -31,19 +41,62 @@ def initialize_bot():
         config = BotConfig()
         config.validate()
         
-        # Initialize bot components
-        telegram_bot = TelegramBot(config.telegram_token, config.channel_id)
-        content_generator = IslamicContentGenerator()
+        # Initialize bot components - one TeleBot and connection pool, reused across warm invocations;
+        # handlers run inside the request
+        bot = create_shared_bot(
+            config.telegram_token,
+            config.api_pool_size,
+            config.api_connect_timeout,
+            config.api_read_timeout,
+            threaded=False
+        )
+        # No background retry thread in a serverless function
+        telegram_bot = TelegramBot(config.telegram_token, config.channel_id, defer_retries=False, bot=bot)
+        content_generator = IslamicContentGenerator(
+            cursor_store=create_cursor_store(config.state_db_path),
+            selector=create_content_selector(
+                config.content_selection,
+                config.state_db_path,
+                config.no_repeat_days
+            )
+        )
+        # No jobs run here, but /schedule shows the configured times
+        scheduler = ContentScheduler(
+            telegram_bot,
+            content_generator,
+            timezone=config.schedule_timezone,
+            channel_schedules=load_configured_channel_schedules(config),
+            location=config.prayer_location
+        )
+        scheduler.default_schedule.update(config.get_schedule_times())
         
-        # Test connections
-        if not telegram_bot.test_connection():
-            logger.error("❌ Failed to connect to Telegram")
-            return False
+        # Webhook requests must finish before we return: no edit coalescing thread,
+        # callbacks are answered inline in the response
+        counter_store = create_counter_store(
+            config.state_db_path, config.counter_flush_interval_ms,
+            config.counter_idle_seconds, config.counter_max_cached_users
+        )
+        azkar_counter = AzkarCounter(
+            config.telegram_token, counter_store, edit_interval_ms=0, bot=bot,
+            rate_limiter=UserRateLimiter(config.callback_rate, config.callback_burst, config.callback_max_users)
+        )
+        azkar_counter.answer_callbacks = False
+        
+        bot_handler = CombinedBotHandler(
+            config.telegram_token,
+            config.channel_id,
+            scheduler,
+            azkar_counter,
+            bot=bot
+        )
             
         logger.info("✅ Bot initialized successfully for Vercel")
         bot_instance = {
             'telegram_bot': telegram_bot,
             'content_generator': content_generator,
+            'bot_handler': bot_handler,
+            'azkar_counter': azkar_counter,
+            'counter_store': counter_store,
             'config': config
         }
         return True
@@ -52,6 +105,29 @@ def initialize_bot():
         logger.error(f"❌ Failed to initialize bot: {e}")
         return False
 
+def process_update(data):
+    """Run an update through the bot handlers, returns an inline method reply if any"""
+    update = types.Update.de_json(data)
+    if update is None:
+        return None
+    
+    bot_instance['bot_handler'].bot.process_new_updates([update])
+    
+    # Write counters before the instance is frozen
+    bot_instance['counter_store'].flush()
+    
+    if update.callback_query:
+        # Telegram executes a method returned in the webhook response - saves an HTTP call
+        reply = {
+            "method": "answerCallbackQuery",
+            "callback_query_id": update.callback_query.id
+        }
+        text = bot_instance['azkar_counter'].pop_inline_answer(update.callback_query.id)
+        if text:
+            reply["text"] = text
+        return reply
+    return None
+
 @app.route('/')
 def home():
     """Health check endpoint"""
@@ -71,12 +147,12 @@ def webhook():
                 return jsonify({"error": "Bot initialization failed"}), 500
         
         # Process webhook data
-        data = request.get_json()
-        logger.info(f"📩 Received webhook: {data}")
+        data = request.get_json(silent=True) or {}
+        logger.debug(f"📩 Received webhook update {data.get('update_id')}")
         
-        # Handle the webhook
-        # This is a simplified webhook handler
-        # In a full implementation, you'd process the update here
+        reply = process_update(data)
+        if reply:
+            return jsonify(reply)
         
         return jsonify({"status": "ok"})
         
@@ -123,6 +199,9 @@ def test_bot():
         # Test message
         test_message = "سبحان الله - اختبار البوت على Vercel"
         if bot_instance and isinstance(bot_instance, dict):
+            # Connection checks only run here, never on cold start
+            if not bot_instance['telegram_bot'].test_connection():
+                return jsonify({"error": "Failed to connect to Telegram"}), 500
             result = bot_instance['telegram_bot'].send_message(test_message)
         else:
             return jsonify({"error": "Bot not initialized"}), 500